@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+from typing import Optional
+
+import httpx
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient, DefaultHttpxClient, Timeout
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_TIMEOUT_SECONDS = 600.0
+DEFAULT_MAX_RETRIES = 2
+
+
+def _api_key() -> str:
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise RuntimeError("ANTHROPIC_API_KEY environment variable is required")
+    return api_key
+
+
+def _limits() -> httpx.Limits:
+    max_connections = int(os.environ.get("ANTHROPIC_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+    # Generations run for minutes, so idle connections are kept for the next
+    # request instead of paying TCP and TLS setup again.
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=120.0,
+    )
+
+
+def _timeout() -> Timeout:
+    # The SDK's own Timeout type: newer SDK releases reject plain httpx objects here.
+    read_timeout = float(os.environ.get("ANTHROPIC_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+    return Timeout(read_timeout, connect=10.0)
+
+
+def _max_retries() -> int:
+    return int(os.environ.get("ANTHROPIC_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+
+
+_CLIENT: Optional[Anthropic] = None
+_CLIENT_LOCK = threading.Lock()
+_ASYNC_CLIENT: Optional[AsyncAnthropic] = None
+_ASYNC_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_anthropic_client() -> Anthropic:
+    """Return the process-wide Anthropic client; it is thread-safe and pools connections."""
+    global _CLIENT
+    api_key = _api_key()
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.api_key != api_key:
+            _CLIENT = Anthropic(
+                api_key=api_key,
+                timeout=_timeout(),
+                max_retries=_max_retries(),
+                http_client=DefaultHttpxClient(limits=_limits()),
+            )
+        return _CLIENT
+
+
+def get_async_anthropic_client() -> AsyncAnthropic:
+    """Return the shared AsyncAnthropic client for the running event loop."""
+    global _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    api_key = _api_key()
+    loop = asyncio.get_running_loop()
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT_LOOP is not loop or _ASYNC_CLIENT.api_key != api_key:
+        _ASYNC_CLIENT = AsyncAnthropic(
+            api_key=api_key,
+            timeout=_timeout(),
+            max_retries=_max_retries(),
+            http_client=DefaultAsyncHttpxClient(limits=_limits()),
+        )
+        _ASYNC_CLIENT_LOOP = loop
+    return _ASYNC_CLIENT
+
+
+async def aclose_anthropic_clients() -> None:
+    global _CLIENT, _ASYNC_CLIENT, _ASYNC_CLIENT_LOOP
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.close()
+    _ASYNC_CLIENT = None
+    _ASYNC_CLIENT_LOOP = None
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+        _CLIENT = None
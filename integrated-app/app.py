@@ -1,24 +1,36 @@
+import asyncio
 import base64
+import json
 import os
 from pathlib import Path
-from typing import Literal, Optional
+from typing import BinaryIO, Callable, Literal, Optional
 
 from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
+from anthropic_client import aclose_anthropic_clients
 from pipeline import (
+    add_document_to_case_async,
     convert_html_to_pdf,
-    extract_with_tensorlake,
+    extract_with_tensorlake_async,
     generate_full_html,
-    process_pdf,
-    transform_to_kreditlab_json,
-    transform_multiple_extractions_to_kreditlab_json,
+    get_cache_stats,
+    process_extraction_async,
+    transform_to_kreditlab_json_async,
+    transform_multiple_extractions_to_kreditlab_json_async,
     merge_kreditlab_json_records,
 )
+from tensorlake_client import aclose_async_client
+
+DEFAULT_STAGE_CONCURRENCY = {
+    "tensorlake": 4,
+    "process": 3,
+}
 
 app = FastAPI(title="Display-Apps Integrated Pipeline", version="1.0.0")
 BASE_DIR = Path(__file__).resolve().parent
@@ -35,6 +47,25 @@ app.add_middleware(
 )
 
 
+_STAGE_SEMAPHORES: dict[str, asyncio.Semaphore] = {}
+
+
+def _stage_semaphore(stage: str) -> asyncio.Semaphore:
+    # One limiter per stage, shared by all requests in this worker, so a burst of
+    # multi-file cases cannot exceed the configured upstream concurrency.
+    if stage not in _STAGE_SEMAPHORES:
+        env_name = f"{stage.upper()}_STAGE_CONCURRENCY"
+        limit = int(os.environ.get(env_name, DEFAULT_STAGE_CONCURRENCY[stage]))
+        _STAGE_SEMAPHORES[stage] = asyncio.Semaphore(max(1, limit))
+    return _STAGE_SEMAPHORES[stage]
+
+
+@app.on_event("shutdown")
+async def close_shared_clients() -> None:
+    await aclose_async_client()
+    await aclose_anthropic_clients()
+
+
 class RenderHTMLRequest(BaseModel):
     data: dict
 
@@ -48,6 +79,12 @@ class StageTransformRequest(BaseModel):
     items: list[StageTransformItem]
 
 
+class CaseAddDocumentRequest(BaseModel):
+    kreditlab_json: dict
+    filename: str
+    extraction_result: dict
+
+
 class StageRenderItem(BaseModel):
     filename: str
     kreditlab_json: dict
@@ -79,6 +116,11 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics() -> dict:
+    return get_cache_stats()
+
+
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -114,22 +156,25 @@ async def process_pdfs_endpoint(
     if not files:
         raise HTTPException(status_code=400, detail="Please upload at least one PDF")
 
-    results = []
-    for upload in files:
+    async def process_one(upload: UploadFile) -> dict:
         try:
-            result = await _process_single_upload(upload, include_pdf=include_pdf)
-            entry = {
-                "filename": upload.filename,
-                "kreditlab_json": result["kreditlab_json"],
-                "html": result["html"],
-            }
-            if include_pdf and result.get("pdf_bytes"):
-                entry["pdf_base64"] = base64.b64encode(result["pdf_bytes"]).decode("utf-8")
-            results.append(entry)
+            async with _stage_semaphore("process"):
+                result = await _process_single_upload(upload, include_pdf=include_pdf)
         except HTTPException as exc:
-            results.append({"filename": upload.filename, "error": exc.detail})
+            return {"filename": upload.filename, "error": exc.detail}
 
-    return {"results": results}
+        entry = {
+            "filename": upload.filename,
+            "kreditlab_json": result["kreditlab_json"],
+            "html": result["html"],
+        }
+        if include_pdf and result.get("pdf_bytes"):
+            entry["pdf_base64"] = base64.b64encode(result["pdf_bytes"]).decode("utf-8")
+        return entry
+
+    # gather() preserves upload order; each task handles its own errors.
+    results = await asyncio.gather(*(process_one(upload) for upload in files))
+    return {"results": list(results)}
 
 
 @app.post("/render/html")
@@ -149,41 +194,94 @@ async def stage_tensorlake_endpoint(
     if not files:
         raise HTTPException(status_code=400, detail="Please upload at least one PDF")
 
-    results = []
-    for upload in files:
+    async def extract_one(upload: UploadFile) -> dict:
         try:
             payload = await _read_validated_pdf(upload)
-            extraction_result = extract_with_tensorlake(payload)
-            results.append(
-                {
-                    "filename": upload.filename,
-                    "status": "success",
-                    "extraction_result": extraction_result,
-                }
-            )
+            async with _stage_semaphore("tensorlake"):
+                extraction_result = await extract_with_tensorlake_async(payload)
+            return {
+                "filename": upload.filename,
+                "status": "success",
+                "extraction_result": extraction_result,
+            }
         except HTTPException as exc:
-            results.append({"filename": upload.filename, "status": "error", "error": exc.detail})
+            return {"filename": upload.filename, "status": "error", "error": exc.detail}
         except Exception as exc:
-            results.append({"filename": upload.filename, "status": "error", "error": f"Tensorlake failed: {exc}"})
+            return {"filename": upload.filename, "status": "error", "error": f"Tensorlake failed: {exc}"}
 
-    return {"results": results}
+    results = await asyncio.gather(*(extract_one(upload) for upload in files))
+    return {"results": list(results)}
 
 
 @app.post("/stage/transform")
-def stage_transform_endpoint(body: StageTransformRequest, _: None = Depends(require_optional_token)):
+async def stage_transform_endpoint(
+    body: StageTransformRequest,
+    bypass_cache: bool = Query(False),
+    _: None = Depends(require_optional_token),
+):
     if not body.items:
         raise HTTPException(status_code=400, detail="No stage payload supplied")
+    return await _stage_transform_results(body, bypass_cache)
 
+
+@app.post("/stage/transform/stream")
+async def stage_transform_stream_endpoint(
+    body: StageTransformRequest,
+    bypass_cache: bool = Query(False),
+    _: None = Depends(require_optional_token),
+):
+    """Same as /stage/transform, as server-sent events.
+
+    Progress events from the transform (attempts, completed top-level keys,
+    output size, aborts) are forwarded as they happen; the last event is
+    ``result`` carrying the usual ``results`` body.
+    """
+    if not body.items:
+        raise HTTPException(status_code=400, detail="No stage payload supplied")
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def events():
+        task = asyncio.create_task(_stage_transform_results(body, bypass_cache, progress=queue.put_nowait))
+        try:
+            while not task.done() or not queue.empty():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield _sse_event(getter.result())
+                else:
+                    getter.cancel()
+            yield _sse_event({"event": "result", **task.result()})
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _sse_event(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(jsonable_encoder(event), ensure_ascii=False)}\n\n"
+
+
+async def _stage_transform_results(
+    body: StageTransformRequest,
+    bypass_cache: bool,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
     if len(body.items) == 1:
         item = body.items[0]
+        metadata: dict = {}
         try:
-            kreditlab_json = transform_to_kreditlab_json(item.extraction_result)
+            kreditlab_json = await transform_to_kreditlab_json_async(
+                item.extraction_result, bypass_cache=bypass_cache, progress=progress, metadata=metadata
+            )
             return {
                 "results": [
                     {
                         "filename": item.filename,
                         "status": "success",
                         "kreditlab_json": kreditlab_json,
+                        "transform_metadata": metadata,
                     }
                 ]
             }
@@ -198,10 +296,14 @@ def stage_transform_endpoint(body: StageTransformRequest, _: None = Depends(requ
                 ]
             }
 
+    combined_metadata: dict = {}
     try:
-        combined_json = transform_multiple_extractions_to_kreditlab_json(
+        combined_json = await transform_multiple_extractions_to_kreditlab_json_async(
             [item.extraction_result for item in body.items],
             source_filenames=[item.filename for item in body.items],
+            bypass_cache=bypass_cache,
+            progress=progress,
+            metadata=combined_metadata,
         )
         return {
             "results": [
@@ -210,6 +312,7 @@ def stage_transform_endpoint(body: StageTransformRequest, _: None = Depends(requ
                     "source_filenames": [item.filename for item in body.items],
                     "status": "success",
                     "kreditlab_json": combined_json,
+                    "transform_metadata": combined_metadata,
                 }
             ]
         }
@@ -226,6 +329,42 @@ def stage_transform_endpoint(body: StageTransformRequest, _: None = Depends(requ
         }
 
 
+@app.post("/stage/case/add-document")
+async def stage_case_add_document_endpoint(
+    body: CaseAddDocumentRequest,
+    bypass_cache: bool = Query(False),
+    _: None = Depends(require_optional_token),
+):
+    """Add one extracted document to an already transformed case.
+
+    Only the new document is transformed; the returned record is the case
+    merged with it by source authority, with figures recomputed.
+    """
+    metadata: dict = {}
+    try:
+        kreditlab_json = await add_document_to_case_async(
+            body.kreditlab_json, body.extraction_result, bypass_cache=bypass_cache, metadata=metadata
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except Exception as exc:
+        return {
+            "result": {
+                "filename": body.filename,
+                "status": "error",
+                "error": f"Case update failed: {exc}",
+            }
+        }
+    return {
+        "result": {
+            "filename": body.filename,
+            "status": "success",
+            "kreditlab_json": kreditlab_json,
+            **metadata,
+        }
+    }
+
+
 @app.post("/stage/render")
 def stage_render_endpoint(body: StageRenderRequest, _: None = Depends(require_optional_token)):
     if not body.items:
@@ -290,16 +429,27 @@ async def _process_single_upload(file: UploadFile, include_pdf: bool):
     payload = await _read_validated_pdf(file)
 
     try:
-        return process_pdf(payload, include_pdf=include_pdf)
+        extraction_result = await extract_with_tensorlake_async(payload)
+        return await process_extraction_async(extraction_result, include_pdf=include_pdf)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Pipeline failed: {exc}") from exc
 
 
-async def _read_validated_pdf(file: UploadFile) -> bytes:
+async def _read_validated_pdf(file: UploadFile) -> BinaryIO:
+    """Validate an upload and return its spooled file without reading it into memory.
+
+    The pipeline hashes and streams this file object directly, so the PDF is not
+    copied into a bytes object or re-written to a temp file on the way to Tensorlake.
+    """
     if file.content_type not in {"application/pdf", "application/octet-stream"}:
         raise HTTPException(status_code=400, detail="Only PDF uploads are supported")
 
-    payload = await file.read()
-    if len(payload) > 20 * 1024 * 1024:
+    size = file.size
+    if size is None:
+        # UploadFile.seek takes only an offset, so the end is found on the file itself.
+        file.file.seek(0, 2)
+        size = file.file.tell()
+    if size > 20 * 1024 * 1024:
         raise HTTPException(status_code=413, detail="File too large. Max supported size is 20MB")
-    return payload
+    await file.seek(0)
+    return file.file
@@ -0,0 +1,193 @@
+"""Micro-benchmark: legacy Stage 2 JSON extraction vs json_tolerant.
+
+Run from the integrated-app directory:
+
+    python benchmarks/bench_json_extraction.py [--rounds 20]
+
+The legacy path mirrors the original _extract_json_object: json.loads, then
+ast.literal_eval on the whole response, then every balanced {...} span,
+longest first, through json.loads, regex repair and literal_eval again. The
+new path is one decode_json_object call; "streamed" feeds the same decoder
+in 24-character pieces, as text deltas arrive. For truncated output the new
+path reports the decoder's closed partial object, marked "partial": it shows
+what was read, but the pipeline never accepts it as a result.
+"""
+
+import argparse
+import ast
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from json_tolerant import TolerantJsonDecoder, decode_json_object  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "stage2_responses.json"
+
+
+def _strip_markdown_fences(text):
+    stripped = text.strip()
+    if stripped.startswith("```") and stripped.endswith("```"):
+        lines = stripped.splitlines()
+        if len(lines) >= 2:
+            return "\n".join(lines[1:-1]).strip()
+    return stripped
+
+
+def _json_object_candidates(text):
+    candidates = []
+    stack = 0
+    start = None
+    in_string = False
+    escaping = False
+    for idx, ch in enumerate(text):
+        if in_string:
+            if escaping:
+                escaping = False
+            elif ch == "\\":
+                escaping = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            continue
+        if ch == "{":
+            if stack == 0:
+                start = idx
+            stack += 1
+        elif ch == "}" and stack > 0:
+            stack -= 1
+            if stack == 0 and start is not None:
+                candidates.append(text[start : idx + 1])
+    if not candidates:
+        start = text.find("{")
+        end = text.rfind("}")
+        if start >= 0 and end > start:
+            candidates.append(text[start : end + 1])
+    candidates.sort(key=len, reverse=True)
+    return candidates
+
+
+def _repair_common_json_issues(text):
+    repaired = text
+    repaired = re.sub(r"([\{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)", r'\1"\2"\3', repaired)
+    repaired = repaired.replace("'", '"')
+    repaired = re.sub(r",\s*([}\]])", r"\1", repaired)
+    repaired = re.sub(r'([}\]"\d])\s*\n\s*("[A-Za-z_][A-Za-z0-9_]*"\s*:)', r"\1,\n\2", repaired)
+    repaired = re.sub(r'([}\]"\d])\s+("[A-Za-z_][A-Za-z0-9_]*"\s*:)', r"\1, \2", repaired)
+    repaired = re.sub(r"\bTrue\b", "true", repaired)
+    repaired = re.sub(r"\bFalse\b", "false", repaired)
+    repaired = re.sub(r"\bNone\b", "null", repaired)
+    return repaired
+
+
+def legacy_extract(text):
+    cleaned = _strip_markdown_fences(text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    try:
+        parsed = ast.literal_eval(cleaned)
+        if isinstance(parsed, dict):
+            return parsed
+    except (ValueError, SyntaxError):
+        pass
+    last_error = None
+    for candidate in _json_object_candidates(cleaned):
+        try:
+            parsed = json.loads(candidate)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError as exc:
+            last_error = exc
+        repaired = _repair_common_json_issues(candidate)
+        if repaired != candidate:
+            try:
+                parsed = json.loads(repaired)
+                if isinstance(parsed, dict):
+                    return parsed
+            except json.JSONDecodeError as exc:
+                last_error = exc
+        try:
+            parsed = ast.literal_eval(candidate)
+            if isinstance(parsed, dict):
+                return parsed
+        except (ValueError, SyntaxError):
+            pass
+    if last_error:
+        raise last_error
+    raise json.JSONDecodeError("No JSON object found in response", cleaned, 0)
+
+
+class Partial(dict):
+    """The decoder's closed partial object of a truncated response."""
+
+
+def new_read(text):
+    decoder = TolerantJsonDecoder()
+    try:
+        return decode_json_object(text, decoder)
+    except ValueError:
+        if decoder.partial is None:
+            raise
+        return Partial(decoder.partial)
+
+
+def new_streamed(text, piece=24):
+    decoder = TolerantJsonDecoder()
+    for start in range(0, len(text), piece):
+        decoder.feed(text[start : start + piece])
+    return decoder.close() or decoder.partial
+
+
+def _best_of(func, text, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        try:
+            func(text)
+        except (ValueError, SyntaxError):
+            pass
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _outcome(func, text):
+    try:
+        parsed = func(text)
+    except (ValueError, SyntaxError) as exc:
+        return f"error ({type(exc).__name__})"
+    if isinstance(parsed, Partial):
+        return f"partial, {len(parsed)} keys"
+    return f"{len(parsed)} keys" if isinstance(parsed, dict) else type(parsed).__name__
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20, help="timing rounds per response (best is kept)")
+    args = parser.parse_args()
+
+    responses = json.loads(FIXTURES.read_text(encoding="utf-8"))["responses"]
+    print(f"{'response':<32}{'KB':>6}{'legacy ms':>11}{'new ms':>9}{'streamed ms':>13}{'speedup':>9}  legacy / new result")
+    legacy_total = new_total = 0.0
+    for item in responses:
+        text = item["response"]
+        legacy = _best_of(legacy_extract, text, args.rounds)
+        new = _best_of(new_read, text, args.rounds)
+        streamed = _best_of(new_streamed, text, args.rounds)
+        legacy_total += legacy
+        new_total += new
+        print(
+            f"{item['name']:<32}{len(text) / 1024:6.1f}{legacy * 1000:11.2f}{new * 1000:9.2f}{streamed * 1000:13.2f}"
+            f"{legacy / new:8.1f}x  {_outcome(legacy_extract, text)} / {_outcome(new_read, text)}"
+        )
+    print(f"{'total':<38}{legacy_total * 1000:11.2f}{new_total * 1000:9.2f}{'':13}{legacy_total / new_total:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark: legacy BeautifulSoup chunk conversion vs table_conversion.
+
+Run from the integrated-app directory:
+
+    python benchmarks/bench_table_conversion.py [--repeat 200]
+
+The legacy path mirrors the original extract_with_tensorlake loop: html.parser,
+one DOM walk for the grid matrix and a second for the row objects, and an eager
+tabulate grid per table. The new path walks each table once and renders the
+same grid per table, as extract_with_tensorlake still does; the speedup is
+reported for that like-for-like pair. The conversion without grid rendering
+is timed separately, as the cost left once grids are rendered on demand.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from tabulate import tabulate
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from table_conversion import LXML_AVAILABLE, chunk_to_page, matrix_to_objects, render_grid  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "tensorlake_chunks.json"
+
+
+def _legacy_matrix(table):
+    return [[cell.get_text(strip=True) for cell in row.find_all(["td", "th"])] for row in table.find_all("tr")]
+
+
+def legacy_convert(chunks):
+    tables_json = []
+    for i, raw_markdown in enumerate(chunks, start=1):
+        soup = BeautifulSoup(raw_markdown, "html.parser")
+        tables = soup.find_all("table")
+        for t in tables:
+            t.extract()
+        soup.get_text("\n", strip=True)
+        for t_index, table in enumerate(tables, start=1):
+            matrix = _legacy_matrix(table)
+            if not matrix or len(matrix) < 2:
+                continue
+            tabulate(matrix[1:], headers=matrix[0], tablefmt="grid")
+            tables_json.append({"page": i, "table_index": t_index, "rows": matrix_to_objects(_legacy_matrix(table))})
+    return tables_json
+
+
+def new_convert(chunks, render_grids=False):
+    tables_json = []
+    for i, raw_markdown in enumerate(chunks, start=1):
+        page = chunk_to_page(raw_markdown)
+        for t_index, matrix in enumerate(page["tables"], start=1):
+            if not matrix or len(matrix) < 2:
+                continue
+            if render_grids:
+                render_grid(matrix)
+            tables_json.append({"page": i, "table_index": t_index, "rows": matrix_to_objects(matrix)})
+    return tables_json
+
+
+def _best_of(func, chunks, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(chunks)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="times the fixture pages are repeated")
+    args = parser.parse_args()
+
+    chunks = json.loads(FIXTURES.read_text(encoding="utf-8"))["chunks"] * args.repeat
+    if legacy_convert(chunks[:4]) != new_convert(chunks[:4]):
+        raise SystemExit("legacy and new conversions disagree on the fixture tables")
+
+    legacy = _best_of(legacy_convert, chunks)
+    new = _best_of(lambda pages: new_convert(pages, render_grids=True), chunks)
+    new_no_grid = _best_of(new_convert, chunks)
+    print(f"pages: {len(chunks)}  parser: {'lxml' if LXML_AVAILABLE else 'html.parser'}")
+    print(f"legacy (with grids):  {legacy * 1000:8.1f} ms  ({legacy / len(chunks) * 1e6:7.1f} us/page)")
+    print(f"new (with grids):     {new * 1000:8.1f} ms  ({new / len(chunks) * 1e6:7.1f} us/page)")
+    print(f"speedup (with grids): {legacy / new:.1f}x")
+    print(f"new (grids deferred): {new_no_grid * 1000:8.1f} ms  ({new_no_grid / len(chunks) * 1e6:7.1f} us/page)")
+
+
+if __name__ == "__main__":
+    main()
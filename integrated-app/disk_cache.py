@@ -0,0 +1,101 @@
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class DiskLRUCache:
+    """Size-bounded LRU cache persisted in SQLite.
+
+    The database file is shared by every process that opens the same path, so
+    all uvicorn workers on a host see the same entries and the same hit/miss
+    counters. Values must be JSON-serializable and are stored zlib-compressed.
+    With ``ttl_seconds`` set, entries older than that are treated as misses
+    and deleted when next looked up.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, ttl_seconds: Optional[float] = None) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL, "
+                "created_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "created_at" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN created_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def _bump(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value, COALESCE(created_at, last_access) FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, "expirations")
+                row = None
+            if row is None:
+                self._bump(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._bump(conn, "hits")
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set(self, key: str, value: Any) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+
+        with closing(self._connect()) as conn, conn:
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, last_access, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            # Evict least recently used entries until we are back under budget.
+            for old_key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                total -= size
+                self._bump(conn, "evictions")
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "expirations": counters.get("expirations", 0),
+        }
@@ -0,0 +1,109 @@
+import re
+from typing import Any, Dict, Iterable, Iterator
+
+from table_conversion import matrix_to_objects, render_grid
+
+TEXT_VIEW_KEYS = ("full_text_output", "full_text_with_tables")
+PAGE_MARKER_RE = re.compile(r"^===== PAGE (\d+) =====$", re.MULTILINE)
+
+
+class ExtractionResult(dict):
+    """Extraction output held as one record per page.
+
+    Stored keys are ``pages`` (``{"page", "text", "tables"}`` with tables as
+    string matrices, header row first), ``tables_json`` and, when available,
+    ``page_map``. The legacy ``full_text_output`` and ``full_text_with_tables``
+    strings are not stored: they are joined from the pages whenever they are
+    read, including by ``json.dumps`` and FastAPI's encoder, so existing
+    callers and API clients see the same contract while the text is only kept
+    once and grid art is rendered only when somebody asks for it.
+    """
+
+    def __missing__(self, key: str) -> Any:
+        if key == "full_text_output":
+            return self.text_view(with_tables=False)
+        if key == "full_text_with_tables":
+            return self.text_view(with_tables=True)
+        raise KeyError(key)
+
+    def text_view(self, with_tables: bool) -> str:
+        parts: list[str] = []
+        for page in self.get("pages", []):
+            parts.append(f"\n\n===== PAGE {page['page']} =====\n\n{page['text']}\n\n")
+            if not with_tables:
+                continue
+            for matrix in page["tables"]:
+                if matrix and len(matrix) >= 2:
+                    parts.append(render_grid(matrix) + "\n\n")
+        return "".join(parts)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        return key in TEXT_VIEW_KEYS or dict.__contains__(self, key)
+
+    def keys(self) -> list[str]:
+        return list(dict.keys(self)) + [key for key in TEXT_VIEW_KEYS if not dict.__contains__(self, key)]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def items(self) -> list[tuple[str, Any]]:
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self) -> list[Any]:
+        return [self[key] for key in self.keys()]
+
+    def stored(self) -> Dict[str, Any]:
+        """Plain dict of the stored keys only, for compact persistence."""
+        return dict(dict.items(self))
+
+
+def build_extraction_result(pages: Iterable[Dict[str, Any]]) -> ExtractionResult:
+    """Assemble the extraction contract from ``{"page", "text", "tables"}`` records."""
+    page_records: list[Dict[str, Any]] = []
+    tables: list[Dict[str, Any]] = []
+    for page in pages:
+        record = {"page": page["page"], "text": page["text"], "tables": page["tables"]}
+        page_records.append(record)
+        for t_index, matrix in enumerate(record["tables"], start=1):
+            if not matrix or len(matrix) < 2:
+                continue
+            tables.append(
+                {
+                    "page": record["page"],
+                    "table_index": t_index,
+                    "rows": matrix_to_objects(matrix),
+                }
+            )
+    return ExtractionResult(pages=page_records, tables_json={"tables": tables})
+
+
+def iter_pages(extraction_result: Dict[str, Any]) -> list[Dict[str, Any]]:
+    """Return per-page records for any extraction result.
+
+    Page records are used directly when present. Older payloads that only carry
+    ``full_text_with_tables`` are split on their ``===== PAGE n =====`` markers;
+    their tables stay embedded in the page text as grid art and ``tables`` is
+    empty.
+    """
+    pages = extraction_result.get("pages")
+    if isinstance(pages, list):
+        return pages
+
+    text = extraction_result.get("full_text_with_tables") or ""
+    markers = list(PAGE_MARKER_RE.finditer(text))
+    if not markers:
+        return [{"page": 1, "text": text.strip(), "tables": []}] if text.strip() else []
+
+    records = []
+    for index, marker in enumerate(markers):
+        end = markers[index + 1].start() if index + 1 < len(markers) else len(text)
+        records.append({"page": int(marker.group(1)), "text": text[marker.end() : end].strip(), "tables": []})
+    return records
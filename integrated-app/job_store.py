@@ -0,0 +1,70 @@
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class ParseJobStore:
+    """Remembers Tensorlake file and parse ids per submitted PDF, in SQLite.
+
+    Rows are keyed by the hash of the exact bytes sent to Tensorlake plus the
+    parsing-options fingerprint. A retried request, or another worker handling
+    the same document, can look the key up and resume from the furthest step
+    already reached instead of uploading and parsing again. Rows older than
+    ``ttl_seconds`` are ignored because Tensorlake may have expired the ids.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parse_jobs ("
+                "key TEXT PRIMARY KEY, file_id TEXT, parse_id TEXT, status TEXT, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT file_id, parse_id, status, updated_at FROM parse_jobs WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None or time.time() - row[3] > self.ttl_seconds:
+            return None
+        return {"file_id": row[0], "parse_id": row[1], "status": row[2]}
+
+    def record_upload(self, key: str, file_id: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_jobs(key, file_id, parse_id, status, updated_at) "
+                "VALUES (?, ?, NULL, 'uploaded', ?)",
+                (key, file_id, time.time()),
+            )
+
+    def record_parse(self, key: str, parse_id: str, status: str = "pending") -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE parse_jobs SET parse_id = ?, status = ?, updated_at = ? WHERE key = ?",
+                (parse_id, status, time.time(), key),
+            )
+
+    def mark(self, key: str, status: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE parse_jobs SET status = ?, updated_at = ? WHERE key = ?",
+                (status, time.time(), key),
+            )
+
+    def forget_parse(self, key: str) -> None:
+        """Drop a failed parse id but keep the uploaded file for a fresh parse."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE parse_jobs SET parse_id = NULL, status = 'uploaded', updated_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
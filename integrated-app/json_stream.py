@@ -0,0 +1,109 @@
+"""Incremental structural scan of a JSON object that arrives in pieces.
+
+The scanner does not build values; it tracks nesting and string state one
+character at a time so a streaming caller learns, while tokens are still
+arriving, when each top-level key's value has closed and when the output has
+gone wrong in a way no repair pass could fix. Problems that
+``json_tolerant`` reads past (unquoted keys, single quotes, missing or
+trailing commas) are deliberately tolerated here.
+"""
+
+from typing import Optional
+
+DEFAULT_MAX_PREAMBLE_CHARS = 500
+_CLOSERS = {"}": "{", "]": "["}
+
+
+class MalformedStreamError(ValueError):
+    """Raised by JsonStreamScanner.feed when the output cannot become a usable JSON object."""
+
+
+class JsonStreamScanner:
+    def __init__(self, max_preamble_chars: int = DEFAULT_MAX_PREAMBLE_CHARS) -> None:
+        self.max_preamble_chars = max_preamble_chars
+        self.completed_keys: list[str] = []
+        self.chars = 0
+        self.done = False
+        self._preamble = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaping = False
+        self._expect_key = False
+        self._key_chars: Optional[list[str]] = None
+        self._current_key: Optional[str] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._stack) or self.done
+
+    def feed(self, text: str) -> list[str]:
+        """Consume the next piece of output and return the top-level keys whose values closed in it."""
+        closed: list[str] = []
+        for ch in text:
+            self.chars += 1
+            if self.done:
+                continue
+            if not self._stack:
+                self._scan_preamble(ch)
+                continue
+            if self._in_string:
+                self._scan_string(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if len(self._stack) == 1 and self._expect_key:
+                    self._key_chars = []
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in _CLOSERS:
+                if self._stack[-1] != _CLOSERS[ch]:
+                    raise MalformedStreamError(
+                        f"'{ch}' closes '{self._stack[-1]}' at character {self.chars}"
+                    )
+                self._stack.pop()
+                if len(self._stack) == 1:
+                    self._close_value(closed)
+                elif not self._stack:
+                    self._close_value(closed)
+                    self.done = True
+            elif len(self._stack) == 1:
+                if ch == ",":
+                    self._close_value(closed)
+                    self._expect_key = True
+                elif ch == ":":
+                    self._expect_key = False
+        return closed
+
+    def _scan_preamble(self, ch: str) -> None:
+        if ch == "{":
+            self._stack.append(ch)
+            self._expect_key = True
+            return
+        if not ch.isspace():
+            self._preamble += 1
+            if self._preamble > self.max_preamble_chars:
+                raise MalformedStreamError(
+                    f"no JSON object started within the first {self.max_preamble_chars} characters"
+                )
+
+    def _scan_string(self, ch: str) -> None:
+        if self._escaping:
+            self._escaping = False
+        elif ch == "\\":
+            self._escaping = True
+        elif ch == '"':
+            self._in_string = False
+            if self._key_chars is not None:
+                self._current_key = "".join(self._key_chars)
+                self._key_chars = None
+                self._expect_key = False
+            return
+        if self._key_chars is not None:
+            self._key_chars.append(ch)
+
+    def _close_value(self, closed: list[str]) -> None:
+        if self._current_key is not None:
+            self.completed_keys.append(self._current_key)
+            closed.append(self._current_key)
+            self._current_key = None
@@ -0,0 +1,434 @@
+"""Single-pass tolerant decoding of the JSON object in a model response.
+
+Model output is usually valid JSON, but not always: it may sit in markdown
+fences or after a sentence of prose, carry trailing or missing commas,
+unquoted keys, single-quoted strings or Python literals (``True``, ``None``),
+or stop mid-object when ``max_tokens`` runs out. ``TolerantJsonDecoder``
+reads all of that in one left-to-right pass, building values as it goes, so
+the cost stays linear in the response size however broken it is.
+
+Text may be fed in pieces as it streams; a token split between pieces is held
+back until the rest arrives. Text outside objects (prose, fences, wrappers) is
+skipped. When an object cannot be read, the decoder abandons it whole,
+skipping to its closing brace, and looks for the next one after it; nothing
+nested in a broken object is read as an object of its own. Of the objects
+read, the largest is the result; an object still open when the input ends
+is available, closed, as ``partial``.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]*")
+_STRING_RUN_RE = {'"': re.compile(r'[^"\\]*'), "'": re.compile(r"[^'\\]*")}
+_SKIP_RUN_RE = re.compile(r"[^\"'{}\[\]]*")
+_NUMBER_RE = re.compile(r"[-+]?Infinity|[-+0-9.eE]+")
+_INTEGER_RE = re.compile(r"[-+]?[0-9]+")
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_HEX4_RE = re.compile(r"[0-9a-fA-F]{4}")
+_NUMBER_START = frozenset("-+0123456789.")
+_IDENTIFIER_START = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+_LITERALS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "True": True,
+    "False": False,
+    "None": None,
+    "NaN": float("nan"),
+    "Infinity": float("inf"),
+}
+_RAW_DECODER = json.JSONDecoder()
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Parser states of an open container.
+_KEY, _COLON, _VALUE, _NEXT = range(4)
+
+
+class TolerantJsonError(json.JSONDecodeError):
+    """Raised when a response holds no readable JSON object."""
+
+    def __init__(self, msg: str, pos: int, lineno: int, colno: int) -> None:
+        ValueError.__init__(self, f"{msg}: line {lineno} column {colno} (char {pos})")
+        self.msg = msg
+        self.doc = ""
+        self.pos = pos
+        self.lineno = lineno
+        self.colno = colno
+
+    def __reduce__(self):
+        return self.__class__, (self.msg, self.pos, self.lineno, self.colno)
+
+
+class _Invalid(Exception):
+    def __init__(self, msg: str, pos: int) -> None:
+        super().__init__(msg)
+        self.msg = msg
+        self.pos = pos
+
+
+class TolerantJsonDecoder:
+    def __init__(self) -> None:
+        self.objects = 0
+        self.partial: Optional[dict] = None
+        self.error: Optional[TolerantJsonError] = None
+        self.closed = False
+        self._best: Optional[dict] = None
+        self._best_size = -1
+        self._buffer = ""
+        self._offset = 0
+        self._lines = 0
+        self._line_start = 0
+        self._root_start = 0
+        # Open containers, outermost first: [container, pending key, state].
+        self._stack: list[list[Any]] = []
+        # The string being read, if any: its pieces, quote and whether it is a key.
+        self._string: Optional[list[str]] = None
+        self._quote = '"'
+        self._string_is_key = False
+        self._surrogates = False
+        # While skipping an abandoned object: its open brackets and the quote of the string being skipped.
+        self._skip_depth = 0
+        self._skip_quote: Optional[str] = None
+
+    @property
+    def result(self) -> Optional[dict]:
+        """The largest complete object read so far."""
+        return self._best
+
+    def feed(self, text: str) -> None:
+        """Consume the next piece of the response."""
+        if self.closed:
+            raise ValueError("feed() called after close()")
+        self._buffer += text
+        self._run(final=False)
+
+    def close(self) -> Optional[dict]:
+        """Finish the input; return ``result`` and set ``partial`` if an object was left open."""
+        if not self.closed:
+            self.closed = True
+            self._run(final=True)
+            if self._stack:
+                self.partial = self._close_open_object()
+        return self._best
+
+    def decode(self) -> dict:
+        """``close()``, raising TolerantJsonError when no complete object was read."""
+        result = self.close()
+        if result is not None:
+            return result
+        if self.error is not None:
+            raise self.error
+        if self.partial is not None:
+            raise self._error("Unterminated JSON object", self._offset)
+        raise TolerantJsonError("No JSON object found in response", 0, 1, 1)
+
+    # -- scanning ---------------------------------------------------------
+
+    def _run(self, final: bool) -> None:
+        buffer = self._buffer
+        pos = 0
+        while True:
+            if self._skip_depth:
+                pos = self._skip(buffer, pos)
+                if self._skip_depth:
+                    break
+            try:
+                pos = self._scan(buffer, pos, final)
+                break
+            except _Invalid as exc:
+                self.error = self._error(exc.msg, self._offset + exc.pos, buffer, exc.pos)
+                # Skip the rest of the broken object, from the offending character to its end.
+                self._skip_depth = len(self._stack)
+                self._skip_quote = None
+                self._stack.clear()
+                self._string = None
+                pos = exc.pos
+        self._lines += buffer.count("\n", 0, pos)
+        newline = buffer.rfind("\n", 0, pos)
+        if newline >= 0:
+            self._line_start = self._offset + newline + 1
+        self._offset += pos
+        self._buffer = buffer[pos:]
+
+    def _scan(self, buffer: str, pos: int, final: bool) -> int:
+        """Advance through ``buffer`` from ``pos``; return where to resume once more text arrives."""
+        end = len(buffer)
+        stack = self._stack
+        while pos < end:
+            if self._string is not None:
+                pos = self._scan_string(buffer, pos, final)
+                if self._string is not None:
+                    return pos
+                continue
+
+            if not stack:
+                start = buffer.find("{", pos)
+                if start < 0:
+                    return end
+                self._root_start = self._offset + start
+                stack.append([{}, None, _KEY])
+                pos = start + 1
+                continue
+
+            ch = buffer[pos]
+            if ch in " \t\r\n":
+                pos = _WHITESPACE_RE.match(buffer, pos).end()
+                continue
+
+            frame = stack[-1]
+            container, _, state = frame
+            is_object = isinstance(container, dict)
+
+            if ch == ",":
+                opening = _KEY if is_object else _VALUE
+                if state == _NEXT:
+                    frame[2] = opening
+                elif state != opening:
+                    raise _Invalid("Unexpected ','", pos)
+                # A doubled comma is dropped.
+                pos += 1
+                continue
+
+            if ch in "}]":
+                # Trailing commas leave an object in _KEY and an array in _VALUE.
+                if (ch == "}") != is_object or (is_object and state in (_COLON, _VALUE)):
+                    raise _Invalid(f"Unexpected '{ch}'", pos)
+                stack.pop()
+                if not stack:
+                    self._complete(container, self._offset + pos + 1)
+                pos += 1
+                continue
+
+            if state == _NEXT:
+                # A missing comma: the next key or element follows directly.
+                frame[2] = state = _KEY if is_object else _VALUE
+
+            if state == _KEY:
+                if ch in "\"'":
+                    self._begin_string(ch, is_key=True)
+                    pos += 1
+                elif ch in _IDENTIFIER_START or ch in _NUMBER_START:
+                    # Unquoted keys; numeric ones are kept as strings, as json.dumps would write them.
+                    match = (_IDENTIFIER_RE if ch in _IDENTIFIER_START else _NUMBER_RE).match(buffer, pos)
+                    if match.end() == end and not final:
+                        return pos
+                    frame[1] = match.group()
+                    frame[2] = _COLON
+                    pos = match.end()
+                else:
+                    raise _Invalid("Expecting property name", pos)
+                continue
+
+            if state == _COLON:
+                if ch != ":":
+                    raise _Invalid("Expecting ':' delimiter", pos)
+                frame[2] = _VALUE
+                pos += 1
+                continue
+
+            # state == _VALUE
+            if ch == "{" or ch == "[":
+                child: Any = {} if ch == "{" else []
+                self._add(child)
+                stack.append([child, None, _KEY if ch == "{" else _VALUE])
+                pos += 1
+            elif ch in "\"'":
+                self._begin_string(ch, is_key=False)
+                pos += 1
+            elif ch in _NUMBER_START:
+                match = _NUMBER_RE.match(buffer, pos)
+                if match.end() == end and not final:
+                    return pos
+                self._add(self._number(match.group(), pos, truncated=final and match.end() == end))
+                pos = match.end()
+            elif ch in _IDENTIFIER_START:
+                match = _IDENTIFIER_RE.match(buffer, pos)
+                if match.end() == end and not final:
+                    return pos
+                word = match.group()
+                if word in _LITERALS:
+                    self._add(_LITERALS[word])
+                elif final and match.end() == end:
+                    self._add(None)
+                else:
+                    raise _Invalid(f"Unexpected value '{word}'", pos)
+                pos = match.end()
+            else:
+                raise _Invalid("Expecting value", pos)
+        return pos
+
+    def _skip(self, buffer: str, pos: int) -> int:
+        """Advance through an abandoned object; return where it ended, or where to resume once more text arrives."""
+        end = len(buffer)
+        while True:
+            if self._skip_quote is not None:
+                pos = _STRING_RUN_RE[self._skip_quote].match(buffer, pos).end()
+                if pos >= end:
+                    return end
+                if buffer[pos] == "\\":
+                    if pos + 1 >= end:
+                        return pos
+                    pos += 2
+                    continue
+                self._skip_quote = None
+                pos += 1
+                continue
+            pos = _SKIP_RUN_RE.match(buffer, pos).end()
+            if pos >= end:
+                return end
+            ch = buffer[pos]
+            pos += 1
+            if ch in "\"'":
+                self._skip_quote = ch
+            elif ch in "{[":
+                self._skip_depth += 1
+            else:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    return pos
+
+    def _begin_string(self, quote: str, is_key: bool) -> None:
+        self._string = []
+        self._quote = quote
+        self._string_is_key = is_key
+        self._surrogates = False
+
+    def _scan_string(self, buffer: str, pos: int, final: bool) -> int:
+        parts = self._string
+        run = _STRING_RUN_RE[self._quote]
+        end = len(buffer)
+        while True:
+            stop = run.match(buffer, pos).end()
+            if stop > pos:
+                parts.append(buffer[pos:stop])
+            pos = stop
+            if pos >= end:
+                return pos
+            if buffer[pos] == self._quote:
+                self._end_string()
+                return pos + 1
+            # A backslash escape.
+            if pos + 1 >= end:
+                if not final:
+                    return pos
+                return end
+            code = buffer[pos + 1]
+            if code == "u":
+                hex_digits = _HEX4_RE.match(buffer, pos + 2)
+                if hex_digits is None:
+                    if end - pos < 6 and not final:
+                        return pos
+                    parts.append("\\u")
+                    pos += 2
+                    continue
+                value = int(hex_digits.group(), 16)
+                if 0xD800 <= value <= 0xDFFF:
+                    self._surrogates = True
+                parts.append(chr(value))
+                pos += 6
+                continue
+            parts.append(_ESCAPES.get(code, "\\" + code))
+            pos += 2
+
+    def _end_string(self) -> None:
+        value = "".join(self._string)
+        if self._surrogates:
+            value = value.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        self._string = None
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame[1] = value
+            frame[2] = _COLON
+        else:
+            self._add(value)
+
+    def _number(self, token: str, pos: int, truncated: bool) -> Any:
+        try:
+            if _INTEGER_RE.fullmatch(token):
+                return int(token)
+            return float(token)
+        except ValueError:
+            if not truncated:
+                raise _Invalid(f"Invalid number '{token}'", pos) from None
+        # Cut off mid-number: keep the digits that did arrive.
+        stripped = token.rstrip("eE+-.")
+        if not stripped or stripped in "+-":
+            return None
+        return self._number(stripped, pos, truncated=True)
+
+    def _add(self, value: Any) -> None:
+        frame = self._stack[-1]
+        container = frame[0]
+        if isinstance(container, dict):
+            container[frame[1]] = value
+            frame[1] = None
+        else:
+            container.append(value)
+        frame[2] = _NEXT
+
+    def _complete(self, obj: dict, end: int) -> None:
+        self.objects += 1
+        size = end - self._root_start
+        if size > self._best_size:
+            self._best = obj
+            self._best_size = size
+
+    def _close_open_object(self) -> dict:
+        if self._string is not None and not self._string_is_key:
+            self._end_string()
+        self._string = None
+        frame = self._stack[-1]
+        if isinstance(frame[0], dict) and frame[2] == _VALUE:
+            frame[0][frame[1]] = None
+        root = self._stack[0][0]
+        self._stack.clear()
+        return root
+
+    def _error(self, msg: str, pos: int, buffer: str = "", buffer_pos: int = 0) -> TolerantJsonError:
+        lineno = self._lines + buffer.count("\n", 0, buffer_pos) + 1
+        newline = buffer.rfind("\n", 0, buffer_pos)
+        line_start = self._offset + newline + 1 if newline >= 0 else self._line_start
+        return TolerantJsonError(msg, pos, lineno, pos - line_start + 1)
+
+
+def decode_json_object(text: str, decoder: Optional[TolerantJsonDecoder] = None) -> Any:
+    """Return the JSON object in a model response.
+
+    Valid JSON (optionally fenced) is returned as parsed, whatever its type;
+    a JSON string that itself holds the object is unwrapped, and one valid
+    object amid prose is read at C speed. Anything else goes through a
+    TolerantJsonDecoder; pass ``decoder`` to read its ``partial`` afterwards.
+    """
+    cleaned = _strip_fences(text)
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    else:
+        if isinstance(parsed, str) and parsed.lstrip().startswith(("{", "```")):
+            return decode_json_object(parsed, decoder)
+        return parsed
+    start = cleaned.find("{")
+    if start >= 0:
+        try:
+            parsed, end = _RAW_DECODER.raw_decode(cleaned, start)
+        except json.JSONDecodeError:
+            pass
+        else:
+            # Only when it is the sole object; otherwise the decoder picks the largest.
+            if cleaned.find("{", end) < 0:
+                return parsed
+    decoder = decoder or TolerantJsonDecoder()
+    decoder.feed(cleaned)
+    return decoder.decode()
+
+
+def _strip_fences(text: str) -> str:
+    stripped = text.strip()
+    if stripped.startswith("```") and stripped.endswith("```"):
+        lines = stripped.splitlines()
+        if len(lines) >= 2:
+            return "\n".join(lines[1:-1]).strip()
+    return stripped
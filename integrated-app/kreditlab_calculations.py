@@ -0,0 +1,624 @@
+"""Compute the KreditLab v7.9 analysis figures from the extracted statements.
+
+Ratios, working capital, DSCR, TNW, funding mismatch and the balance sheet
+check are pure arithmetic over the SOCI/SOFP line items, so they are computed
+here instead of being generated as tokens. Inputs are gathered into a
+period-indexed DataFrame and every figure is one column expression across all
+periods. Missing inputs give missing values for that period, never zeros.
+
+Formulas follow the framework (sections 2, 4 and 6-9): period days are the
+actual calendar days of the period, efficiency ratios carry both the x365 and
+the period-adjusted figure, and WCR uses CCC(adj) x Revenue / Period Days.
+Narrative and judgement fields are left to the model.
+"""
+
+import calendar
+import re
+from copy import deepcopy
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+STANDARD_DAYS = 365
+TNW_STABLE_BAND = 0.05
+
+_MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_abbr) if name}
+_MONTH_RE = re.compile(r"\b(" + "|".join(_MONTHS) + r")[a-z]*\.?\s*'?(\d{4}|\d{2})?", re.IGNORECASE)
+_YEAR_RE = re.compile(r"(20\d{2})")
+
+# SOFP leaves are matched on "<key> <display_name>", lower-cased. Hire
+# purchase and finance lease liabilities are term borrowings (framework
+# section 1.L and the funding profile), whatever their line is called.
+_TERM_BORROWING_RE = re.compile(
+    r"hire.?purchase|\bhp\b|lease|term.?loan|\bbfi\b|bank.?borrowing|borrowings|financing|\bloans?\b"
+)
+_REVOLVING_RE = re.compile(r"overdraft|trade.?financ|banker|revolving|trust.?receipt|invoice.?financ|onshore|\bbas?\b")
+_RELATED_BORROWING_RE = re.compile(r"director|related|holding|associate|subsidiar|shareholder")
+_DIRECTOR_RE = re.compile(r"director")
+_RELATED_CO_RE = re.compile(r"related|holding compan|associate|subsidiar")
+
+PROFITABILITY_RATIOS = {
+    "gross_profit_margin": ("Gross Profit Margin", "(GP / Revenue) x 100"),
+    "operating_profit_margin": ("Operating Profit Margin", "(OP / Revenue) x 100"),
+    "pbt_margin": ("PBT Margin", "(PBT / Revenue) x 100"),
+    "net_profit_margin": ("Net Profit Margin", "(NPAT / Revenue) x 100"),
+    "ebitda_margin": ("EBITDA Margin", "(EBITDA / Revenue) x 100"),
+    "roa": ("Return on Assets", "(NPAT / TA) x 100"),
+    "roe": ("Return on Equity", "(NPAT / TE) x 100"),
+}
+EFFICIENCY_DAYS = {
+    "debtor_days": ("Debtor Days", "(Trade Rec / Revenue) x Days"),
+    "creditor_days": ("Creditor Days", "(Trade Pay / COS) x Days"),
+    "inventory_days": ("Inventory Days", "(Inventory / COS) x Days"),
+    "cash_conversion_cycle": ("Cash Conversion Cycle", "Debtor Days + Inventory Days - Creditor Days"),
+}
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace(",", "").replace("RM", "").strip()
+        negative = text.startswith("(") and text.endswith(")")
+        text = text.strip("()")
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        return -number if negative else number
+    if isinstance(value, dict):
+        for key in ("value", "amount", "total"):
+            if key in value:
+                return _number(value[key])
+    return None
+
+
+def _node(record: Dict[str, Any], *path: str) -> Any:
+    node: Any = record
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _values(node: Any) -> Optional[Dict[str, Any]]:
+    """Return the period -> value mapping of a statement item or section total."""
+    if not isinstance(node, dict):
+        return None
+    if isinstance(node.get("values"), dict):
+        return node["values"]
+    if isinstance(node.get("total"), dict):
+        return _values(node["total"])
+    return None
+
+
+def _series(node: Any, periods: list[str]) -> pd.Series:
+    values = _values(node) or {}
+    return pd.Series([_number(values.get(period)) for period in periods], index=periods, dtype="float64")
+
+
+def _is_subtotal(key: str, child: Dict[str, Any]) -> bool:
+    """Whether an item totals its siblings: ``total``, ``total_borrowings``, "Subtotal ..."."""
+    return any(
+        str(name).strip().lower().startswith(("total", "subtotal", "sub-total", "sub total"))
+        for name in (key, child.get("display_name") or "")
+    )
+
+
+def _leaves(node: Any, prefix: str = "") -> Iterable[tuple[str, Dict[str, Any]]]:
+    """Yield ``(match_text, values)`` for every line item under a SOFP section, totals and subtotals excluded."""
+    if not isinstance(node, dict):
+        return
+    for key, child in node.items():
+        if not isinstance(child, dict) or _is_subtotal(key, child):
+            continue
+        if key == "line_items":
+            yield from _leaves(child, prefix)
+            continue
+        text = f"{prefix}{key} {child.get('display_name', '')}".lower().replace("_", " ")
+        if isinstance(child.get("values"), dict):
+            yield text, child["values"]
+        else:
+            yield from _leaves(child, f"{text} ")
+
+
+def _sum_leaves(sections: Iterable[Any], periods: list[str], include, exclude=None) -> pd.Series:
+    total = pd.Series(float("nan"), index=periods, dtype="float64")
+    for section in sections:
+        for text, values in _leaves(section):
+            if include.search(text) and not (exclude and exclude.search(text)):
+                series = pd.Series([_number(values.get(period)) for period in periods], index=periods, dtype="float64")
+                total = total.add(series, fill_value=0)
+    return total
+
+
+def _fallback(primary: pd.Series, secondary: pd.Series) -> pd.Series:
+    return primary.where(primary.notna(), secondary)
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _period_end(period_key: str, label: str) -> Optional[date]:
+    for text in (label, period_key.replace("_", " ")):
+        match = _MONTH_RE.search(text)
+        years = _YEAR_RE.findall(text)
+        if match and years:
+            return _month_end(int(years[-1]), _MONTHS[match.group(1).lower()[:3]])
+    return None
+
+
+def _fye_month(record: Dict[str, Any], periods: Dict[str, str]) -> Optional[int]:
+    fye = _node(record, "company_info", "financial_year_end")
+    if isinstance(fye, str):
+        match = _MONTH_RE.search(fye)
+        if match:
+            return _MONTHS[match.group(1).lower()[:3]]
+    for key, label in periods.items():
+        if not _is_ytd(key, label):
+            end = _period_end(key, label)
+            if end:
+                return end.month
+    return None
+
+
+def _is_ytd(period_key: str, label: str) -> bool:
+    return "ytd" in f"{period_key} {label}".lower()
+
+
+def period_days(period_key: str, label: str, fye_month: Optional[int]) -> Optional[int]:
+    """Actual calendar days covered by a period (framework section 2).
+
+    A full year counts from the previous year end (365 or 366). A YTD period
+    counts from the day after the last financial year end to the period end.
+    """
+    end = _period_end(period_key, label)
+    if end is None:
+        return STANDARD_DAYS if not _is_ytd(period_key, label) else None
+    if not _is_ytd(period_key, label):
+        return (end - _month_end(end.year - 1, end.month)).days
+    if fye_month is None:
+        return None
+    start_year = end.year if fye_month < end.month else end.year - 1
+    return (end - _month_end(start_year, fye_month)).days
+
+
+def _inputs(record: Dict[str, Any], periods: Dict[str, str]) -> pd.DataFrame:
+    keys = list(periods)
+    soci = record.get("statement_of_comprehensive_income") or {}
+    sofp = record.get("statement_of_financial_position") or {}
+    current_assets = sofp.get("current_assets") or {}
+    current_liabilities = sofp.get("current_liabilities") or {}
+    non_current_assets = sofp.get("non_current_assets") or {}
+    non_current_liabilities = sofp.get("non_current_liabilities") or {}
+
+    frame = pd.DataFrame(index=keys, dtype="float64")
+    frame["revenue"] = _series(soci.get("revenue"), keys)
+    frame["cos"] = _series(soci.get("cost_of_sales"), keys).abs()
+    frame["gross_profit"] = _fallback(_series(soci.get("gross_profit"), keys), frame["revenue"] - frame["cos"])
+    frame["operating_profit"] = _series(soci.get("operating_profit"), keys)
+    frame["pbt"] = _series(soci.get("profit_before_tax"), keys)
+    frame["npat"] = _series(soci.get("net_profit_after_tax"), keys)
+    frame["finance_costs"] = _series(soci.get("finance_costs"), keys).abs()
+    depreciation = pd.Series(
+        [_number((_node(soci, "ebitda", "depreciation_source") or {}).get(key)) for key in keys],
+        index=keys,
+        dtype="float64",
+    )
+    frame["ebitda"] = _fallback(_series(soci.get("ebitda"), keys), frame["operating_profit"] + depreciation)
+
+    frame["current_assets"] = _series(current_assets, keys)
+    frame["current_liabilities"] = _series(current_liabilities, keys)
+    frame["non_current_assets"] = _series(non_current_assets, keys)
+    frame["non_current_liabilities"] = _series(non_current_liabilities, keys)
+    frame["total_assets"] = _series(sofp.get("total_assets"), keys)
+    frame["total_equity"] = _series(sofp.get("equity"), keys)
+    frame["total_liabilities"] = _fallback(
+        _series(sofp.get("total_liabilities"), keys),
+        frame["non_current_liabilities"] + frame["current_liabilities"],
+    )
+    frame["total_equity_and_liabilities"] = _fallback(
+        _series(sofp.get("total_equity_and_liabilities"), keys),
+        frame["total_equity"] + frame["total_liabilities"],
+    )
+
+    # A company without stock or trade credit simply has none: zero when the
+    # section total exists, missing otherwise.
+    has_ca = frame["current_assets"].notna()
+    has_cl = frame["current_liabilities"].notna()
+    trade_receivables = _fallback(
+        _series(current_assets.get("trade_receivables"), keys),
+        _sum_leaves([current_assets], keys, re.compile(r"trade.*receivable"), re.compile(r"other")),
+    )
+    trade_payables = _fallback(
+        _series(current_liabilities.get("trade_payables"), keys),
+        _sum_leaves([current_liabilities], keys, re.compile(r"trade.*payable"), re.compile(r"other")),
+    )
+    frame["trade_receivables"] = trade_receivables.where(trade_receivables.notna() | ~has_ca, 0.0)
+    frame["inventory"] = _series(current_assets.get("inventory"), keys).where(lambda s: s.notna() | ~has_ca, 0.0)
+    frame["trade_payables"] = trade_payables.where(trade_payables.notna() | ~has_cl, 0.0)
+    cash = current_assets.get("cash_and_bank")
+    frame["cash"] = _series(cash, keys)
+    # Section 8: the cash ratio uses the unrestricted cash the cash note
+    # identifies when the face line includes fixed or pledged deposits.
+    unrestricted = _series({"values": _node(cash, "unrestricted_values")}, keys)
+    frame["unrestricted_cash"] = _fallback(unrestricted, frame["cash"])
+
+    liabilities = [non_current_liabilities, current_liabilities]
+    revolving = _sum_leaves([current_liabilities], keys, _REVOLVING_RE, _RELATED_BORROWING_RE)
+    not_term = re.compile(f"{_RELATED_BORROWING_RE.pattern}|{_REVOLVING_RE.pattern}")
+    term = _sum_leaves(liabilities, keys, _TERM_BORROWING_RE, not_term)
+    term_current = _sum_leaves([current_liabilities], keys, _TERM_BORROWING_RE, not_term)
+    borrowings = term.add(revolving, fill_value=0)
+    frame["total_borrowings"] = borrowings.where(borrowings.notna() | ~has_cl, 0.0)
+    frame["term_current"] = term_current.where(term_current.notna() | ~has_cl, 0.0)
+
+    # The funding profile is read from the notes, so it is the better source
+    # for the latest period it describes.
+    facilities = _node(record, "funding_profile", "existing_facilities_identified")
+    if isinstance(facilities, dict) and keys:
+        latest = max(keys, key=lambda key: _period_end(key, periods[key]) or date.min)
+        profile_current = sum(
+            _number(_node(facilities, name, "current_portion")) or 0.0 for name in ("hire_purchase", "term_loan")
+        )
+        profile_total = _number(facilities.get("total_borrowings"))
+        if profile_current:
+            frame.loc[latest, "term_current"] = profile_current
+        if profile_total:
+            frame.loc[latest, "total_borrowings"] = profile_total
+
+    assets = [current_assets, non_current_assets]
+    frame["intangibles"] = _series(non_current_assets.get("intangible_assets"), keys).fillna(0.0)
+    frame["due_from_directors"] = _sum_leaves(assets, keys, _DIRECTOR_RE).fillna(0.0)
+    frame["due_from_related"] = _sum_leaves(assets, keys, _RELATED_CO_RE, _DIRECTOR_RE).fillna(0.0)
+
+    fye_month = _fye_month(record, periods)
+    frame["period_days"] = pd.Series(
+        [period_days(key, periods[key], fye_month) for key in keys], index=keys, dtype="float64"
+    )
+    frame["is_ytd"] = pd.Series([_is_ytd(key, periods[key]) for key in keys], index=keys, dtype="bool")
+    return frame
+
+
+def _divide(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    return numerator / denominator.where(denominator != 0)
+
+
+def _to_values(series: pd.Series, digits: int = 2) -> Dict[str, Any]:
+    values: Dict[str, Any] = {}
+    for key, value in series.items():
+        if pd.isna(value) or value in (float("inf"), float("-inf")):
+            continue
+        values[key] = int(round(value)) if not digits else round(float(value), digits)
+    return values
+
+
+def _ratio(display_name: str, formula: str, series: pd.Series, unit: str, **extra: Any) -> Dict[str, Any]:
+    return {"display_name": display_name, "formula": formula, "values": _to_values(series), "unit": unit, **extra}
+
+
+def _financial_ratios(frame: pd.DataFrame, days: Dict[str, pd.Series]) -> Dict[str, Any]:
+    revenue = frame["revenue"]
+    margins = {
+        "gross_profit_margin": _divide(frame["gross_profit"], revenue),
+        "operating_profit_margin": _divide(frame["operating_profit"], revenue),
+        "pbt_margin": _divide(frame["pbt"], revenue),
+        "net_profit_margin": _divide(frame["npat"], revenue),
+        "ebitda_margin": _divide(frame["ebitda"], revenue),
+        "roa": _divide(frame["npat"], frame["total_assets"]),
+        "roe": _divide(frame["npat"], frame["total_equity"]),
+    }
+    efficiency: Dict[str, Any] = {
+        "asset_turnover": _ratio("Asset Turnover", "Revenue / TA", _divide(revenue, frame["total_assets"]), "x")
+    }
+    for key, (display_name, formula) in EFFICIENCY_DAYS.items():
+        standard, adjusted = days[key]
+        efficiency[key] = {
+            "display_name": display_name,
+            "formula": formula,
+            "values": _to_values(standard, 0),
+            "values_standard": _to_values(standard, 0),
+            "values_period_adjusted": _to_values(adjusted, 0),
+            "period_days": _to_values(frame["period_days"], 0),
+            "unit": "days",
+        }
+    return {
+        "profitability_ratios": {
+            key: _ratio(*PROFITABILITY_RATIOS[key], series * 100, "%") for key, series in margins.items()
+        },
+        "liquidity_ratios": {
+            "current_ratio": _ratio(
+                "Current Ratio",
+                "CA / CL",
+                _divide(frame["current_assets"], frame["current_liabilities"]),
+                "x",
+                benchmark=">= 1.25x",
+            ),
+            "quick_ratio": _ratio(
+                "Quick Ratio",
+                "(CA - Inventory) / CL",
+                _divide(frame["current_assets"] - frame["inventory"], frame["current_liabilities"]),
+                "x",
+            ),
+            "cash_ratio": _ratio(
+                "Cash Ratio",
+                "Unrestricted Cash and Bank Balances / CL",
+                _divide(frame["unrestricted_cash"], frame["current_liabilities"]),
+                "x",
+            ),
+        },
+        "leverage_ratios": {
+            "liabilities_to_equity": _ratio(
+                "Liabilities-to-Equity",
+                "TL / TE",
+                _divide(frame["total_liabilities"], frame["total_equity"]),
+                "x",
+                benchmark="<= 4.0x",
+            ),
+            "liabilities_to_assets": _ratio(
+                "Liabilities-to-Assets", "TL / TA", _divide(frame["total_liabilities"], frame["total_assets"]), "x"
+            ),
+            "gearing_ratio": _ratio(
+                "Gearing Ratio",
+                "Total Borrowings / TE",
+                _divide(frame["total_borrowings"], frame["total_equity"]),
+                "x",
+            ),
+            "interest_coverage": _ratio(
+                "Interest Coverage", "EBITDA / Finance Costs", _divide(frame["ebitda"], frame["finance_costs"]), "x"
+            ),
+            "dscr": _ratio(
+                "DSCR",
+                "EBITDA / (Term Current + Interest)",
+                frame["dscr"],
+                "x",
+                benchmark=">= 1.25x",
+            ),
+        },
+        "efficiency_ratios": efficiency,
+    }
+
+
+def _efficiency_days(frame: pd.DataFrame) -> Dict[str, tuple[pd.Series, pd.Series]]:
+    """Return ``name -> (standard, period_adjusted)`` day counts.
+
+    Full-year periods use the standard figure for both, as the framework
+    requires; YTD periods scale by their actual days instead of 365.
+    """
+    adjusted_days = frame["period_days"].where(frame["is_ytd"], STANDARD_DAYS)
+    ratios = {
+        "debtor_days": _divide(frame["trade_receivables"], frame["revenue"]),
+        "creditor_days": _divide(frame["trade_payables"], frame["cos"]),
+        "inventory_days": _divide(frame["inventory"], frame["cos"]),
+    }
+    days = {key: (ratio * STANDARD_DAYS, ratio * adjusted_days) for key, ratio in ratios.items()}
+    days["cash_conversion_cycle"] = tuple(
+        days["debtor_days"][i] + days["inventory_days"][i] - days["creditor_days"][i] for i in (0, 1)
+    )
+    return days
+
+
+def _sign(value: Optional[float]) -> Optional[str]:
+    if value is None or pd.isna(value):
+        return None
+    return "positive" if value > 0 else "negative"
+
+
+def _latest(series: pd.Series) -> Optional[float]:
+    present = series.dropna()
+    return float(present.iloc[-1]) if not present.empty else None
+
+
+def _working_capital(frame: pd.DataFrame, ccc_adjusted: pd.Series) -> Dict[str, Any]:
+    owc = frame["trade_receivables"] + frame["inventory"] - frame["trade_payables"]
+    # Period days are 365 or 366 for a full year and the actual days for YTD.
+    wcr = ccc_adjusted * _divide(frame["revenue"], frame["period_days"])
+    components = {
+        "trade_receivables": _to_values(frame["trade_receivables"], 0),
+        "inventory": _to_values(frame["inventory"], 0),
+        "trade_payables": _to_values(frame["trade_payables"], 0),
+    }
+    latest_ccc, latest_owc = _latest(ccc_adjusted), _latest(owc)
+    assessment: Dict[str, Any] = {}
+    if latest_ccc is not None:
+        # Decision matrix: CCC decides, OWC only supports.
+        assessment["needs_wc_facility"] = latest_ccc > 0
+        assessment["ccc_status"] = _sign(latest_ccc)
+    if latest_owc is not None:
+        assessment["owc_status"] = _sign(latest_owc)
+    return {
+        "operating_working_capital": {
+            "display_name": "Operating Working Capital",
+            "formula": "Trade Receivables + Inventory - Trade Payables",
+            "values": _to_values(owc, 0),
+            "components": components,
+        },
+        "working_capital_requirement": {
+            "display_name": "Working Capital Requirement",
+            "formula": "CCC(adj) x Revenue / Period Days",
+            "values": _to_values(wcr, 0),
+        },
+        "working_capital_assessment": assessment,
+    }
+
+
+def _dscr(frame: pd.DataFrame) -> Dict[str, Any]:
+    calculation = {}
+    for key, row in frame.iterrows():
+        if pd.isna(row["dscr"]):
+            continue
+        calculation[key] = {
+            "ebitda": int(round(row["ebitda"])),
+            "debt_service": {
+                "principal_repayment": {"total_principal": int(round(row["term_current"]))},
+                "interest_expense": int(round(row["finance_costs"])),
+                "total_debt_service": int(round(row["debt_service"])),
+            },
+            "dscr": round(float(row["dscr"]), 2),
+        }
+    return {"calculation": calculation, "benchmark": ">= 1.25x"}
+
+
+def _tnw(frame: pd.DataFrame) -> Dict[str, Any]:
+    adjustments = frame["intangibles"] + frame["due_from_directors"] + frame["due_from_related"]
+    adjusted = frame["total_equity"] - adjustments
+    calculation = {}
+    for key in frame.index[frame["total_equity"].notna()]:
+        calculation[key] = {
+            "original_tnw": int(round(frame.at[key, "total_equity"])),
+            "adjustments": {
+                "less_intangibles": int(round(frame.at[key, "intangibles"])),
+                "less_due_from_directors": int(round(frame.at[key, "due_from_directors"])),
+                "less_due_from_related_companies": int(round(frame.at[key, "due_from_related"])),
+                "total_adjustments": int(round(adjustments[key])),
+            },
+            "adjusted_tnw": int(round(adjusted[key])),
+        }
+    assessment: Dict[str, Any] = {}
+    latest_original, latest_adjusted = _latest(frame["total_equity"]), _latest(adjusted)
+    if latest_original is not None:
+        assessment["original_tnw_positive"] = latest_original > 0
+    if latest_adjusted is not None:
+        assessment["adjusted_tnw_positive"] = latest_adjusted > 0
+        first = float(adjusted.dropna().iloc[0])
+        change = (latest_adjusted - first) / abs(first) if first else 0.0
+        if change > TNW_STABLE_BAND:
+            assessment["tnw_trend"] = "improving"
+        elif change < -TNW_STABLE_BAND:
+            assessment["tnw_trend"] = "declining"
+        else:
+            assessment["tnw_trend"] = "stable"
+    return {
+        "calculation": calculation,
+        "summary": {
+            "original_tnw": _to_values(frame["total_equity"], 0),
+            "adjusted_tnw": _to_values(adjusted, 0),
+        },
+        "assessment": assessment,
+    }
+
+
+def _gap_status(percentage: float) -> str:
+    if percentage <= 0:
+        return "matched"
+    if percentage <= 15:
+        return "minor_mismatch"
+    if percentage <= 30:
+        return "moderate_mismatch"
+    return "severe_mismatch"
+
+
+def _funding_mismatch(frame: pd.DataFrame) -> Dict[str, Any]:
+    long_term = frame["total_equity"] + frame["non_current_liabilities"]
+    gap = frame["non_current_assets"] - long_term
+    percentage = _divide(gap, frame["non_current_assets"]) * 100
+    layer = {}
+    for key in frame.index[gap.notna()]:
+        pct = 0.0 if pd.isna(percentage[key]) else round(float(percentage[key]), 2)
+        layer[key] = {
+            "non_current_assets": int(round(frame.at[key, "non_current_assets"])),
+            "long_term_funding": {
+                "total_equity": int(round(frame.at[key, "total_equity"])),
+                "non_current_liabilities": int(round(frame.at[key, "non_current_liabilities"])),
+                "total": int(round(long_term[key])),
+            },
+            "funding_gap": int(round(gap[key])),
+            "gap_as_percentage_of_nca": pct,
+            "status": _gap_status(pct),
+        }
+    return {"layer_1_gap_identification": layer}
+
+
+def _integrity(frame: pd.DataFrame) -> Dict[str, Any]:
+    variance = frame["total_assets"] - frame["total_equity_and_liabilities"]
+    verification = {}
+    for key in frame.index[variance.notna()]:
+        verification[key] = {
+            "total_assets": int(round(frame.at[key, "total_assets"])),
+            "total_equity_and_liabilities": int(round(frame.at[key, "total_equity_and_liabilities"])),
+            "variance": int(round(variance[key])),
+            "balanced": bool(abs(variance[key]) < 1),
+        }
+    return {"balance_sheet_verification": verification}
+
+
+def compute_analysis(record: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Return the computed analysis blocks for a record holding the statements.
+
+    Keys are top-level record sections (``financial_ratios``,
+    ``working_capital_analysis``, ``dscr_analysis``, ``tnw_analysis``,
+    ``funding_mismatch_analysis``, ``integrity_check``); each holds only the
+    figures, to be merged under the model's narrative with ``apply_analysis``.
+    """
+    periods = _node(record, "company_info", "periods_analyzed")
+    if not isinstance(periods, dict) or not periods:
+        return {}
+    periods = dict(
+        sorted(
+            ((str(key), str(label)) for key, label in periods.items()),
+            key=lambda item: _period_end(*item) or date.min,
+        )
+    )
+    frame = _inputs(record, periods)
+    frame["debt_service"] = frame["term_current"] + frame["finance_costs"]
+    frame["dscr"] = _divide(frame["ebitda"], frame["debt_service"])
+    days = _efficiency_days(frame)
+
+    working_capital = _working_capital(frame, days["cash_conversion_cycle"][1])
+    return {
+        "financial_ratios": _financial_ratios(frame, days),
+        "working_capital_analysis": working_capital,
+        "dscr_analysis": _dscr(frame),
+        "tnw_analysis": _tnw(frame),
+        "funding_mismatch_analysis": _funding_mismatch(frame),
+        "integrity_check": _integrity(frame),
+    }
+
+
+def _merge(base: Any, computed: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base) if isinstance(base, dict) else {}
+    for key, value in computed.items():
+        if isinstance(value, dict) and value and not _is_period_map(value):
+            merged[key] = _merge(merged.get(key), value)
+        elif value != {}:
+            merged[key] = value
+    return merged
+
+
+def _is_period_map(value: Dict[str, Any]) -> bool:
+    # Period-keyed figures replace the model's mapping outright, so a period
+    # the engine could not compute does not keep a generated number. An empty
+    # mapping (no period computable at all) leaves the model's figures alone.
+    return any(isinstance(key, str) and _YEAR_RE.search(key) for key in value)
+
+
+def apply_analysis(record: Dict[str, Any], computed: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Return a copy of ``record`` with the computed figures merged over its analysis sections.
+
+    Narrative and judgement fields the model wrote (assessments, rationale,
+    facility classification, ratings) are kept; figures are replaced. The
+    working capital verdict is mirrored into the analysis summary.
+    """
+    if computed is None:
+        computed = compute_analysis(record)
+    if not computed:
+        return record
+    result = deepcopy(record)
+    for section, blocks in computed.items():
+        result[section] = _merge(result.get(section), blocks)
+
+    facility_summary = _node(result, "analysis_summary", "facility_suitability_summary")
+    if isinstance(facility_summary, dict):
+        verdict = dict(computed["working_capital_analysis"]["working_capital_assessment"])
+        wcr = computed["working_capital_analysis"]["working_capital_requirement"]["values"]
+        if wcr:
+            verdict["wcr_amount"] = list(wcr.values())[-1]
+        facility_summary["working_capital_assessment"] = _merge(
+            facility_summary.get("working_capital_assessment"), verdict
+        )
+    return result
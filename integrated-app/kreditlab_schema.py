@@ -0,0 +1,78 @@
+"""Machine-readable KreditLab schema, derived from the framework's own Section 12.
+
+The framework states the output schema as an example record. This module
+turns that example into a JSON Schema, so the structure the prompt describes
+can also be handed to the API as a tool ``input_schema``:
+
+- objects keep their example keys as ``properties``; none are required below
+  the top level, since the framework preserves whatever the source shows;
+- objects keyed by example periods (``fy2024``, ``ytd_mon2025``) become maps
+  of any period key to the example value's schema;
+- empty example objects (``values``, ``line_items``) are open objects;
+- ``"a | b | c"`` strings are enums, other non-empty example strings become
+  descriptions, numbers are ``number`` or ``null`` (missing figures are never
+  defaulted to zero).
+"""
+
+import functools
+import json
+import re
+from typing import Any, Dict, Optional
+
+SCHEMA_SECTION_HEADING = "JSON SCHEMA (MATCH EXACTLY)"
+TOOL_NAME = "record_kreditlab_json"
+_PERIOD_KEY_RE = re.compile(r"^(?:fy|ytd_|hy|fp)[a-z_]*\d{4}$")
+
+
+def framework_example(framework_text: str) -> Dict[str, Any]:
+    """Return the example record of the framework's schema section."""
+    heading = framework_text.find(SCHEMA_SECTION_HEADING)
+    if heading < 0:
+        raise ValueError("Framework has no JSON schema section")
+    start = framework_text.index("{", heading)
+    example, _ = json.JSONDecoder().raw_decode(framework_text, start)
+    if not isinstance(example, dict):
+        raise ValueError("Framework schema section is not a JSON object")
+    return example
+
+
+@functools.lru_cache(maxsize=4)
+def schema_from_framework(framework_text: str) -> Dict[str, Any]:
+    """JSON Schema for a full KreditLab record, derived from ``framework_text``."""
+    return _schema_for(framework_example(framework_text))
+
+
+def _schema_for(example: Any) -> Dict[str, Any]:
+    if isinstance(example, dict):
+        if not example:
+            return {"type": "object"}
+        if all(_PERIOD_KEY_RE.match(key) for key in example):
+            return {"type": "object", "additionalProperties": _schema_for(next(iter(example.values())))}
+        return {"type": "object", "properties": {key: _schema_for(value) for key, value in example.items()}}
+    if isinstance(example, list):
+        return {"type": "array", "items": _schema_for(example[0])} if example else {"type": "array"}
+    if isinstance(example, bool):
+        return {"type": "boolean"}
+    if isinstance(example, (int, float)):
+        return {"type": ["number", "null"]}
+    if isinstance(example, str):
+        if " | " in example:
+            return {"type": "string", "enum": [option.strip() for option in example.split(" | ")]}
+        return {"type": "string", "description": example} if example else {"type": "string"}
+    return {}
+
+
+def record_tool(framework_text: str, required: Optional[list[str]] = None) -> Dict[str, Any]:
+    """Tool definition whose input is a KreditLab record (or any subset of its sections)."""
+    schema = schema_from_framework(framework_text)
+    input_schema: Dict[str, Any] = {"type": "object", "properties": schema["properties"]}
+    if required:
+        input_schema["required"] = list(required)
+    return {
+        "name": TOOL_NAME,
+        "description": (
+            "Record the KreditLab JSON produced from the source financial statements. "
+            "Pass only the top-level sections the instructions ask for."
+        ),
+        "input_schema": input_schema,
+    }
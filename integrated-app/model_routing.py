@@ -0,0 +1,66 @@
+"""Score a compacted Stage 2 payload so simple inputs can go to a faster model.
+
+A one-page management P&L and a 60-page audited group report should not
+need the same model. The score adds up four signals from the payload that
+is actually sent: its size, how many tables it carries, how many financial
+years those tables span, and how many source documents were combined. The
+score maps to a tier: ``fast`` for simple inputs, ``strong`` for complex
+ones, ``standard`` in between.
+"""
+
+import json
+import re
+from typing import Any, Dict
+
+TIERS = ("fast", "standard", "strong")
+# A payload scoring at most SIMPLE_MAX_SCORE is routed to the fast tier; one
+# scoring COMPLEX_MIN_SCORE or more to the strong tier.
+SIMPLE_MAX_SCORE = 1.0
+COMPLEX_MIN_SCORE = 4.0
+# Each signal's contribution per unit. Two periods (current and comparative)
+# and one document are the baseline and score nothing.
+CHARS_PER_POINT = 30000
+TABLES_PER_POINT = 12
+POINTS_PER_EXTRA_PERIOD = 0.5
+POINTS_PER_EXTRA_DOCUMENT = 0.75
+MAX_COUNTED_PERIODS = 6
+
+_TABLE_HEADING_RE = re.compile(r"^### .*\btable \d+$", re.MULTILINE)
+_YEAR_RE = re.compile(r"\b(?:199\d|20\d\d)\b")
+
+
+def payload_features(payload: Dict[str, Any]) -> Dict[str, int]:
+    """The routing signals of a Stage 2 payload (see _prepare_stage2_payload)."""
+    tables_text = payload.get("tables") or ""
+    tables_json = (payload.get("tables_json") or {}).get("tables") or []
+    table_source = tables_text + (json.dumps(tables_json, ensure_ascii=False) if tables_json else "")
+    documents = (payload.get("combination_context") or {}).get("total_source_documents") or 1
+    return {
+        "chars": len(payload.get("full_text") or "") + len(tables_text),
+        "tables": len(_TABLE_HEADING_RE.findall(tables_text)) + len(tables_json),
+        "periods": min(len(set(_YEAR_RE.findall(table_source))), MAX_COUNTED_PERIODS),
+        "documents": int(documents),
+    }
+
+
+def complexity_score(features: Dict[str, int]) -> float:
+    return round(
+        features["chars"] / CHARS_PER_POINT
+        + features["tables"] / TABLES_PER_POINT
+        + max(features["periods"] - 2, 0) * POINTS_PER_EXTRA_PERIOD
+        + max(features["documents"] - 1, 0) * POINTS_PER_EXTRA_DOCUMENT,
+        3,
+    )
+
+
+def route_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``{"tier", "score", "features"}`` for a Stage 2 payload."""
+    features = payload_features(payload)
+    score = complexity_score(features)
+    if score <= SIMPLE_MAX_SCORE:
+        tier = "fast"
+    elif score >= COMPLEX_MIN_SCORE:
+        tier = "strong"
+    else:
+        tier = "standard"
+    return {"tier": tier, "score": score, "features": features}
@@ -0,0 +1,151 @@
+"""Local, network-free PDF inspection used ahead of Tensorlake OCR.
+
+pdfplumber and pypdf are optional: when either is missing every helper here
+reports the local path as unavailable and callers fall back to full OCR.
+"""
+
+import io
+import logging
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Optional
+
+from tensorlake_client import PdfSource, as_upload_content
+
+try:
+    import pdfplumber
+except ImportError:  # pragma: no cover - optional dependency
+    pdfplumber = None
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pragma: no cover - optional dependency
+    PdfReader = PdfWriter = None
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_LOCAL_TEXT_MIN_CHARS = 200
+# Share of the page area covered by raster images above which a page is treated
+# as a scan, even if it carries an (often invisible, OCR-generated) text layer.
+SCANNED_IMAGE_COVERAGE = 0.5
+# Sparse pages without meaningful imagery (covers, blank separators) have nothing to OCR.
+SPARSE_PAGE_IMAGE_COVERAGE = 0.1
+# pdfminer emits "(cid:NN)" for glyphs it cannot map to unicode; a page full of
+# them has a broken text layer and needs OCR.
+MAX_UNMAPPED_GLYPH_RATIO = 0.05
+
+LOCAL_EXTRACTION_AVAILABLE = pdfplumber is not None and PdfReader is not None
+PDF_SPLIT_AVAILABLE = PdfReader is not None
+
+
+def _as_stream(pdf: PdfSource) -> BinaryIO:
+    content = as_upload_content(pdf)
+    if isinstance(content, bytes):
+        return io.BytesIO(content)
+    return content
+
+
+def _image_coverage(page: Any) -> float:
+    page_area = float(page.width * page.height) or 1.0
+    covered = 0.0
+    for image in page.images:
+        width = max(0.0, min(image["x1"], page.width) - max(image["x0"], 0))
+        height = max(0.0, min(image["bottom"], page.height) - max(image["top"], 0))
+        covered += width * height
+    return min(1.0, covered / page_area)
+
+
+def _classify_page(page: Any, text: str, min_chars: int) -> str:
+    coverage = _image_coverage(page)
+    char_count = len(page.chars)
+    unmapped = text.count("(cid:")
+    if char_count and unmapped / char_count > MAX_UNMAPPED_GLYPH_RATIO:
+        return "scanned"
+    if char_count >= min_chars and coverage < SCANNED_IMAGE_COVERAGE:
+        return "digital"
+    if coverage < SPARSE_PAGE_IMAGE_COVERAGE:
+        return "digital"
+    return "scanned"
+
+
+def _extract_page(page: Any, full_text: str) -> Dict[str, Any]:
+    tables = page.find_tables()
+    bboxes = [table.bbox for table in tables]
+
+    def outside_tables(obj: Dict[str, Any]) -> bool:
+        if obj.get("object_type") != "char":
+            return True
+        x_mid = (obj["x0"] + obj["x1"]) / 2
+        y_mid = (obj["top"] + obj["bottom"]) / 2
+        return not any(x0 <= x_mid <= x1 and top <= y_mid <= bottom for x0, top, x1, bottom in bboxes)
+
+    text = full_text
+    if bboxes:
+        text = page.filter(outside_tables).extract_text() or ""
+    matrices = []
+    for table in tables:
+        matrix = [[(cell or "").strip() for cell in row] for row in table.extract()]
+        matrices.append(matrix)
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return {"text": "\n".join(lines), "tables": matrices}
+
+
+def analyse_pdf(pdf: PdfSource, min_chars: Optional[int] = None) -> Optional[list[Dict[str, Any]]]:
+    """Classify every page and extract digital pages from the text layer.
+
+    Returns one record per page: ``{"page", "kind", "text", "tables", "layer_text"}``
+    where ``kind`` is ``"digital"`` (text and table matrices filled in) or
+    ``"scanned"`` (needs OCR). ``layer_text`` is whatever the text layer holds,
+    even for scans, and is only meant for cheap relevance scoring. Returns None
+    when local extraction is unavailable or the PDF cannot be opened locally.
+    """
+    if not LOCAL_EXTRACTION_AVAILABLE:
+        return None
+    if min_chars is None:
+        min_chars = int(os.environ.get("LOCAL_TEXT_MIN_CHARS", DEFAULT_LOCAL_TEXT_MIN_CHARS))
+
+    records: list[Dict[str, Any]] = []
+    try:
+        with pdfplumber.open(_as_stream(pdf)) as document:
+            for number, page in enumerate(document.pages, start=1):
+                text = page.extract_text() or ""
+                kind = _classify_page(page, text, min_chars)
+                record: Dict[str, Any] = {
+                    "page": number,
+                    "kind": kind,
+                    "text": "",
+                    "tables": [],
+                    "layer_text": text,
+                }
+                if kind == "digital":
+                    record.update(_extract_page(page, text))
+                records.append(record)
+                page.flush_cache()
+    except Exception as exc:
+        LOGGER.warning("Local PDF analysis failed, falling back to OCR: %s", exc)
+        return None
+    finally:
+        if not isinstance(pdf, (bytes, bytearray, memoryview)):
+            pdf.seek(0)
+    return records
+
+
+def count_pages(pdf: PdfSource) -> int:
+    count = len(PdfReader(_as_stream(pdf)).pages)
+    if not isinstance(pdf, (bytes, bytearray, memoryview)):
+        pdf.seek(0)
+    return count
+
+
+def split_pdf(pdf: PdfSource, page_groups: Iterable[Iterable[int]]) -> list[bytes]:
+    """Return one new PDF per group of 1-based page numbers, reading the source once."""
+    reader = PdfReader(_as_stream(pdf))
+    outputs: list[bytes] = []
+    for group in page_groups:
+        writer = PdfWriter()
+        for number in group:
+            writer.add_page(reader.pages[number - 1])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        outputs.append(buffer.getvalue())
+    if not isinstance(pdf, (bytes, bytearray, memoryview)):
+        pdf.seek(0)
+    return outputs
@@ -1,18 +1,23 @@
 import importlib.util
-import ast
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import sqlite3
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from copy import deepcopy
-from typing import Any, Dict, Optional, Tuple, Iterable
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import re
+import statistics
 
+import anthropic
 import httpx
-from anthropic import Anthropic
-from bs4 import BeautifulSoup
-from tabulate import tabulate
 from tensorlake.documentai import (
     ChunkingStrategy,
     DocumentAI,
@@ -24,11 +29,54 @@ from tensorlake.documentai import (
     TableParsingFormat,
 )
 
+from anthropic_client import get_anthropic_client, get_async_anthropic_client
+from disk_cache import DiskLRUCache
+from extraction_result import ExtractionResult, build_extraction_result, iter_pages
+from job_store import ParseJobStore
+from json_stream import JsonStreamScanner, MalformedStreamError
+from json_tolerant import TolerantJsonDecoder, decode_json_object
+from kreditlab_calculations import apply_analysis, compute_analysis
+from kreditlab_schema import TOOL_NAME, record_tool
+from model_routing import TIERS, route_payload
+from pdf_pages import (
+    DEFAULT_LOCAL_TEXT_MIN_CHARS,
+    LOCAL_EXTRACTION_AVAILABLE,
+    PDF_SPLIT_AVAILABLE,
+    analyse_pdf,
+    count_pages,
+    split_pdf,
+)
+from relevance import detect_statement, rank_sections, select_within_budget
+from table_conversion import chunk_to_page, estimate_tokens, render_tsv
+from tensorlake_client import (
+    PdfSource,
+    as_upload_content,
+    start_parse_async,
+    upload_file_async,
+    wait_for_parse_async,
+)
+
 LOGGER = logging.getLogger(__name__)
 DEFAULT_ANTHROPIC_MODEL = "claude-sonnet-4-6"
 FALLBACK_ANTHROPIC_MODEL = "claude-opus-4-1-20250805"
+DEFAULT_ANTHROPIC_FAST_MODEL = "claude-haiku-4-5"
 DEFAULT_ANTHROPIC_MAX_TOKENS = 16384
+DEFAULT_ANTHROPIC_MODEL_UNAVAILABLE_TTL_SECONDS = 900
 DEFAULT_STAGE2_INPUT_CHAR_BUDGET = 85000
+# Streamed output between two output_progress events.
+STREAM_PROGRESS_EVERY_CHARS = 4000
+DEFAULT_EXTRACTION_CACHE_MAX_MB = 512
+DEFAULT_TRANSFORM_CACHE_MAX_MB = 256
+DEFAULT_TRANSFORM_CACHE_TTL_HOURS = 168
+DEFAULT_TENSORLAKE_SHARD_CONCURRENCY = 4
+DEFAULT_TENSORLAKE_JOB_TTL_HOURS = 24
+DEFAULT_STAGE2_MAP_CONCURRENCY = 4
+# Recent transform durations kept per routing tier for the /metrics median.
+ROUTE_LATENCY_SAMPLES = 200
+# Bump whenever the shape of the extraction result changes so stale entries are ignored.
+EXTRACTION_CACHE_VERSION = 2
+# Bump whenever post-processing of validated Stage 2 output changes.
+TRANSFORM_CACHE_VERSION = 2
 REQUIRED_TOP_LEVEL_KEYS = {
     "_schema_info",
     "company_info",
@@ -37,6 +85,47 @@ REQUIRED_TOP_LEVEL_KEYS = {
     "analysis_summary",
 }
 
+# With STAGE2_SECTIONED_ENABLED, these analysis sections are generated by
+# concurrent calls once the source-derived core of the record exists.
+STAGE2_ANALYSIS_SECTIONS = (
+    "financial_ratios",
+    "working_capital_analysis",
+    "funding_mismatch_analysis",
+    "dscr_analysis",
+    "tnw_analysis",
+    "analysis_summary",
+)
+STAGE2_CORE_REQUIRED_KEYS = tuple(sorted(REQUIRED_TOP_LEVEL_KEYS - set(STAGE2_ANALYSIS_SECTIONS)))
+# Sections the multi-document reconciliation pass rewrites over the merged record.
+STAGE2_RECONCILE_SECTIONS = (
+    "analysis_summary",
+    "working_capital_analysis",
+    "funding_mismatch_analysis",
+    "dscr_analysis",
+    "tnw_analysis",
+)
+# Ordered from cheapest to most expensive; a transform reports the worst
+# tier any of its generations needed.
+RECOVERY_TIERS = ("cached", "direct", "local_repair", "llm_fix", "regenerate", "failed")
+CASE_UPDATE_SOURCES = "an existing case record and one newly added document"
+# With LOCAL_CALCULATIONS_ENABLED, the figures in these sections come from
+# kreditlab_calculations and the model writes only the fields listed here.
+# The cash ratio is computed locally, so the note-identified split it needs
+# (framework section 8) has to be carried in the statements.
+UNRESTRICTED_CASH_INSTRUCTION = (
+    "When the cash note shows that cash_and_bank includes fixed, pledged or otherwise restricted deposits, keep the "
+    "face value in its values and add unrestricted_values: the unrestricted cash per period from the note."
+)
+
+LOCAL_CALCULATION_NARRATIVE_FIELDS = {
+    "working_capital_analysis": (
+        "working_capital_assessment.recommended_facility_type, recommended_facility_amount and rationale"
+    ),
+    "dscr_analysis": "facility_classification and assessment",
+    "tnw_analysis": "assessment.notes",
+    "funding_mismatch_analysis": "funding_structure_assessment",
+}
+
 TOP_LEVEL_KEY_ALIASES = {
     "schema_info": "_schema_info",
     "income_statement": "statement_of_comprehensive_income",
@@ -46,90 +135,192 @@ TOP_LEVEL_KEY_ALIASES = {
     "summary": "analysis_summary",
 }
 
+RELEVANCE_KEYWORDS = (
+    "revenue",
+    "profit",
+    "loss",
+    "income",
+    "balance",
+    "financial position",
+    "cash flow",
+    "audit",
+    "audited",
+    "management",
+    "asset",
+    "liability",
+    "equity",
+    "borrowings",
+    "ebitda",
+    "tax",
+    "year",
+    "202",
+)
+# "year" and "202" appear on nearly every page, so a page needs several distinct
+# hits before it is considered part of the financial statements.
+DEFAULT_OCR_PAGE_MIN_SCORE = 5
+# Border lines of tabulate grid art, as found in extraction results cached before page records.
+GRID_RULE_RE = re.compile(r"^[+|=:\-\s]+$")
+
 ROOT_DIR = Path(__file__).resolve().parents[1]
 PROMPT_PATH = ROOT_DIR / "KreditLab_v7_9_updated.txt"
 RENDERER_PATH = ROOT_DIR / "financial-statement-analysis" / "streamlit_financial_report_v7_7.py"
 
 
+_SYSTEM_PROMPT: Dict[str, Any] = {"mtime_ns": None, "text": ""}
+_SYSTEM_PROMPT_LOCK = threading.Lock()
+
+
 def _load_system_prompt() -> str:
-    if not PROMPT_PATH.exists():
-        raise RuntimeError(f"Prompt file not found at {PROMPT_PATH}")
-    # Keep prompt scope deterministic and small for lower token usage.
-    return PROMPT_PATH.read_text(encoding="utf-8")
-
-
-def _filter_relevant_lines(text: str, max_lines: int = 700) -> str:
-    keywords = (
-        "revenue",
-        "profit",
-        "loss",
-        "income",
-        "balance",
-        "financial position",
-        "cash flow",
-        "audit",
-        "audited",
-        "management",
-        "asset",
-        "liability",
-        "equity",
-        "borrowings",
-        "ebitda",
-        "tax",
-        "year",
-        "202",
-    )
-    selected: list[str] = []
-    for line in text.splitlines():
-        compact = line.strip()
-        if not compact:
-            continue
-        lower = compact.lower()
-        if any(term in lower for term in keywords):
-            selected.append(compact)
-        if len(selected) >= max_lines:
-            break
-    return "\n".join(selected)
+    """Return the KreditLab prompt, re-reading the file only when its mtime changes."""
+    try:
+        mtime_ns = PROMPT_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise RuntimeError(f"Prompt file not found at {PROMPT_PATH}") from None
+
+    with _SYSTEM_PROMPT_LOCK:
+        if _SYSTEM_PROMPT["mtime_ns"] != mtime_ns:
+            # Keep prompt scope deterministic and small for lower token usage.
+            _SYSTEM_PROMPT["text"] = PROMPT_PATH.read_text(encoding="utf-8")
+            _SYSTEM_PROMPT["mtime_ns"] = mtime_ns
+        return _SYSTEM_PROMPT["text"]
+
+
+def _page_relevance_score(text: str) -> int:
+    """Number of distinct relevance keywords present on a page."""
+    lower = text.lower()
+    return sum(1 for term in RELEVANCE_KEYWORDS if term in lower)
+
+
+def _section_text(text: str) -> str:
+    """Non-empty lines of a page, without grid-art rules left over from older extractions."""
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not GRID_RULE_RE.match(line))
 
 
-def _compact_tables_json(tables_json: Dict[str, Any], max_tables: int = 30, max_rows_per_table: int = 40) -> Dict[str, Any]:
-    tables = tables_json.get("tables", []) if isinstance(tables_json, dict) else []
-    compacted_tables: list[Dict[str, Any]] = []
-    for table in tables[:max_tables]:
-        if not isinstance(table, dict):
+def _stage2_sections(extraction_result: Dict[str, Any]) -> list[Dict[str, Any]]:
+    """Split an extraction result into rankable page-text and table sections.
+
+    Tables with page matrices are rendered once as TSV under a
+    ``### page N table M`` heading. Older results without matrices contribute
+    their ``tables_json`` row objects instead.
+    """
+    sections: list[Dict[str, Any]] = []
+    covered_pages: set[Tuple[Any, Any]] = set()
+    for page in iter_pages(extraction_result):
+        document = page.get("source_document")
+        prefix = f"document {document} " if document else ""
+        label = f"{prefix}page {page['page']}"
+        text = _section_text(page["text"])
+        page_statement = detect_statement(text)
+        if text:
+            sections.append(
+                {
+                    "kind": "text",
+                    "label": f"{label} text",
+                    "text": text,
+                    "rendered": f"===== {label.upper()} =====\n{text}",
+                }
+            )
+        for t_index, matrix in enumerate(page.get("tables") or [], start=1):
+            if not matrix or len(matrix) < 2:
+                continue
+            covered_pages.add((document, page["page"]))
+            tsv = render_tsv(matrix)
+            sections.append(
+                {
+                    "kind": "table",
+                    "label": f"{label} table {t_index}",
+                    "text": tsv,
+                    "rendered": f"### {label} table {t_index}\n{tsv}",
+                    "statement": page_statement,
+                }
+            )
+
+    for table in extraction_result.get("tables_json", {}).get("tables", []):
+        if not isinstance(table, dict) or (table.get("source_document"), table.get("page")) in covered_pages:
             continue
-        compacted_tables.append(
+        entry = {
+            "page": table.get("page"),
+            "table_index": table.get("table_index"),
+            "source_document": table.get("source_document"),
+            "rows": table.get("rows") or [],
+        }
+        rendered = json.dumps(entry, ensure_ascii=False)
+        prefix = f"document {entry['source_document']} " if entry["source_document"] else ""
+        sections.append(
             {
-                "page": table.get("page"),
-                "table_index": table.get("table_index"),
-                "source_document": table.get("source_document"),
-                "rows": (table.get("rows") or [])[:max_rows_per_table],
+                "kind": "table_json",
+                "label": f"{prefix}page {entry['page']} table {entry['table_index']}",
+                "text": rendered,
+                "rendered": rendered,
+                "entry": entry,
             }
         )
-    return {"tables": compacted_tables}
+
+    for section in sections:
+        section["size"] = len(section["rendered"]) + 2
+    return sections
+
+
+def _legacy_stage2_tokens(extraction_result: Dict[str, Any], char_budget: int) -> int:
+    """Token estimate of the same budget in the grid-text plus row-object layout, for reporting only."""
+    legacy_text = (extraction_result.get("full_text_with_tables") or "")[:char_budget]
+    legacy_tables = (extraction_result.get("tables_json") or {}).get("tables", [])
+    return estimate_tokens(legacy_text) + estimate_tokens(json.dumps(legacy_tables, ensure_ascii=False))
 
 
 def _prepare_stage2_payload(
     extraction_result: Dict[str, Any],
     combination_context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    """Build the Stage 2 user payload from the most relevant pages and tables.
+
+    Page texts and tables are ranked (see relevance.py) and added best-first
+    until STAGE2_INPUT_CHAR_BUDGET is used up, then emitted in document order.
+    Anything left out is listed under ``input_compaction.omitted`` so the model
+    knows the gap is in the payload, not in the source.
+    """
     char_budget = int(os.environ.get("STAGE2_INPUT_CHAR_BUDGET", DEFAULT_STAGE2_INPUT_CHAR_BUDGET))
-    original_text = extraction_result.get("full_text_with_tables", "")
-    relevant_text = _filter_relevant_lines(original_text)
-    if len(relevant_text) > char_budget:
-        relevant_text = relevant_text[:char_budget]
-
-    payload = {
-        "full_text_with_tables": relevant_text,
-        "tables_json": _compact_tables_json(extraction_result.get("tables_json", {})),
-        "input_compaction": {
-            "enabled": True,
-            "char_budget": char_budget,
-            "notes": "Preserve key accounting lines (including audit/management/profit & loss wording) and trim noise for lower token usage.",
-        },
+    sections = rank_sections(_stage2_sections(extraction_result))
+    selected, dropped = select_within_budget(sections, char_budget)
+
+    payload: Dict[str, Any] = {
+        "full_text": "\n\n".join(section["rendered"] for section in selected if section["kind"] == "text")
+    }
+    tables_text = "\n\n".join(section["rendered"] for section in selected if section["kind"] == "table")
+    if tables_text:
+        payload["tables"] = tables_text
+    tables_json = [section["entry"] for section in selected if section["kind"] == "table_json"]
+    if tables_json:
+        payload["tables_json"] = {"tables": tables_json}
+    payload["input_compaction"] = {
+        "enabled": True,
+        "char_budget": char_budget,
+        "table_format": "tsv: one '### page N table M' heading per table, header row first, tab-separated cells",
+        "omitted": [section["label"] for section in dropped],
+        "notes": (
+            "Pages and tables were ranked by financial relevance and the least relevant omitted to fit the budget; "
+            "do not treat omitted content as zero. Preserve key accounting lines (including audit/management/profit & loss wording)."
+        ),
     }
     if combination_context:
         payload["combination_context"] = combination_context
+
+    if dropped:
+        LOGGER.info(
+            "Stage 2 payload kept %s/%s sections (~%s of ~%s tokens); omitted: %s",
+            len(selected),
+            len(sections),
+            estimate_tokens("".join(section["rendered"] for section in selected)),
+            estimate_tokens("".join(section["rendered"] for section in sections)),
+            ", ".join(f"{section['label']} ({section['score']})" for section in dropped),
+        )
+    if LOGGER.isEnabledFor(logging.INFO):
+        LOGGER.info(
+            "Stage 2 payload: ~%s tokens (grid text and row objects ~%s)",
+            estimate_tokens(json.dumps(payload, ensure_ascii=False)),
+            _legacy_stage2_tokens(extraction_result, char_budget),
+        )
     return payload
 
 
@@ -207,13 +398,64 @@ def _merge_structure(base: Any, incoming: Any) -> Any:
     return deepcopy(incoming)
 
 
+def _source_authority(label: str) -> int:
+    """Rank a period label by how authoritative its source is.
+
+    Restated audited figures are the corrected position, then audited,
+    unaudited and management accounts.
+    """
+    lower = label.lower()
+    if "unaudited" in lower:
+        return 2
+    if "audited" in lower:
+        return 4 if "restated" in lower else 3
+    if "(ma)" in lower or "management" in lower or "ytd" in lower:
+        return 1
+    return 0
+
+
+def _record_periods(record: Dict[str, Any]) -> Dict[str, str]:
+    periods = record.get("company_info", {}).get("periods_analyzed", {}) if isinstance(record, dict) else {}
+    return {str(key): str(label) for key, label in periods.items()} if isinstance(periods, dict) else {}
+
+
+def _period_owners(record_periods: list[Dict[str, str]]) -> Dict[str, Tuple[int, int]]:
+    """Map each period key to ``(authority, index)`` of the record it is taken from."""
+    owners: Dict[str, Tuple[int, int]] = {}
+    for index, periods in enumerate(record_periods):
+        for key, label in periods.items():
+            authority = _source_authority(label)
+            if key not in owners or authority > owners[key][0]:
+                owners[key] = (authority, index)
+    return owners
+
+
 def merge_kreditlab_json_records(records: list[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-document records for one case into one record.
+
+    Each period is taken from the record whose source is most authoritative
+    for it (ties go to the earlier record): the other records' values for
+    that period are dropped before merging. Records are then merged
+    most-authoritative first, so non-period fields come from the strongest
+    source and weaker ones only fill gaps.
+    """
     if not records:
         raise ValueError("At least one KreditLab JSON record is required")
 
-    merged = deepcopy(records[0])
-    for record in records[1:]:
-        merged = _merge_structure(merged, record)
+    record_periods = [_record_periods(record) for record in records]
+    owners = _period_owners(record_periods)
+    pruned = []
+    for index, (record, periods) in enumerate(zip(records, record_periods)):
+        keep = {key for key in periods if owners[key][1] == index}
+        pruned.append(_prune_period_keys(record, keep, set(periods)) if keep != set(periods) else record)
+
+    order = sorted(
+        range(len(records)),
+        key=lambda index: -max((_source_authority(label) for label in record_periods[index].values()), default=0),
+    )
+    merged = deepcopy(pruned[order[0]])
+    for index in order[1:]:
+        merged = _merge_structure(merged, pruned[index])
 
     return _limit_to_latest_periods(merged, max_periods=3)
 
@@ -300,10 +542,12 @@ def _combine_extraction_results(extraction_results: list[Dict[str, Any]]) -> Dic
 
     combined_text_parts: list[str] = []
     combined_tables: list[Dict[str, Any]] = []
+    combined_pages: list[Dict[str, Any]] = []
 
     for idx, item in enumerate(extraction_results, start=1):
         combined_text_parts.append(f"\n\n===== SOURCE DOCUMENT {idx} =====\n")
         combined_text_parts.append(item.get("full_text_with_tables", ""))
+        combined_pages.extend({**page, "source_document": idx} for page in iter_pages(item))
 
         tables = item.get("tables_json", {}).get("tables", [])
         for table in tables:
@@ -311,239 +555,688 @@ def _combine_extraction_results(extraction_results: list[Dict[str, Any]]) -> Dic
             remapped["source_document"] = idx
             combined_tables.append(remapped)
 
+    combined_text = "\n".join(combined_text_parts)
     return {
-        "full_text_output": "\n".join(combined_text_parts),
-        "full_text_with_tables": "\n".join(combined_text_parts),
+        "full_text_output": combined_text,
+        "full_text_with_tables": combined_text,
         "tables_json": {"tables": combined_tables},
+        "pages": combined_pages,
     }
 
 
-def upload_file_v2(path: str, api_key: str) -> str:
+def upload_file_v2(pdf: Union[PdfSource, str, os.PathLike], api_key: str) -> str:
+    """Upload a PDF given as bytes, a memoryview, an open binary stream or a path."""
     url = "https://api.tensorlake.ai/documents/v2/files"
-    with open(path, "rb") as f:
-        files = {"file_bytes": ("file.pdf", f, "application/pdf")}
-        data = {"labels": json.dumps({"source": "integrated_app"})}
-        response = httpx.put(
-            url,
-            headers={"Authorization": f"Bearer {api_key}"},
-            files=files,
-            data=data,
-            timeout=60,
-        )
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as f:
+            return upload_file_v2(f, api_key)
+
+    files = {"file_bytes": ("file.pdf", as_upload_content(pdf), "application/pdf")}
+    data = {"labels": json.dumps({"source": "integrated_app"})}
+    response = httpx.put(
+        url,
+        headers={"Authorization": f"Bearer {api_key}"},
+        files=files,
+        data=data,
+        timeout=60,
+    )
     if response.status_code != 200:
         raise RuntimeError(f"Tensorlake upload failed ({response.status_code}): {response.text}")
     return response.json()["file_id"]
 
 
-def _clean_number(value: str) -> Any:
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in {"0", "false", "no", "off", ""}
+
+
+_EXTRACTION_CACHE: Optional[DiskLRUCache] = None
+_EXTRACTION_CACHE_LOCK = threading.Lock()
+
+
+def _get_extraction_cache() -> Optional[DiskLRUCache]:
+    global _EXTRACTION_CACHE
+    if not _env_flag("EXTRACTION_CACHE_ENABLED", True):
+        return None
+
+    with _EXTRACTION_CACHE_LOCK:
+        if _EXTRACTION_CACHE is None:
+            max_mb = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", DEFAULT_EXTRACTION_CACHE_MAX_MB))
+            _EXTRACTION_CACHE = DiskLRUCache(_cache_dir() / "extractions.sqlite3", max_bytes=max_mb * 1024 * 1024)
+        return _EXTRACTION_CACHE
+
+
+def _cache_dir() -> Path:
+    return Path(os.environ.get("EXTRACTION_CACHE_DIR", Path(tempfile.gettempdir()) / "kreditlab-cache"))
+
+
+_TRANSFORM_CACHE: Optional[DiskLRUCache] = None
+_TRANSFORM_CACHE_LOCK = threading.Lock()
+
+
+def _get_transform_cache() -> Optional[DiskLRUCache]:
+    global _TRANSFORM_CACHE
+    if not _env_flag("TRANSFORM_CACHE_ENABLED", True):
+        return None
+
+    with _TRANSFORM_CACHE_LOCK:
+        if _TRANSFORM_CACHE is None:
+            max_mb = int(os.environ.get("TRANSFORM_CACHE_MAX_MB", DEFAULT_TRANSFORM_CACHE_MAX_MB))
+            ttl_hours = float(os.environ.get("TRANSFORM_CACHE_TTL_HOURS", DEFAULT_TRANSFORM_CACHE_TTL_HOURS))
+            _TRANSFORM_CACHE = DiskLRUCache(
+                _cache_dir() / "transforms.sqlite3",
+                max_bytes=max_mb * 1024 * 1024,
+                ttl_seconds=ttl_hours * 3600 if ttl_hours > 0 else None,
+            )
+        return _TRANSFORM_CACHE
+
+
+def _transform_cache_key(user_payload: Dict[str, Any], system_prompt: str, max_tokens: int, mode: str) -> str:
+    """Identity of one Stage 2 generation: exact inputs plus the settings that shape the output."""
+    canonical_payload = json.dumps(user_payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    payload_digest = hashlib.sha256(canonical_payload.encode("utf-8")).hexdigest()
+    prompt_digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    model = os.environ.get("ANTHROPIC_MODEL", DEFAULT_ANTHROPIC_MODEL)
+    return f"transform:v{TRANSFORM_CACHE_VERSION}:{payload_digest}:{prompt_digest}:{model}:{max_tokens}:{mode}"
+
+
+def _transform_cache_lookup(cache: Optional[DiskLRUCache], cache_key: str) -> Optional[Dict[str, Any]]:
+    if cache is None:
+        return None
     try:
-        return int(value.replace(",", ""))
-    except Exception:
-        return value
-
-
-def _html_table_to_matrix(table):
-    rows = table.find_all("tr")
-    return [[cell.get_text(strip=True) for cell in row.find_all(["td", "th"])] for row in rows]
-
-
-def _html_table_to_objects(table):
-    matrix = _html_table_to_matrix(table)
-    if not matrix or len(matrix) < 2:
-        return []
-
-    header = matrix[0]
-    objects = []
-    for row in matrix[1:]:
-        entry = {}
-        for h, v in zip(header, row):
-            h_low = h.lower().strip()
-            if h_low in ["2024", "year_2024"]:
-                entry["year_2024"] = _clean_number(v)
-            elif h_low in ["2023", "as restated 2023", "year_2023"]:
-                entry["year_2023"] = _clean_number(v)
-            elif h_low == "note":
-                entry["note"] = _clean_number(v) if v else None
-            else:
-                entry["name"] = v
-        objects.append(entry)
-    return objects
+        cached = cache.get(cache_key)
+    except sqlite3.Error as exc:
+        LOGGER.warning("Transform cache lookup failed: %s", exc)
+        return None
+    if cached is not None:
+        LOGGER.info("Transform cache hit for %s", cache_key)
+    return cached
 
 
-def extract_with_tensorlake(pdf_bytes: bytes) -> Dict[str, Any]:
-    tensorlake_api_key = os.environ.get("TENSORLAKE_API_KEY")
-    if not tensorlake_api_key:
-        raise RuntimeError("TENSORLAKE_API_KEY environment variable is required")
+def _transform_cache_store(cache: Optional[DiskLRUCache], cache_key: str, kreditlab_json: Dict[str, Any]) -> None:
+    if cache is None:
+        return
+    try:
+        cache.set(cache_key, kreditlab_json)
+    except sqlite3.Error as exc:
+        LOGGER.warning("Transform cache store failed: %s", exc)
+
+
+_JOB_STORE: Optional[ParseJobStore] = None
+_JOB_STORE_LOCK = threading.Lock()
+
+
+def _get_job_store() -> Optional[ParseJobStore]:
+    global _JOB_STORE
+    if not _env_flag("TENSORLAKE_JOB_STORE_ENABLED", True):
+        return None
+
+    with _JOB_STORE_LOCK:
+        if _JOB_STORE is None:
+            ttl_hours = float(os.environ.get("TENSORLAKE_JOB_TTL_HOURS", DEFAULT_TENSORLAKE_JOB_TTL_HOURS))
+            _JOB_STORE = ParseJobStore(_cache_dir() / "jobs.sqlite3", ttl_seconds=ttl_hours * 3600)
+        return _JOB_STORE
+
+
+def _job_update(jobs: Optional[ParseJobStore], method: str, *args: Any) -> Any:
+    """Call a job-store method, treating store failures as a cache miss rather than an error."""
+    if jobs is None:
+        return None
+    try:
+        return getattr(jobs, method)(*args)
+    except sqlite3.Error as exc:
+        LOGGER.warning("Tensorlake job store %s failed: %s", method, exc)
+        return None
+
+
+def _parse_job_key(pdf: PdfSource, parsing_options: Any, enrichment_options: Any) -> str:
+    return f"parse:{_source_sha256(pdf)}:{_options_fingerprint(parsing_options, enrichment_options)}"
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_bytes)
-        temp_pdf_path = tmp.name
 
+def _disk_cache_stats(cache: Optional[DiskLRUCache]) -> Dict[str, Any]:
+    if cache is None:
+        return {"enabled": False}
     try:
-        file_id = upload_file_v2(temp_pdf_path, tensorlake_api_key)
-        doc_ai = DocumentAI(api_key=tensorlake_api_key)
-
-        parsing_options = ParsingOptions(
-            chunking_strategy=ChunkingStrategy.PAGE,
-            table_output_mode=TableOutputMode.MARKDOWN,
-            table_parsing_format=TableParsingFormat.TSR,
-            ocr_model=OcrPipelineProvider.TENSORLAKE02,
-            skew_detection=True,
+        return {"enabled": True, **cache.stats()}
+    except sqlite3.Error as exc:
+        return {"enabled": True, "error": str(exc)}
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return {
+        "extraction_cache": _disk_cache_stats(_get_extraction_cache()),
+        "transform_cache": _disk_cache_stats(_get_transform_cache()),
+        "stage2_generations": _stage2_generation_stats(),
+        "anthropic_models": _model_stats(),
+        "model_routing": _route_stats(),
+    }
+
+
+_STAGE2_STATS: Dict[str, Dict[str, Any]] = {}
+_STAGE2_STATS_LOCK = threading.Lock()
+
+
+def _record_generation_stats(record: Dict[str, Any]) -> None:
+    """Count a finished generation under its output mode, for /metrics."""
+    with _STAGE2_STATS_LOCK:
+        stats = _STAGE2_STATS.setdefault(
+            record["output_mode"],
+            {"generations": 0, "first_attempt_valid": 0, "model_calls": 0, "call_seconds": 0.0, "max_call_seconds": 0.0, "tiers": {}},
         )
-        enrichment_options = EnrichmentOptions(figure_summarization=False, table_summarization=False)
-        result = doc_ai.parse_and_wait(
-            file_id=file_id,
-            parsing_options=parsing_options,
-            enrichment_options=enrichment_options,
+        stats["generations"] += 1
+        stats["first_attempt_valid"] += record["tier"] == "direct"
+        stats["model_calls"] += len(record["call_seconds"])
+        stats["call_seconds"] += sum(record["call_seconds"])
+        stats["max_call_seconds"] = max([stats["max_call_seconds"], *record["call_seconds"]])
+        stats["tiers"][record["tier"]] = stats["tiers"].get(record["tier"], 0) + 1
+
+
+def _stage2_generation_stats() -> Dict[str, Any]:
+    """Per output mode: how often the first attempt was not enough, and model call latency."""
+    with _STAGE2_STATS_LOCK:
+        snapshot = deepcopy(_STAGE2_STATS)
+    for stats in snapshot.values():
+        stats["retry_rate"] = round(1 - stats["first_attempt_valid"] / stats["generations"], 4)
+        stats["mean_call_seconds"] = round(stats["call_seconds"] / stats["model_calls"], 3) if stats["model_calls"] else None
+        stats["call_seconds"] = round(stats["call_seconds"], 3)
+        stats["max_call_seconds"] = round(stats["max_call_seconds"], 3)
+    return snapshot
+
+
+_ROUTE_STATS: Dict[str, Dict[str, Any]] = {}
+_ROUTE_STATS_LOCK = threading.Lock()
+
+
+def _record_route_stats(route: Dict[str, Any], generations: list[Dict[str, Any]], seconds: float) -> None:
+    """Count a generated transform under its routing tier, for /metrics.
+
+    A transform is escalated when any call was served by a model other than
+    the one its tier routes to.
+    """
+    served = {model for generation in generations for model in generation["models"]}
+    with _ROUTE_STATS_LOCK:
+        stats = _ROUTE_STATS.setdefault(
+            route["tier"], {"transforms": 0, "escalated": 0, "seconds": deque(maxlen=ROUTE_LATENCY_SAMPLES)}
         )
-        if result.status != ParseStatus.SUCCESSFUL:
-            raise RuntimeError(f"Tensorlake parsing failed with status: {result.status}")
-
-        full_text_output = ""
-        full_text_with_tables = ""
-        all_tables_json = {"tables": []}
-
-        for i, chunk in enumerate(result.chunks, start=1):
-            raw_markdown = chunk.content
-            soup = BeautifulSoup(raw_markdown, "html.parser")
-            tables = soup.find_all("table")
-            for t in tables:
-                t.extract()
-
-            text_plain = soup.get_text("\n", strip=True)
-            full_text_output += f"\n\n===== PAGE {i} =====\n\n{text_plain}\n\n"
-            full_text_with_tables += f"\n\n===== PAGE {i} =====\n\n{text_plain}\n\n"
-
-            for t_index, table in enumerate(tables, start=1):
-                matrix = _html_table_to_matrix(table)
-                if not matrix or len(matrix) < 2:
-                    continue
-                headers = matrix[0]
-                rows = matrix[1:]
-                readable = tabulate(rows, headers=headers, tablefmt="grid")
-                full_text_with_tables += readable + "\n\n"
-                all_tables_json["tables"].append(
-                    {
-                        "page": i,
-                        "table_index": t_index,
-                        "rows": _html_table_to_objects(table),
-                    }
-                )
+        stats["transforms"] += 1
+        stats["escalated"] += bool(served - {route["models"][0]})
+        stats["seconds"].append(seconds)
 
-        return {
-            "full_text_output": full_text_output,
-            "full_text_with_tables": full_text_with_tables,
-            "tables_json": all_tables_json,
+
+def _route_stats() -> Dict[str, Any]:
+    """Per routing tier: transforms, escalation rate and median transform latency."""
+    with _ROUTE_STATS_LOCK:
+        snapshot = {tier: {**stats, "seconds": list(stats["seconds"])} for tier, stats in _ROUTE_STATS.items()}
+    return {
+        tier: {
+            "transforms": stats["transforms"],
+            "escalated": stats["escalated"],
+            "escalation_rate": round(stats["escalated"] / stats["transforms"], 4),
+            "median_seconds": round(statistics.median(stats["seconds"]), 3),
         }
-    finally:
-        if os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
-
-
-def _strip_markdown_fences(text: str) -> str:
-    stripped = text.strip()
-    if stripped.startswith("```") and stripped.endswith("```"):
-        lines = stripped.splitlines()
-        if len(lines) >= 2:
-            return "\n".join(lines[1:-1]).strip()
-    return stripped
-
-
-def _json_object_candidates(text: str) -> list[str]:
-    candidates: list[str] = []
-    stack = 0
-    start: Optional[int] = None
-    in_string = False
-    escaping = False
-
-    for idx, ch in enumerate(text):
-        if in_string:
-            if escaping:
-                escaping = False
-            elif ch == "\\":
-                escaping = True
-            elif ch == '"':
-                in_string = False
-            continue
+        for tier, stats in snapshot.items()
+    }
 
-        if ch == '"':
-            in_string = True
-            continue
 
-        if ch == "{":
-            if stack == 0:
-                start = idx
-            stack += 1
-        elif ch == "}" and stack > 0:
-            stack -= 1
-            if stack == 0 and start is not None:
-                candidates.append(text[start : idx + 1])
+def _tensorlake_options() -> Tuple[ParsingOptions, EnrichmentOptions]:
+    parsing_options = ParsingOptions(
+        chunking_strategy=ChunkingStrategy.PAGE,
+        table_output_mode=TableOutputMode.MARKDOWN,
+        table_parsing_format=TableParsingFormat.TSR,
+        ocr_model=OcrPipelineProvider.TENSORLAKE02,
+        skew_detection=True,
+    )
+    enrichment_options = EnrichmentOptions(figure_summarization=False, table_summarization=False)
+    return parsing_options, enrichment_options
+
+
+def _options_fingerprint(*options: Any) -> str:
+    parts = []
+    for option in options:
+        dump = getattr(option, "model_dump_json", None)
+        # exclude_none matches what is sent to Tensorlake and avoids serializers
+        # that cannot handle unset optional fields.
+        parts.append(dump(exclude_none=True) if callable(dump) else repr(option))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _source_sha256(pdf: PdfSource) -> str:
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf).hexdigest()
+
+    digest = hashlib.sha256()
+    pdf.seek(0)
+    for block in iter(lambda: pdf.read(1024 * 1024), b""):
+        digest.update(block)
+    pdf.seek(0)
+    return digest.hexdigest()
 
-    if not candidates:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start >= 0 and end > start:
-            candidates.append(text[start : end + 1])
 
-    candidates.sort(key=len, reverse=True)
-    return candidates
+def _local_extraction_enabled() -> bool:
+    return _env_flag("LOCAL_TEXT_LAYER_ENABLED", True) and LOCAL_EXTRACTION_AVAILABLE
 
 
-def _extract_json_object(text: str) -> Dict[str, Any]:
-    cleaned = _strip_markdown_fences(text)
+def _extraction_variant() -> str:
+    # Local text-layer extraction changes the result for digital pages, so it is
+    # part of the cache identity alongside the Tensorlake options.
+    if not _local_extraction_enabled():
+        return "ocr"
+    min_chars = os.environ.get("LOCAL_TEXT_MIN_CHARS", DEFAULT_LOCAL_TEXT_MIN_CHARS)
+    variant = f"local:{min_chars}"
+    if _env_flag("OCR_PAGE_FILTER_ENABLED", False):
+        variant += f":filter:{_ocr_page_min_score()}"
+    return variant
+
+
+def _ocr_page_min_score() -> int:
+    return int(os.environ.get("OCR_PAGE_MIN_SCORE", DEFAULT_OCR_PAGE_MIN_SCORE))
+
+
+def _extraction_cache_key(pdf: PdfSource, parsing_options: Any, enrichment_options: Any) -> str:
+    pdf_digest = _source_sha256(pdf)
+    options_digest = _options_fingerprint(parsing_options, enrichment_options, _extraction_variant())
+    return f"extract:v{EXTRACTION_CACHE_VERSION}:{pdf_digest}:{options_digest}"
+
+
+def _cache_lookup(cache: Optional[DiskLRUCache], cache_key: str) -> Optional[Dict[str, Any]]:
+    if cache is None:
+        return None
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        pass
+        cached = cache.get(cache_key)
+    except sqlite3.Error as exc:
+        LOGGER.warning("Extraction cache lookup failed: %s", exc)
+        return None
+    if cached is None:
+        return None
+    LOGGER.info("Extraction cache hit for %s", cache_key)
+    return ExtractionResult(cached)
+
 
+def _cache_store(cache: Optional[DiskLRUCache], cache_key: str, extraction_result: Dict[str, Any]) -> None:
+    if cache is None:
+        return
+    if isinstance(extraction_result, ExtractionResult):
+        # Persist only the page records; the text views are rebuilt on read.
+        extraction_result = extraction_result.stored()
     try:
-        parsed = ast.literal_eval(cleaned)
-        if isinstance(parsed, dict):
-            return parsed
-    except (ValueError, SyntaxError):
-        pass
+        cache.set(cache_key, extraction_result)
+    except sqlite3.Error as exc:
+        LOGGER.warning("Extraction cache store failed: %s", exc)
 
-    last_error: Optional[Exception] = None
-    for candidate in _json_object_candidates(cleaned):
+
+def _require_tensorlake_api_key() -> str:
+    tensorlake_api_key = os.environ.get("TENSORLAKE_API_KEY")
+    if not tensorlake_api_key:
+        raise RuntimeError("TENSORLAKE_API_KEY environment variable is required")
+    return tensorlake_api_key
+
+
+def extract_with_tensorlake(pdf: PdfSource) -> Dict[str, Any]:
+    tensorlake_api_key = _require_tensorlake_api_key()
+
+    parsing_options, enrichment_options = _tensorlake_options()
+    cache = _get_extraction_cache()
+    cache_key = _extraction_cache_key(pdf, parsing_options, enrichment_options)
+    cached = _cache_lookup(cache, cache_key)
+    if cached is not None:
+        return cached
+
+    extraction_result = _extract_uncached(pdf, tensorlake_api_key, parsing_options, enrichment_options)
+    _cache_store(cache, cache_key, extraction_result)
+    return extraction_result
+
+
+async def extract_with_tensorlake_async(pdf: PdfSource) -> Dict[str, Any]:
+    """Non-blocking variant of extract_with_tensorlake for use on the event loop.
+
+    Uploads go through the shared keep-alive client in tensorlake_client and
+    parse completion is awaited on the shared poller, so no worker thread is
+    held while Tensorlake is working.
+    """
+    tensorlake_api_key = _require_tensorlake_api_key()
+
+    parsing_options, enrichment_options = _tensorlake_options()
+    cache = _get_extraction_cache()
+    cache_key = await asyncio.to_thread(_extraction_cache_key, pdf, parsing_options, enrichment_options)
+    cached = await asyncio.to_thread(_cache_lookup, cache, cache_key)
+    if cached is not None:
+        return cached
+
+    local_pages, ocr_page_numbers, skipped_page_numbers = await asyncio.to_thread(_plan_local_extraction, pdf)
+    ocr_pages: list[Dict[str, Any]] = []
+    if local_pages is None or ocr_page_numbers:
+        shards = await asyncio.to_thread(_ocr_shards, pdf, local_pages, ocr_page_numbers)
+        semaphore = asyncio.Semaphore(_shard_concurrency())
+
+        async def parse_shard(shard_source: PdfSource, shard_pages: Optional[list[int]]) -> list[Dict[str, Any]]:
+            async with semaphore:
+                chunk_contents = await _parse_with_tensorlake_async(
+                    shard_source, tensorlake_api_key, parsing_options, enrichment_options
+                )
+            return _label_ocr_chunks(shard_pages, chunk_contents)
+
+        shard_results = await asyncio.gather(*(parse_shard(source, numbers) for source, numbers in shards))
+        ocr_pages = [page for shard_pages in shard_results for page in shard_pages]
+    pages = _assemble_pages(local_pages, ocr_pages)
+    extraction_result = build_extraction_result(pages)
+    _attach_page_map(extraction_result, local_pages, ocr_page_numbers, skipped_page_numbers)
+
+    await asyncio.to_thread(_cache_store, cache, cache_key, extraction_result)
+    return extraction_result
+
+
+def _extract_uncached(
+    pdf: PdfSource,
+    tensorlake_api_key: str,
+    parsing_options: ParsingOptions,
+    enrichment_options: EnrichmentOptions,
+) -> Dict[str, Any]:
+    local_pages, ocr_page_numbers, skipped_page_numbers = _plan_local_extraction(pdf)
+    ocr_pages: list[Dict[str, Any]] = []
+    if local_pages is None or ocr_page_numbers:
+        shards = _ocr_shards(pdf, local_pages, ocr_page_numbers)
+
+        def parse_shard(shard: Tuple[PdfSource, Optional[list[int]]]) -> list[Dict[str, Any]]:
+            shard_source, shard_pages = shard
+            chunk_contents = _parse_with_tensorlake(
+                shard_source, tensorlake_api_key, parsing_options, enrichment_options
+            )
+            return _label_ocr_chunks(shard_pages, chunk_contents)
+
+        if len(shards) == 1:
+            shard_results = [parse_shard(shards[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(_shard_concurrency(), len(shards))) as executor:
+                shard_results = list(executor.map(parse_shard, shards))
+        ocr_pages = [page for shard_pages in shard_results for page in shard_pages]
+    pages = _assemble_pages(local_pages, ocr_pages)
+    extraction_result = build_extraction_result(pages)
+    _attach_page_map(extraction_result, local_pages, ocr_page_numbers, skipped_page_numbers)
+    return extraction_result
+
+
+def _parse_with_tensorlake(
+    pdf: PdfSource,
+    tensorlake_api_key: str,
+    parsing_options: ParsingOptions,
+    enrichment_options: EnrichmentOptions,
+) -> list[str]:
+    """Upload and parse one PDF, resuming from the job store where possible.
+
+    The file id and parse id are recorded against the PDF hash as soon as
+    Tensorlake hands them out. A retry, or another worker, with the same PDF
+    then waits on (or directly fetches) the stored parse, or at least skips the
+    upload. Stored ids that Tensorlake no longer honours are dropped and that
+    step is repeated.
+    """
+    jobs = _get_job_store()
+    job_key = _parse_job_key(pdf, parsing_options, enrichment_options) if jobs is not None else ""
+    job = _job_update(jobs, "get", job_key) or {}
+    doc_ai = DocumentAI(api_key=tensorlake_api_key)
+
+    if job.get("parse_id"):
+        LOGGER.info("Resuming Tensorlake parse %s", job["parse_id"])
         try:
-            parsed = json.loads(candidate)
-            if isinstance(parsed, dict):
-                return parsed
-        except json.JSONDecodeError as exc:
-            last_error = exc
+            result = doc_ai.get_parsed_result(job["parse_id"])
+            if result.status not in (ParseStatus.SUCCESSFUL, ParseStatus.FAILURE):
+                result = doc_ai.wait_for_completion(job["parse_id"])
+            if result.status == ParseStatus.SUCCESSFUL:
+                _job_update(jobs, "mark", job_key, "successful")
+                return [chunk.content for chunk in result.chunks]
+            LOGGER.warning("Stored Tensorlake parse %s ended as %s; parsing again", job["parse_id"], result.status)
+        except Exception as exc:
+            LOGGER.warning("Stored Tensorlake parse %s could not be resumed; parsing again: %s", job["parse_id"], exc)
+        _job_update(jobs, "forget_parse", job_key)
 
-        repaired = _repair_common_json_issues(candidate)
-        if repaired != candidate:
-            try:
-                parsed = json.loads(repaired)
-                if isinstance(parsed, dict):
-                    return parsed
-            except json.JSONDecodeError as exc:
-                last_error = exc
+    parse_id = None
+    if job.get("file_id"):
+        try:
+            parse_id = doc_ai.parse(
+                file_id=job["file_id"],
+                parsing_options=parsing_options,
+                enrichment_options=enrichment_options,
+            )
+        except Exception as exc:
+            LOGGER.warning("Stored Tensorlake file %s was rejected; uploading again: %s", job["file_id"], exc)
+    if parse_id is None:
+        file_id = upload_file_v2(pdf, tensorlake_api_key)
+        _job_update(jobs, "record_upload", job_key, file_id)
+        parse_id = doc_ai.parse(
+            file_id=file_id,
+            parsing_options=parsing_options,
+            enrichment_options=enrichment_options,
+        )
+    _job_update(jobs, "record_parse", job_key, parse_id)
+
+    result = doc_ai.wait_for_completion(parse_id)
+    if result.status != ParseStatus.SUCCESSFUL:
+        _job_update(jobs, "forget_parse", job_key)
+        raise RuntimeError(f"Tensorlake parsing failed with status: {result.status}")
+    _job_update(jobs, "mark", job_key, "successful")
+    return [chunk.content for chunk in result.chunks]
+
+
+async def _parse_with_tensorlake_async(
+    pdf: PdfSource,
+    tensorlake_api_key: str,
+    parsing_options: ParsingOptions,
+    enrichment_options: EnrichmentOptions,
+) -> list[str]:
+    """Async counterpart of _parse_with_tensorlake, resuming through the same job store."""
+    jobs = _get_job_store()
+    job_key = ""
+    job: Dict[str, Any] = {}
+    if jobs is not None:
+        job_key = await asyncio.to_thread(_parse_job_key, pdf, parsing_options, enrichment_options)
+        job = await asyncio.to_thread(_job_update, jobs, "get", job_key) or {}
+
+    if job.get("parse_id"):
+        LOGGER.info("Resuming Tensorlake parse %s", job["parse_id"])
+        try:
+            chunk_contents = await wait_for_parse_async(job["parse_id"], tensorlake_api_key)
+            await asyncio.to_thread(_job_update, jobs, "mark", job_key, "successful")
+            return chunk_contents
+        except Exception as exc:
+            LOGGER.warning("Stored Tensorlake parse %s could not be resumed; parsing again: %s", job["parse_id"], exc)
+        await asyncio.to_thread(_job_update, jobs, "forget_parse", job_key)
 
+    parse_id = None
+    if job.get("file_id"):
         try:
-            parsed = ast.literal_eval(candidate)
-            if isinstance(parsed, dict):
-                return parsed
-        except (ValueError, SyntaxError):
-            pass
-
-    if last_error:
-        raise last_error
-    raise json.JSONDecodeError("No JSON object found in response", cleaned, 0)
-
-
-def _repair_common_json_issues(text: str) -> str:
-    repaired = text
-    repaired = re.sub(r"([\{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)", r'\1"\2"\3', repaired)
-    repaired = repaired.replace("'", '"')
-    repaired = re.sub(r",\s*([}\]])", r"\1", repaired)
-    repaired = re.sub(r'([}\]"\d])\s*\n\s*("[A-Za-z_][A-Za-z0-9_]*"\s*:)', r'\1,\n\2', repaired)
-    repaired = re.sub(r'([}\]"\d])\s+("[A-Za-z_][A-Za-z0-9_]*"\s*:)', r'\1, \2', repaired)
-    repaired = re.sub(r"\bTrue\b", "true", repaired)
-    repaired = re.sub(r"\bFalse\b", "false", repaired)
-    repaired = re.sub(r"\bNone\b", "null", repaired)
-    return repaired
+            parse_id = await start_parse_async(job["file_id"], parsing_options, enrichment_options, tensorlake_api_key)
+        except Exception as exc:
+            LOGGER.warning("Stored Tensorlake file %s was rejected; uploading again: %s", job["file_id"], exc)
+    if parse_id is None:
+        file_id = await upload_file_async(pdf, tensorlake_api_key)
+        await asyncio.to_thread(_job_update, jobs, "record_upload", job_key, file_id)
+        parse_id = await start_parse_async(file_id, parsing_options, enrichment_options, tensorlake_api_key)
+    await asyncio.to_thread(_job_update, jobs, "record_parse", job_key, parse_id)
+
+    try:
+        chunk_contents = await wait_for_parse_async(parse_id, tensorlake_api_key)
+    except RuntimeError:
+        # A failed parse is not worth resuming; a timeout or cancellation is.
+        await asyncio.to_thread(_job_update, jobs, "forget_parse", job_key)
+        raise
+    await asyncio.to_thread(_job_update, jobs, "mark", job_key, "successful")
+    return chunk_contents
+
+
+def _plan_local_extraction(
+    pdf: PdfSource,
+) -> Tuple[Optional[list[Dict[str, Any]]], Optional[list[int]], list[int]]:
+    """Split a PDF into pages readable from its text layer and pages that need OCR.
+
+    Returns ``(local_pages, ocr_page_numbers, skipped_page_numbers)``.
+    ``local_pages`` is None when the local backend is disabled or unavailable,
+    in which case the whole document goes to Tensorlake. With
+    OCR_PAGE_FILTER_ENABLED, scanned pages whose text layer scores below
+    OCR_PAGE_MIN_SCORE on RELEVANCE_KEYWORDS are skipped instead of OCR'd;
+    scans without any text layer cannot be scored and are always kept.
+    """
+    if not _local_extraction_enabled():
+        return None, None, []
+
+    started = time.perf_counter()
+    local_pages = analyse_pdf(pdf)
+    if local_pages is None:
+        return None, None, []
+
+    ocr_page_numbers: list[int] = []
+    skipped_page_numbers: list[int] = []
+    filter_enabled = _env_flag("OCR_PAGE_FILTER_ENABLED", False)
+    min_score = _ocr_page_min_score()
+    for page in local_pages:
+        if page["kind"] != "scanned":
+            continue
+        layer_text = page.get("layer_text", "")
+        if filter_enabled and layer_text.strip() and _page_relevance_score(layer_text) < min_score:
+            skipped_page_numbers.append(page["page"])
+        else:
+            ocr_page_numbers.append(page["page"])
+
+    LOGGER.info(
+        "Local text layer covered %s/%s pages in %.2fs; %s page(s) need OCR, %s skipped as irrelevant",
+        len(local_pages) - len(ocr_page_numbers) - len(skipped_page_numbers),
+        len(local_pages),
+        time.perf_counter() - started,
+        len(ocr_page_numbers),
+        len(skipped_page_numbers),
+    )
+    return local_pages, ocr_page_numbers, skipped_page_numbers
+
+
+def _shard_concurrency() -> int:
+    return max(1, int(os.environ.get("TENSORLAKE_SHARD_CONCURRENCY", DEFAULT_TENSORLAKE_SHARD_CONCURRENCY)))
+
+
+def _ocr_shards(
+    pdf: PdfSource,
+    local_pages: Optional[list[Dict[str, Any]]],
+    ocr_page_numbers: Optional[list[int]],
+) -> list[Tuple[PdfSource, Optional[list[int]]]]:
+    """Return the PDFs to send to Tensorlake, each with its original page numbers.
+
+    With TENSORLAKE_SHARD_PAGES set, the pages needing OCR are split into
+    shards of that many pages so they can be parsed concurrently. A page-number
+    list of None means "the whole document, numbered from 1".
+    """
+    shard_size = int(os.environ.get("TENSORLAKE_SHARD_PAGES", 0))
+    total_pages = len(local_pages) if local_pages is not None else None
+    if ocr_page_numbers is None:
+        if shard_size <= 0 or not PDF_SPLIT_AVAILABLE:
+            return [(pdf, None)]
+        total_pages = count_pages(pdf)
+        ocr_page_numbers = list(range(1, total_pages + 1))
+
+    if shard_size <= 0 or len(ocr_page_numbers) <= shard_size:
+        if len(ocr_page_numbers) == total_pages:
+            return [(pdf, ocr_page_numbers)]
+        groups = [ocr_page_numbers]
+    else:
+        groups = [ocr_page_numbers[i : i + shard_size] for i in range(0, len(ocr_page_numbers), shard_size)]
+        LOGGER.info(
+            "Splitting %s OCR page(s) into %s shard(s) of up to %s", len(ocr_page_numbers), len(groups), shard_size
+        )
+    return list(zip(split_pdf(pdf, groups), groups))
+
+
+def _attach_page_map(
+    extraction_result: Dict[str, Any],
+    local_pages: Optional[list[Dict[str, Any]]],
+    ocr_page_numbers: Optional[list[int]],
+    skipped_page_numbers: list[int],
+) -> None:
+    if local_pages is None:
+        return
+    extraction_result["page_map"] = {
+        "total_pages": len(local_pages),
+        "text_layer_pages": [page["page"] for page in local_pages if page["kind"] == "digital"],
+        "ocr_pages": list(ocr_page_numbers or []),
+        "skipped_pages": skipped_page_numbers,
+    }
+
+
+def _label_ocr_chunks(page_numbers: Optional[list[int]], chunk_contents: list[str]) -> list[Dict[str, Any]]:
+    """Convert one Tensorlake parse's chunks into page records under their original numbers."""
+    ocr_pages = [chunk_to_page(content) for content in chunk_contents]
+    if page_numbers is None:
+        return [{"page": number, **page} for number, page in enumerate(ocr_pages, start=1)]
+
+    if len(ocr_pages) != len(page_numbers):
+        LOGGER.warning(
+            "Tensorlake returned %s chunks for %s OCR pages; page numbers may be approximate",
+            len(ocr_pages),
+            len(page_numbers),
+        )
+
+    labelled = [{"page": number, **page} for number, page in zip(page_numbers, ocr_pages)]
+    # Surplus chunks are folded into the last page rather than given numbers
+    # that could collide with another shard.
+    for page in ocr_pages[len(page_numbers) :]:
+        if not labelled:
+            break
+        labelled[-1]["text"] = f"{labelled[-1]['text']}\n{page['text']}".strip()
+        labelled[-1]["tables"] = labelled[-1]["tables"] + page["tables"]
+    return labelled
+
+
+def _assemble_pages(
+    local_pages: Optional[list[Dict[str, Any]]],
+    ocr_pages: list[Dict[str, Any]],
+) -> list[Dict[str, Any]]:
+    pages = {page["page"]: page for page in local_pages or [] if page["kind"] == "digital"}
+    for page in ocr_pages:
+        pages[page["page"]] = page
+    return [pages[number] for number in sorted(pages)]
+
+
+def _hoist_missing_keys(data: Dict[str, Any], keys: list[str]) -> Dict[str, Any]:
+    """Fill missing top-level keys from the same keys nested deeper in the output."""
+    hoisted = _normalize_top_level_aliases(data)
+    missing = [key for key in keys if key not in hoisted]
+    stack: list[Any] = [value for value in hoisted.values() if isinstance(value, (dict, list))]
+    while stack and missing:
+        node = stack.pop()
+        children = node.values() if isinstance(node, dict) else node
+        if isinstance(node, dict):
+            node = _normalize_top_level_aliases(node)
+            for key in list(missing):
+                if isinstance(node.get(key), dict):
+                    hoisted[key] = node[key]
+                    missing.remove(key)
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+    return hoisted
+
+
+def _unwrap_list(parsed: Any, keys: list[str]) -> Any:
+    """The first object in a list response that holds any of ``keys``, at any depth; other responses as they are."""
+    if not isinstance(parsed, list):
+        return parsed
+    for item in parsed:
+        stack: list[Any] = [item]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if any(key in _normalize_top_level_aliases(node) for key in keys):
+                    return item
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+    return parsed
+
+
+def _local_repair(parsed: Any, keys: list[str]) -> Optional[Dict[str, Any]]:
+    """Lossless local reading of an invalid response, or None if it did not parse to an object.
+
+    Only keys nested under wrappers are hoisted to the top level; nothing is
+    guessed or closed, so output cut off mid-object is never repaired here.
+    """
+    if not isinstance(parsed, dict):
+        return None
+    return _hoist_missing_keys(parsed, keys)
 
 
 def _validate_kreditlab_schema(data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
@@ -588,7 +1281,7 @@ def _extract_schema_candidate(data: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(data, dict):
         if isinstance(data, str):
             try:
-                parsed = _extract_json_object(data)
+                parsed = decode_json_object(data)
                 return _extract_schema_candidate(parsed)
             except Exception:
                 return data
@@ -625,139 +1318,1243 @@ def _extract_schema_candidate(data: Dict[str, Any]) -> Dict[str, Any]:
     return data
 
 
-def _call_anthropic(system_prompt: str, user_content: str, corrective: bool = False) -> str:
-    anthropic_api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not anthropic_api_key:
-        raise RuntimeError("ANTHROPIC_API_KEY environment variable is required")
+def _log_anthropic_usage(model_name: str, message: Any) -> None:
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return
+    LOGGER.info(
+        "Anthropic usage (%s): input=%s cache_read=%s cache_write=%s output=%s",
+        model_name,
+        usage.input_tokens,
+        getattr(usage, "cache_read_input_tokens", None) or 0,
+        getattr(usage, "cache_creation_input_tokens", None) or 0,
+        usage.output_tokens,
+    )
+
+
+def _anthropic_request(
+    system_prompt: str,
+    user_content: str,
+    corrective: bool = False,
+    correction: Optional[str] = None,
+    required_keys: Optional[list[str]] = None,
+    task: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the messages.create arguments (all but ``model``) for one Stage 2 call.
 
-    client = Anthropic(api_key=anthropic_api_key)
-    required_key_list = ", ".join(sorted(REQUIRED_TOP_LEVEL_KEYS))
-    assistant_instruction = (
-        "Return ONLY valid minified JSON. No markdown fences, no explanations, no extra text. "
-        f"The top-level object MUST contain these keys: {required_key_list}."
-        if not corrective
-        else (
+    The system prompt and the source payload carry prompt-caching breakpoints
+    and come first, so later calls with the same prompt, corrective retries
+    and sectioned calls on the same payload read them from Anthropic's cache.
+    The per-call instruction (``required_keys``, defaulting to the full
+    schema, plus any ``task`` and ``correction``) follows the cached prefix.
+    """
+    required_key_list = ", ".join(required_keys or sorted(REQUIRED_TOP_LEVEL_KEYS))
+    if _tool_output_enabled():
+        assistant_instruction = (
+            f"Call the {TOOL_NAME} tool with the JSON as its input. "
+            f"The input object MUST contain these top-level keys: {required_key_list}."
+        )
+        if corrective:
+            assistant_instruction = f"Your previous output was invalid. {assistant_instruction}"
+    elif not corrective:
+        assistant_instruction = (
+            "Return ONLY valid minified JSON. No markdown fences, no explanations, no extra text. "
+            f"The top-level object MUST contain these keys: {required_key_list}."
+        )
+    else:
+        assistant_instruction = (
             "Your previous output was invalid. Return ONLY corrected valid minified JSON matching the required schema. "
             f"The top-level object MUST contain these keys: {required_key_list}."
         )
+
+    instruction_text = (
+        f"{assistant_instruction}\n\n"
+        "Important: Include terminology as found in source statements, including audit, management accounts, and profit and loss phrasing where applicable."
     )
+    if task:
+        instruction_text += f"\n\n{task}"
+    if correction:
+        instruction_text += f"\n\n{correction}"
+    content_blocks = [
+        {
+            "type": "text",
+            "text": f"Transform this extracted financial data into KreditLab JSON format:\n\nFULL_TEXT_WITH_TABLES:\n{user_content}",
+            "cache_control": {"type": "ephemeral"},
+        },
+        {"type": "text", "text": instruction_text},
+    ]
+    return {
+        "max_tokens": int(os.environ.get("ANTHROPIC_MAX_TOKENS", DEFAULT_ANTHROPIC_MAX_TOKENS)),
+        "system": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+        "messages": [{"role": "user", "content": content_blocks}],
+        **_output_params(system_prompt),
+    }
 
-    requested_model = os.environ.get("ANTHROPIC_MODEL", DEFAULT_ANTHROPIC_MODEL)
-    max_tokens = int(os.environ.get("ANTHROPIC_MAX_TOKENS", DEFAULT_ANTHROPIC_MAX_TOKENS))
-    model_candidates = [requested_model]
-    if requested_model != FALLBACK_ANTHROPIC_MODEL:
-        model_candidates.append(FALLBACK_ANTHROPIC_MODEL)
 
-    last_error: Optional[Exception] = None
-    message = None
-    for model_name in model_candidates:
-        try:
-            message = client.messages.create(
-                model=model_name,
-                max_tokens=max_tokens,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": (
-                            f"{assistant_instruction}\n\n"
-                            "Important: Include terminology as found in source statements, including audit, management accounts, and profit and loss phrasing where applicable.\n\n"
-                            "Transform this extracted financial data into KreditLab JSON format:\n\n"
-                            f"FULL_TEXT_WITH_TABLES:\n{user_content}"
-                        ),
-                    }
-                ],
-            )
-            if model_name != requested_model:
-                LOGGER.warning(
-                    "Configured ANTHROPIC_MODEL '%s' failed. Fell back to '%s'.",
-                    requested_model,
-                    model_name,
-                )
-            break
-        except Exception as exc:
-            if "not_found_error" in str(exc) or "404" in str(exc):
-                last_error = exc
-                LOGGER.warning("Anthropic model '%s' is unavailable. Trying fallback.", model_name)
-                continue
-            raise
+def _tool_output_enabled() -> bool:
+    return _env_flag("STAGE2_TOOL_OUTPUT_ENABLED", False)
 
-    if message is None:
-        raise RuntimeError(
-            "Unable to call Anthropic API: configured model is unavailable and fallback failed."
-        ) from last_error
 
-    chunks = []
-    for block in message.content:
-        if getattr(block, "type", None) == "text":
-            chunks.append(block.text)
-    return "\n".join(chunks).strip()
+def _output_mode() -> str:
+    return "tool" if _tool_output_enabled() else "text"
 
 
-def transform_to_kreditlab_json(
-    extraction_result: Dict[str, Any],
-    combination_context: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
-    system_prompt = _load_system_prompt()
-    user_payload = _prepare_stage2_payload(
-        extraction_result=extraction_result,
-        combination_context=combination_context,
-    )
-    user_content = json.dumps(user_payload, ensure_ascii=False)
+def _output_params(system_prompt: str) -> Dict[str, Any]:
+    """Request arguments that make the model return its JSON as forced tool input.
 
-    response = _call_anthropic(system_prompt=system_prompt, user_content=user_content)
+    Every call carries the same tool, with the schema derived from the
+    framework and no required keys: tools precede the system prompt in the
+    cached prefix, so a per-call tool would miss the prompt cache. The keys
+    each call needs are named in its instruction and checked on return.
+    """
+    if not _tool_output_enabled():
+        return {}
+    return {"tools": [record_tool(system_prompt)], "tool_choice": {"type": "tool", "name": TOOL_NAME}}
 
-    parse_error: Optional[Exception] = None
-    schema_error: Optional[str] = None
 
-    for attempt in range(1, 4):
-        try:
-            parsed = _extract_json_object(response)
-            candidate = _extract_schema_candidate(parsed)
-            valid, error = _validate_kreditlab_schema(candidate)
-            if valid:
-                return _limit_to_latest_periods(candidate, max_periods=3)
-            schema_error = error
-            LOGGER.warning("Anthropic schema validation failed on attempt %s: %s", attempt, error)
-        except Exception as exc:
-            parse_error = exc
-            LOGGER.warning("Failed to parse Anthropic response on attempt %s: %s", attempt, exc)
+def _anthropic_model_candidates(preferred: Optional[str] = None) -> list[str]:
+    requested_model = os.environ.get("ANTHROPIC_MODEL", DEFAULT_ANTHROPIC_MODEL)
+    model_candidates = [preferred] if preferred else []
+    for model_name in (requested_model, FALLBACK_ANTHROPIC_MODEL):
+        if model_name not in model_candidates:
+            model_candidates.append(model_name)
+    return model_candidates
 
-        if attempt == 3:
-            break
 
-        corrective_content = (
-            "Your last output was invalid. Re-generate the complete JSON from source data. "
-            "Return ONLY one valid JSON object with all required keys and no markdown fences.\n\n"
-            f"PARSE_ERROR: {parse_error}\n"
-            f"SCHEMA_ERROR: {schema_error}\n\n"
-            "SOURCE_DATA:\n"
-            f"{user_content}"
-        )
-        response = _call_anthropic(
-            system_prompt=system_prompt,
-            user_content=corrective_content,
-            corrective=True,
-        )
+def _model_routing_enabled() -> bool:
+    return _env_flag("STAGE2_MODEL_ROUTING_ENABLED", False)
 
-    if parse_error is not None:
-        raise RuntimeError(f"Claude response is not valid JSON after retries: {parse_error}") from parse_error
-    if schema_error is not None:
-        raise RuntimeError(f"Claude response failed schema checks after retries: {schema_error}")
-    raise RuntimeError("Claude response was invalid after retries")
 
+def _tier_models() -> Dict[str, str]:
+    return {
+        "fast": os.environ.get("ANTHROPIC_FAST_MODEL", DEFAULT_ANTHROPIC_FAST_MODEL),
+        "standard": os.environ.get("ANTHROPIC_MODEL", DEFAULT_ANTHROPIC_MODEL),
+        "strong": os.environ.get("ANTHROPIC_STRONG_MODEL", FALLBACK_ANTHROPIC_MODEL),
+    }
 
-def process_pdf(pdf_bytes: bytes, include_pdf: bool = False) -> Dict[str, Any]:
-    extraction_result = extract_with_tensorlake(pdf_bytes)
-    kreditlab_json = transform_to_kreditlab_json(extraction_result)
-    html = generate_full_html(kreditlab_json)
 
-    result: Dict[str, Any] = {
-        "kreditlab_json": kreditlab_json,
-        "html": html,
-    }
+def _model_route(user_payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Route a Stage 2 payload to a model tier, or None when routing is off.
 
-    if include_pdf:
+    ``models`` lists the model of the routed tier and then those of every
+    tier above it: each regeneration after an invalid response moves one
+    step up.
+    """
+    if not _model_routing_enabled():
+        return None
+    route = route_payload(user_payload)
+    tier_models = _tier_models()
+    models: list[str] = []
+    for tier in TIERS[TIERS.index(route["tier"]) :]:
+        if tier_models[tier] not in models:
+            models.append(tier_models[tier])
+    route["models"] = models
+    LOGGER.info("Stage 2 payload routed to the %s tier (%s, score %s)", route["tier"], models[0], route["score"])
+    return route
+
+
+# Process-wide model availability: models that answered not-found are skipped
+# until their entry expires, so a mis-set model costs one failed round trip
+# per TTL instead of one per call.
+_MODEL_UNAVAILABLE_UNTIL: Dict[str, float] = {}
+_MODEL_SERVED: Dict[str, int] = {}
+_MODEL_REGISTRY_LOCK = threading.Lock()
+
+
+def _model_unavailable_ttl() -> float:
+    return float(
+        os.environ.get("ANTHROPIC_MODEL_UNAVAILABLE_TTL_SECONDS", DEFAULT_ANTHROPIC_MODEL_UNAVAILABLE_TTL_SECONDS)
+    )
+
+
+def _routable_models(model_candidates: list[str]) -> list[str]:
+    """The candidates not currently known to be unavailable, in order; all of them if none are left."""
+    now = time.monotonic()
+    with _MODEL_REGISTRY_LOCK:
+        available = [model for model in model_candidates if _MODEL_UNAVAILABLE_UNTIL.get(model, 0.0) <= now]
+    if not available:
+        return model_candidates
+    if len(available) < len(model_candidates):
+        skipped = [model for model in model_candidates if model not in available]
+        LOGGER.debug("Skipping Anthropic model(s) known to be unavailable: %s", ", ".join(skipped))
+    return available
+
+
+def _mark_model_unavailable(model_name: str) -> None:
+    """Record a failed model; the fallback is logged here, once, rather than on every skipped call."""
+    ttl = _model_unavailable_ttl()
+    if ttl <= 0:
+        LOGGER.warning("Anthropic model '%s' is unavailable; falling back.", model_name)
+        return
+    with _MODEL_REGISTRY_LOCK:
+        _MODEL_UNAVAILABLE_UNTIL[model_name] = time.monotonic() + ttl
+    LOGGER.warning(
+        "Anthropic model '%s' is unavailable; falling back and skipping it for %.0f seconds.", model_name, ttl
+    )
+
+
+def _mark_model_served(model_name: str, models: Optional[Dict[str, int]]) -> None:
+    with _MODEL_REGISTRY_LOCK:
+        _MODEL_UNAVAILABLE_UNTIL.pop(model_name, None)
+        _MODEL_SERVED[model_name] = _MODEL_SERVED.get(model_name, 0) + 1
+    if models is not None:
+        models[model_name] = models.get(model_name, 0) + 1
+
+
+def _model_stats() -> Dict[str, Any]:
+    now = time.monotonic()
+    with _MODEL_REGISTRY_LOCK:
+        return {
+            "served": dict(_MODEL_SERVED),
+            "unavailable": {
+                model: round(until - now, 1) for model, until in _MODEL_UNAVAILABLE_UNTIL.items() if until > now
+            },
+        }
+
+
+def _is_model_unavailable(exc: Exception) -> bool:
+    # Only a 404 means the model does not exist for this key; other errors are not about the model.
+    return isinstance(exc, anthropic.NotFoundError)
+
+
+def _message_text(model_name: str, message: Any) -> str:
+    _log_anthropic_usage(model_name, message)
+    chunks = []
+    for block in message.content:
+        block_type = getattr(block, "type", None)
+        if block_type == "tool_use" and block.name == TOOL_NAME:
+            # Tool input arrives already parsed; it goes through the same checks as text output.
+            return json.dumps(block.input, ensure_ascii=False)
+        if block_type == "text":
+            chunks.append(block.text)
+    return "\n".join(chunks).strip()
+
+
+def _no_model_available(last_error: Optional[Exception]) -> RuntimeError:
+    error = RuntimeError("Unable to call Anthropic API: configured model is unavailable and fallback failed.")
+    error.__cause__ = last_error
+    return error
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def _emit(progress: Optional[ProgressCallback], event: Dict[str, Any]) -> None:
+    if progress is None:
+        return
+    try:
+        progress(event)
+    except Exception as exc:
+        LOGGER.warning("Progress callback failed: %s", exc)
+
+
+def _streaming_enabled() -> bool:
+    return _env_flag("ANTHROPIC_STREAMING_ENABLED", True)
+
+
+class _StreamMonitor:
+    """Checks streamed Stage 2 output as it arrives and reports progress.
+
+    Each text delta goes through a JsonStreamScanner; a MalformedStreamError
+    from it propagates out of the stream loop, which closes the connection so
+    the corrective retry can start at once instead of after max_tokens.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback], attempt: int, section: Optional[str] = None) -> None:
+        self.progress = progress
+        self.attempt = attempt
+        self.section = section
+        self.scanner = JsonStreamScanner()
+        self.completed: set[str] = set()
+        self._next_report = STREAM_PROGRESS_EVERY_CHARS
+
+    def feed_event(self, event: Any) -> None:
+        """Feed the output text of a stream event: text deltas, or tool input JSON in tool output mode."""
+        event_type = getattr(event, "type", None)
+        if event_type == "text":
+            self.feed(event.text)
+        elif event_type == "input_json":
+            self.feed(event.partial_json)
+
+    def feed(self, text: str) -> None:
+        for key in self.scanner.feed(text):
+            key = TOP_LEVEL_KEY_ALIASES.get(key, key)
+            self.completed.add(key)
+            self._emit(
+                {
+                    "event": "key_completed",
+                    "key": key,
+                    "required_remaining": sorted(REQUIRED_TOP_LEVEL_KEYS - self.completed),
+                }
+            )
+        if self.scanner.chars >= self._next_report:
+            self._next_report += STREAM_PROGRESS_EVERY_CHARS
+            self._emit({"event": "output_progress", "chars": self.scanner.chars})
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        event["attempt"] = self.attempt
+        if self.section:
+            event["section"] = self.section
+        _emit(self.progress, event)
+
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+
+def _add_usage(usage: Optional[Dict[str, int]], message: Any) -> None:
+    counts = getattr(message, "usage", None)
+    if usage is None or counts is None:
+        return
+    for field in USAGE_FIELDS:
+        usage[field] = usage.get(field, 0) + (getattr(counts, field, 0) or 0)
+
+
+class _CallContext:
+    """Per-call state shared by the model calls of one Stage 2 generation.
+
+    ``usage`` accumulates the token counts, ``models`` the calls each model
+    served and ``stop_reasons`` why each output ended. ``model``, when set,
+    is tried before ANTHROPIC_MODEL and the fallback; ``attempt`` and
+    ``section`` label the progress events of a streamed call.
+    """
+
+    def __init__(self, progress: Optional[ProgressCallback] = None, section: Optional[str] = None) -> None:
+        self.progress = progress
+        self.section = section
+        self.attempt = 1
+        self.model: Optional[str] = None
+        self.usage: Dict[str, int] = {}
+        self.models: Dict[str, int] = {}
+        self.stop_reasons: list[Optional[str]] = []
+
+    def monitor(self) -> _StreamMonitor:
+        return _StreamMonitor(self.progress, self.attempt, self.section)
+
+    def finish(self, model_name: str, message: Any) -> str:
+        """Record a served call and return its output text."""
+        _add_usage(self.usage, message)
+        self.stop_reasons.append(getattr(message, "stop_reason", None))
+        _mark_model_served(model_name, self.models)
+        return _message_text(model_name, message)
+
+
+def _model_failed(model_name: str, exc: Exception) -> bool:
+    """Whether to try the next model after ``exc``; marks the model unavailable if so."""
+    if isinstance(exc, MalformedStreamError) or not _is_model_unavailable(exc):
+        # A malformed stream means the model answered; its output is the
+        # problem, which the corrective retry handles.
+        return False
+    _mark_model_unavailable(model_name)
+    return True
+
+
+def _send_request(request: Dict[str, Any], context: Optional[_CallContext] = None) -> str:
+    """Send one request to the first routable model, recording the call in ``context``."""
+    context = context or _CallContext()
+    client = get_anthropic_client()
+    model_candidates = _anthropic_model_candidates(context.model)
+
+    last_error: Optional[Exception] = None
+    for model_name in _routable_models(model_candidates):
+        try:
+            if _streaming_enabled():
+                monitor = context.monitor()
+                with client.messages.stream(model=model_name, **request) as stream:
+                    for event in stream:
+                        monitor.feed_event(event)
+                    message = stream.get_final_message()
+            else:
+                message = client.messages.create(model=model_name, **request)
+        except Exception as exc:
+            if not _model_failed(model_name, exc):
+                raise
+            last_error = exc
+            continue
+        return context.finish(model_name, message)
+
+    raise _no_model_available(last_error)
+
+
+async def _send_request_async(request: Dict[str, Any], context: Optional[_CallContext] = None) -> str:
+    context = context or _CallContext()
+    client = get_async_anthropic_client()
+    model_candidates = _anthropic_model_candidates(context.model)
+
+    last_error: Optional[Exception] = None
+    for model_name in _routable_models(model_candidates):
+        try:
+            if _streaming_enabled():
+                monitor = context.monitor()
+                async with client.messages.stream(model=model_name, **request) as stream:
+                    async for event in stream:
+                        monitor.feed_event(event)
+                    message = await stream.get_final_message()
+            else:
+                message = await client.messages.create(model=model_name, **request)
+        except Exception as exc:
+            if not _model_failed(model_name, exc):
+                raise
+            last_error = exc
+            continue
+        return context.finish(model_name, message)
+
+    raise _no_model_available(last_error)
+
+
+def _call_anthropic(
+    system_prompt: str, user_content: str, context: Optional[_CallContext] = None, **request_options: Any
+) -> str:
+    """One Stage 2 call; ``request_options`` go to _anthropic_request."""
+    return _send_request(_anthropic_request(system_prompt, user_content, **request_options), context)
+
+
+async def _call_anthropic_async(
+    system_prompt: str, user_content: str, context: Optional[_CallContext] = None, **request_options: Any
+) -> str:
+    return await _send_request_async(_anthropic_request(system_prompt, user_content, **request_options), context)
+
+
+def _fix_request(system_prompt: str, broken_output: str, instruction: str) -> Dict[str, Any]:
+    """Build a repair call: the cached system prompt and the broken output, but no source payload."""
+    return {
+        "max_tokens": int(os.environ.get("ANTHROPIC_MAX_TOKENS", DEFAULT_ANTHROPIC_MAX_TOKENS)),
+        "system": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"BROKEN_OUTPUT:\n{broken_output}"},
+                    {"type": "text", "text": instruction},
+                ],
+            }
+        ],
+        **_output_params(system_prompt),
+    }
+
+
+def _call_anthropic_fix(
+    system_prompt: str, broken_output: str, instruction: str, context: Optional[_CallContext] = None
+) -> str:
+    return _send_request(_fix_request(system_prompt, broken_output, instruction), context)
+
+
+async def _call_anthropic_fix_async(
+    system_prompt: str, broken_output: str, instruction: str, context: Optional[_CallContext] = None
+) -> str:
+    return await _send_request_async(_fix_request(system_prompt, broken_output, instruction), context)
+
+
+def _local_calculations_enabled() -> bool:
+    return _env_flag("LOCAL_CALCULATIONS_ENABLED", False)
+
+
+def _finalize_record(record: Dict[str, Any], computed: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    if _local_calculations_enabled():
+        record = apply_analysis(record, computed)
+    return _limit_to_latest_periods(record, max_periods=3)
+
+
+def _local_calculation_task() -> Optional[str]:
+    if not _local_calculations_enabled():
+        return None
+    fields = "; ".join(f"{section}: {fields}" for section, fields in LOCAL_CALCULATION_NARRATIVE_FIELDS.items())
+    return (
+        "financial_ratios, integrity_check and the figures of the analysis sections are computed locally from your "
+        "statements with the framework formulas after this call. Emit financial_ratios and integrity_check as {} and "
+        f"give the analysis sections only these fields: {fields}. analysis_summary stays complete. "
+        f"{UNRESTRICTED_CASH_INSTRUCTION}"
+    )
+
+
+def _validate_full_response(parsed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    candidate = _extract_schema_candidate(parsed)
+    valid, error = _validate_kreditlab_schema(candidate)
+    if valid:
+        return _finalize_record(candidate), None
+    return None, error
+
+
+def _validate_locally_calculated_response(parsed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a record generated under _local_calculation_task.
+
+    The model left financial_ratios and integrity_check empty, so a record
+    the figures cannot be computed for is rejected rather than shipped
+    without them; the corrective retry asks for the missing periods.
+    """
+    candidate = _extract_schema_candidate(parsed)
+    valid, error = _validate_kreditlab_schema(candidate)
+    if not valid:
+        return None, error
+    computed = compute_analysis(candidate)
+    if not computed:
+        return None, (
+            "company_info.periods_analyzed is missing or empty: it must map every period key used in the "
+            "statements to its label, since the analysis figures are computed from it"
+        )
+    return _finalize_record(candidate, computed), None
+
+
+def _llm_fix_enabled() -> bool:
+    return _env_flag("STAGE2_LLM_FIX_ENABLED", True)
+
+
+class _Stage2Attempts:
+    """Validation and tiered recovery for one Stage 2 generation.
+
+    By default the response must be a complete KreditLab record; sectioned
+    transforms pass their own ``validate`` (parsed JSON -> ``(result, error)``),
+    the keys to demand and a ``task`` instruction.
+
+    An invalid response is recovered by the cheapest tier that works: local
+    repair (keys hoisted from wrappers), then one small fix call that sends
+    only the broken output, and only then a full regeneration with the
+    source payload. Output cut off by max_tokens is never repaired or
+    accepted: it goes straight to regeneration. ``record`` holds the tier reached,
+    the model calls made and their token usage; it is appended to
+    ``generations`` when one is given. With a ``route`` (models from the
+    routed tier upward), attempt N goes to its Nth model, so every
+    regeneration escalates.
+    """
+
+    max_attempts = 3
+
+    def __init__(
+        self,
+        progress: Optional[ProgressCallback] = None,
+        validate: Callable[[Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Optional[str]]] = _validate_full_response,
+        required_keys: Optional[list[str]] = None,
+        task: Optional[str] = None,
+        section: Optional[str] = None,
+        generations: Optional[list[Dict[str, Any]]] = None,
+        route: Optional[list[str]] = None,
+    ) -> None:
+        self.progress = progress
+        self.route = route
+        self.validate = validate
+        self.required_keys = required_keys
+        self.task = task
+        self.section = section
+        self.parse_error: Optional[Exception] = None
+        self.schema_error: Optional[str] = None
+        self.last_response: Optional[str] = None
+        self.partial: Optional[Dict[str, Any]] = None
+        self.truncated = False
+        self.context = _CallContext(progress, section)
+        self.fix_used = False
+        self._fix_base: Optional[Dict[str, Any]] = None
+        self.record: Dict[str, Any] = {
+            "section": section or "record",
+            "output_mode": _output_mode(),
+            "tier": None,
+            "llm_calls": 0,
+            "call_seconds": [],
+            "usage": self.context.usage,
+            "models": self.context.models,
+        }
+        if generations is not None:
+            generations.append(self.record)
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        if self.section:
+            event["section"] = self.section
+        _emit(self.progress, event)
+
+    def _keys(self) -> list[str]:
+        return self.required_keys or sorted(REQUIRED_TOP_LEVEL_KEYS)
+
+    def _model(self, attempt: int) -> Optional[str]:
+        if not self.route:
+            return None
+        return self.route[min(attempt, len(self.route)) - 1]
+
+    def _context(self, attempt: int) -> _CallContext:
+        self.context.attempt = attempt
+        self.context.model = self._model(attempt)
+        return self.context
+
+    def call_kwargs(self, attempt: int) -> Dict[str, Any]:
+        """Per-attempt arguments for _call_anthropic / _call_anthropic_async."""
+        event: Dict[str, Any] = {"event": "attempt_started", "attempt": attempt}
+        if self.route:
+            event["model"] = self._model(attempt)
+        self._emit(event)
+        self.record["llm_calls"] += 1
+        kwargs: Dict[str, Any] = {
+            "context": self._context(attempt),
+            "required_keys": self.required_keys,
+            "task": self.task,
+        }
+        if attempt > 1:
+            kwargs.update(corrective=True, correction=self.correction())
+        return kwargs
+
+    def reject(self, exc: MalformedStreamError, attempt: int) -> None:
+        self.parse_error = exc
+        self.last_response = None
+        self.partial = None
+        self.truncated = False
+        LOGGER.warning("Aborted malformed Anthropic stream on attempt %s: %s", attempt, exc)
+        self._emit({"event": "attempt_aborted", "attempt": attempt, "reason": str(exc)})
+
+    def _validated(self, parsed: Dict[str, Any], attempt: int, tier: str) -> Optional[Dict[str, Any]]:
+        try:
+            result, error = self.validate(parsed)
+        except Exception as exc:
+            self.parse_error = exc
+            return None
+        if result is None:
+            self.schema_error = error
+            return None
+        self.record["tier"] = tier
+        _record_generation_stats(self.record)
+        self._emit({"event": "validated", "attempt": attempt, "tier": tier})
+        return result
+
+    def _invalid(self, attempt: int) -> None:
+        LOGGER.warning(
+            "Anthropic response invalid on attempt %s: %s", attempt, self.schema_error or self.parse_error
+        )
+        self._emit(
+            {"event": "attempt_invalid", "attempt": attempt, "reason": str(self.schema_error or self.parse_error)}
+        )
+
+    def _cut_off(self, decoder: TolerantJsonDecoder) -> bool:
+        """Whether the last output stopped at max_tokens or left its object open."""
+        self.truncated = decoder.partial is not None or (
+            bool(self.context.stop_reasons) and self.context.stop_reasons[-1] == "max_tokens"
+        )
+        if self.truncated:
+            self.parse_error = ValueError("Output was cut off by max_tokens before the JSON object was complete")
+            self.schema_error = None
+        return self.truncated
+
+    def _recover(self, response: str, attempt: int, tier: str) -> Optional[Dict[str, Any]]:
+        self.last_response = response
+        self.partial = None
+        parsed = None
+        decoder = TolerantJsonDecoder()
+        try:
+            parsed = _unwrap_list(decode_json_object(response, decoder), self._keys())
+        except Exception as exc:
+            self.parse_error = exc
+        if self._cut_off(decoder):
+            # A partial reading is never accepted, however it would validate.
+            self._invalid(attempt)
+            return None
+        if isinstance(parsed, dict):
+            result = self._validated(parsed, attempt, tier)
+            if result is not None:
+                return result
+        repaired = _local_repair(parsed, self._keys())
+        if repaired is not None:
+            result = self._validated(repaired, attempt, "local_repair" if tier != "llm_fix" else tier)
+            if result is not None:
+                return result
+            self.partial = repaired
+        self._invalid(attempt)
+        return None
+
+    def accept(self, response: str, attempt: int) -> Optional[Dict[str, Any]]:
+        """Return the validated result, repairing locally if needed, or None if it must be retried."""
+        return self._recover(response, attempt, "direct" if attempt == 1 else "regenerate")
+
+    def can_fix(self) -> bool:
+        # A fix call would have to invent the missing end of a cut-off output.
+        return _llm_fix_enabled() and not self.fix_used and self.last_response is not None and not self.truncated
+
+    def fix_kwargs(self, attempt: int) -> Dict[str, Any]:
+        """Arguments for _call_anthropic_fix: the broken output and what to do with it, no source payload."""
+        self.fix_used = True
+        self.record["llm_calls"] += 1
+        self._emit({"event": "repair_started", "attempt": attempt})
+        missing = [key for key in self._keys() if self.partial is not None and key not in self.partial]
+        if self.partial is not None and missing and len(missing) < len(self._keys()):
+            # The output parsed but is incomplete: ask for the missing keys only.
+            self._fix_base = self.partial
+            broken_output = json.dumps(self.partial, ensure_ascii=False, separators=(",", ":"))
+            instruction = (
+                f"The JSON above is valid but lacks these required top-level keys: {', '.join(missing)}. "
+                "Return ONLY one minified JSON object containing exactly those keys, completed from the data in "
+                "the JSON above following the framework rules and schema. No markdown fences, no extra text."
+            )
+        else:
+            self._fix_base = None
+            broken_output = self.last_response or ""
+            instruction = (
+                f"The output above is not a valid KreditLab JSON object: {self.schema_error or self.parse_error}. "
+                "Return the same content as ONE valid minified JSON object: fix only the syntax and structure, "
+                "keep every key and value. No markdown fences, no extra text."
+            )
+        if self.task:
+            instruction += f"\n\n{self.task}"
+        return {
+            "broken_output": broken_output,
+            "instruction": instruction,
+            "context": self._context(attempt),
+        }
+
+    def accept_fix(self, response: str, attempt: int) -> Optional[Dict[str, Any]]:
+        if self._fix_base is None:
+            return self._recover(response, attempt, "llm_fix")
+        base = self._fix_base
+        decoder = TolerantJsonDecoder()
+        completion = None
+        try:
+            completion = _unwrap_list(decode_json_object(response, decoder), self._keys())
+        except Exception as exc:
+            self.parse_error = exc
+        if completion is not None and not isinstance(completion, dict):
+            self.parse_error = ValueError(f"Top-level JSON must be an object, received {type(completion).__name__}")
+            completion = None
+        if self._cut_off(decoder) or completion is None:
+            self._emit({"event": "attempt_invalid", "attempt": attempt, "reason": str(self.parse_error)})
+            return None
+        completion = _normalize_top_level_aliases(completion)
+        merged = {**base, **{key: value for key, value in completion.items() if key not in base}}
+        result = self._validated(merged, attempt, "llm_fix")
+        if result is None:
+            self._emit(
+                {"event": "attempt_invalid", "attempt": attempt, "reason": str(self.schema_error or self.parse_error)}
+            )
+        return result
+
+    def correction(self) -> str:
+        if self.truncated:
+            return (
+                "Your last output was cut off by the output token limit before the JSON object was complete. "
+                "Re-generate the complete JSON from the source data above as compact minified JSON: no "
+                "whitespace between tokens, no repeated text. Return ONLY one JSON object with all required "
+                "keys and no markdown fences."
+            )
+        return (
+            "Your last output was invalid. Re-generate the complete JSON from the source data above. "
+            "Return ONLY one valid JSON object with all required keys and no markdown fences.\n\n"
+            f"PARSE_ERROR: {self.parse_error}\n"
+            f"SCHEMA_ERROR: {self.schema_error}"
+        )
+
+    def timed(self, started: float) -> None:
+        self.record["call_seconds"].append(round(time.perf_counter() - started, 3))
+
+    def failure(self) -> RuntimeError:
+        self.record["tier"] = "failed"
+        _record_generation_stats(self.record)
+        if self.parse_error is not None:
+            error = RuntimeError(f"Claude response is not valid JSON after retries: {self.parse_error}")
+            error.__cause__ = self.parse_error
+            return error
+        if self.schema_error is not None:
+            return RuntimeError(f"Claude response failed schema checks after retries: {self.schema_error}")
+        return RuntimeError("Claude response was invalid after retries")
+
+
+def _run_attempts(system_prompt: str, user_content: str, attempts: _Stage2Attempts) -> Dict[str, Any]:
+    for attempt in range(1, attempts.max_attempts + 1):
+        started = time.perf_counter()
+        try:
+            response = _call_anthropic(system_prompt, user_content, **attempts.call_kwargs(attempt))
+        except MalformedStreamError as exc:
+            attempts.reject(exc, attempt)
+            continue
+        finally:
+            attempts.timed(started)
+        result = attempts.accept(response, attempt)
+        if result is None and attempts.can_fix():
+            started = time.perf_counter()
+            try:
+                fixed = _call_anthropic_fix(system_prompt, **attempts.fix_kwargs(attempt))
+            except MalformedStreamError as exc:
+                attempts.reject(exc, attempt)
+                fixed = None
+            finally:
+                attempts.timed(started)
+            if fixed is not None:
+                result = attempts.accept_fix(fixed, attempt)
+        if result is not None:
+            return result
+    raise attempts.failure()
+
+
+async def _run_attempts_async(system_prompt: str, user_content: str, attempts: _Stage2Attempts) -> Dict[str, Any]:
+    for attempt in range(1, attempts.max_attempts + 1):
+        started = time.perf_counter()
+        try:
+            response = await _call_anthropic_async(system_prompt, user_content, **attempts.call_kwargs(attempt))
+        except MalformedStreamError as exc:
+            attempts.reject(exc, attempt)
+            continue
+        finally:
+            attempts.timed(started)
+        result = attempts.accept(response, attempt)
+        if result is None and attempts.can_fix():
+            started = time.perf_counter()
+            try:
+                fixed = await _call_anthropic_fix_async(system_prompt, **attempts.fix_kwargs(attempt))
+            except MalformedStreamError as exc:
+                attempts.reject(exc, attempt)
+                fixed = None
+            finally:
+                attempts.timed(started)
+            if fixed is not None:
+                result = attempts.accept_fix(fixed, attempt)
+        if result is not None:
+            return result
+    raise attempts.failure()
+
+
+def _sectioned_enabled() -> bool:
+    return _env_flag("STAGE2_SECTIONED_ENABLED", False)
+
+
+def _validate_core_response(parsed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    core = _normalize_top_level_aliases(parsed)
+    missing = [key for key in STAGE2_CORE_REQUIRED_KEYS if key not in core]
+    if missing:
+        return None, f"Missing required top-level keys: {', '.join(missing)}"
+    for section in STAGE2_ANALYSIS_SECTIONS:
+        core.pop(section, None)
+    return core, None
+
+
+def _record_attempts(
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]],
+    route: Optional[list[str]] = None,
+) -> _Stage2Attempts:
+    """Attempts for a single full-record generation."""
+    if _local_calculations_enabled():
+        return _Stage2Attempts(
+            progress,
+            validate=_validate_locally_calculated_response,
+            task=_local_calculation_task(),
+            generations=generations,
+            route=route,
+        )
+    return _Stage2Attempts(progress, generations=generations, route=route)
+
+
+def _core_attempts(
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]],
+    route: Optional[list[str]] = None,
+) -> _Stage2Attempts:
+    task = (
+        "This call produces the source-derived part of the record only: include every schema section EXCEPT "
+        f"{', '.join(STAGE2_ANALYSIS_SECTIONS)}. Those analysis sections are generated separately from your output."
+    )
+    if _local_calculations_enabled():
+        task += f" {UNRESTRICTED_CASH_INSTRUCTION}"
+    return _Stage2Attempts(
+        progress,
+        validate=_validate_core_response,
+        required_keys=list(STAGE2_CORE_REQUIRED_KEYS),
+        task=task,
+        section="core",
+        generations=generations,
+        route=route,
+    )
+
+
+def _analysis_sections(computed: Dict[str, Any]) -> tuple[str, ...]:
+    if computed:
+        # Nothing in financial_ratios is narrative, so no call is needed for it.
+        return tuple(section for section in STAGE2_ANALYSIS_SECTIONS if section != "financial_ratios")
+    # Without computed figures (local calculations off, or no usable periods in
+    # the core) every section, ratios included, is generated.
+    return STAGE2_ANALYSIS_SECTIONS
+
+
+def _section_task(section: str, core: Dict[str, Any], computed: Dict[str, Any]) -> str:
+    task = (
+        f"This call produces ONLY the '{section}' section, as a JSON object whose single top-level key is "
+        f"'{section}', following the framework rules and schema for it exactly. "
+    )
+    if not computed:
+        return (
+            f"{task}Base every figure on these already extracted statements and use the same period keys:\n"
+            f"EXTRACTED_STATEMENTS: {json.dumps(core, ensure_ascii=False, separators=(',', ':'))}"
+        )
+    figures = computed if section == "analysis_summary" else computed.get(section, {})
+    if section in LOCAL_CALCULATION_NARRATIVE_FIELDS:
+        task += (
+            f"Its figures are already computed; give only {LOCAL_CALCULATION_NARRATIVE_FIELDS[section]}. "
+        )
+    return (
+        f"{task}Every figure the text cites must match the computed figures and the extracted statements:\n"
+        f"COMPUTED_FIGURES: {json.dumps(figures, ensure_ascii=False, separators=(',', ':'))}\n"
+        f"EXTRACTED_STATEMENTS: {json.dumps(core, ensure_ascii=False, separators=(',', ':'))}"
+    )
+
+
+def _section_attempts(
+    section: str,
+    core: Dict[str, Any],
+    computed: Dict[str, Any],
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]],
+    route: Optional[list[str]] = None,
+) -> _Stage2Attempts:
+    def validate(parsed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        value = parsed.get(section)
+        if not isinstance(value, dict):
+            return None, f"Missing required top-level key: {section}"
+        return {section: value}, None
+
+    return _Stage2Attempts(
+        progress,
+        validate=validate,
+        required_keys=[section],
+        task=_section_task(section, core, computed),
+        section=section,
+        generations=generations,
+        route=route,
+    )
+
+
+def _assemble_sections(core: Dict[str, Any], sections: list[Dict[str, Any]]) -> Dict[str, Any]:
+    assembled = dict(core)
+    for section in sections:
+        assembled.update(section)
+    valid, error = _validate_kreditlab_schema(assembled)
+    if not valid:
+        raise RuntimeError(f"Sectioned transform produced an invalid record: {error}")
+    return _finalize_record(assembled)
+
+
+def _transform_sectioned(
+    system_prompt: str,
+    user_content: str,
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]] = None,
+    route: Optional[list[str]] = None,
+) -> Dict[str, Any]:
+    """Generate the core statements, then every analysis section concurrently."""
+    core = _run_attempts(system_prompt, user_content, _core_attempts(progress, generations, route))
+    computed = compute_analysis(core) if _local_calculations_enabled() else {}
+    sections_to_generate = _analysis_sections(computed)
+    with ThreadPoolExecutor(max_workers=len(sections_to_generate)) as executor:
+        sections = list(
+            executor.map(
+                lambda section: _run_attempts(
+                    system_prompt, user_content, _section_attempts(section, core, computed, progress, generations, route)
+                ),
+                sections_to_generate,
+            )
+        )
+    return _assemble_sections(core, sections)
+
+
+async def _transform_sectioned_async(
+    system_prompt: str,
+    user_content: str,
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]] = None,
+    route: Optional[list[str]] = None,
+) -> Dict[str, Any]:
+    core = await _run_attempts_async(system_prompt, user_content, _core_attempts(progress, generations, route))
+    computed = compute_analysis(core) if _local_calculations_enabled() else {}
+    sections = await asyncio.gather(
+        *(
+            _run_attempts_async(
+                system_prompt, user_content, _section_attempts(section, core, computed, progress, generations, route)
+            )
+            for section in _analysis_sections(computed)
+        )
+    )
+    return _assemble_sections(core, list(sections))
+
+
+def _stage2_inputs(
+    extraction_result: Dict[str, Any],
+    combination_context: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+    """Return ``(system_prompt, user_content, transform_cache_key, route)`` for one transform."""
+    system_prompt = _load_system_prompt()
+    user_payload = _prepare_stage2_payload(
+        extraction_result=extraction_result,
+        combination_context=combination_context,
+    )
+    max_tokens = int(os.environ.get("ANTHROPIC_MAX_TOKENS", DEFAULT_ANTHROPIC_MAX_TOKENS))
+    mode = "sectioned" if _sectioned_enabled() else "single"
+    if _local_calculations_enabled():
+        mode += "+local-calculations"
+    if _tool_output_enabled():
+        mode += "+tool"
+    route = _model_route(user_payload)
+    if route is not None:
+        mode += f"+routed:{','.join(route['models'])}"
+    cache_key = _transform_cache_key(user_payload, system_prompt, max_tokens, mode)
+    return system_prompt, json.dumps(user_payload, ensure_ascii=False), cache_key, route
+
+
+def _recovery_summary(generations: list[Dict[str, Any]], cache_hit: bool = False) -> Dict[str, Any]:
+    """Aggregate per-generation recovery records into transform metadata."""
+    tiers = [generation["tier"] or "failed" for generation in generations]
+    if cache_hit:
+        tiers.append("cached")
+    usage: Dict[str, int] = {}
+    models: Dict[str, int] = {}
+    for generation in generations:
+        for field, count in generation["usage"].items():
+            usage[field] = usage.get(field, 0) + count
+        for model, count in generation["models"].items():
+            models[model] = models.get(model, 0) + count
+    return {
+        "cache_hit": cache_hit,
+        "recovery_tier": max(tiers, key=RECOVERY_TIERS.index) if tiers else "cached",
+        "llm_calls": sum(generation["llm_calls"] for generation in generations),
+        "usage": usage,
+        "models": models,
+        "generations": generations,
+    }
+
+
+def _record_recovery(
+    metadata: Optional[Dict[str, Any]],
+    generations: list[Dict[str, Any]],
+    cache_hit: bool,
+    route: Optional[Dict[str, Any]] = None,
+) -> None:
+    summary = _recovery_summary(generations, cache_hit)
+    summary["route"] = route
+    if not cache_hit:
+        LOGGER.info(
+            "Stage 2 transform recovered at tier %s with %s model call(s)",
+            summary["recovery_tier"],
+            summary["llm_calls"],
+        )
+    if metadata is not None:
+        metadata.update(summary)
+
+
+def _combine_recovery(
+    metadata: Optional[Dict[str, Any]], transforms: list[Dict[str, Any]], generations: list[Dict[str, Any]]
+) -> None:
+    """Fold the metadata of several transforms, plus extra generations, into one summary.
+
+    It is a cache hit only when every transform was, and every extra
+    generation (a reconciliation pass) was also served from the cache.
+    """
+    if metadata is None:
+        return
+    combined = [generation for transform in transforms for generation in transform.get("generations", [])]
+    cache_hit = all(transform.get("cache_hit") for transform in transforms) and all(
+        generation["tier"] == "cached" for generation in generations
+    )
+    metadata.update(_recovery_summary(combined + generations, cache_hit))
+
+
+def transform_to_kreditlab_json(
+    extraction_result: Dict[str, Any],
+    combination_context: Optional[Dict[str, Any]] = None,
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Transform an extraction result into validated KreditLab JSON.
+
+    Validated output is cached per Stage 2 payload, prompt, model and
+    max_tokens. ``bypass_cache`` forces a fresh generation, whose result
+    then replaces the cached one. ``progress`` receives event dicts
+    (``attempt_started``, ``key_completed``, ``output_progress``,
+    ``attempt_aborted``, ``attempt_invalid``, ``repair_started``,
+    ``validated``, ``cache_hit``). ``metadata``, if given, receives
+    ``cache_hit``, the worst ``recovery_tier`` any generation needed
+    (see RECOVERY_TIERS), ``llm_calls``, summed token ``usage``, the
+    calls each model served (``models``), the per-generation
+    ``generations`` records and the model ``route`` (None unless
+    STAGE2_MODEL_ROUTING_ENABLED is on).
+    """
+    system_prompt, user_content, cache_key, route = _stage2_inputs(extraction_result, combination_context)
+    cache = _get_transform_cache()
+    if not bypass_cache:
+        cached = _transform_cache_lookup(cache, cache_key)
+        if cached is not None:
+            _emit(progress, {"event": "cache_hit"})
+            _record_recovery(metadata, [], cache_hit=True, route=route)
+            return cached
+
+    generations: list[Dict[str, Any]] = []
+    models = route["models"] if route else None
+    started = time.perf_counter()
+    kreditlab_json = None
+    if _sectioned_enabled():
+        try:
+            kreditlab_json = _transform_sectioned(system_prompt, user_content, progress, generations, models)
+        except Exception as exc:
+            LOGGER.warning("Sectioned transform failed, falling back to a single generation: %s", exc)
+    if kreditlab_json is None:
+        kreditlab_json = _run_attempts(
+            system_prompt,
+            user_content,
+            _record_attempts(progress, generations, models),
+        )
+    if route is not None:
+        _record_route_stats(route, generations, time.perf_counter() - started)
+    _record_recovery(metadata, generations, cache_hit=False, route=route)
+    _transform_cache_store(cache, cache_key, kreditlab_json)
+    return kreditlab_json
+
+
+async def transform_to_kreditlab_json_async(
+    extraction_result: Dict[str, Any],
+    combination_context: Optional[Dict[str, Any]] = None,
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Non-blocking variant of transform_to_kreditlab_json for use on the event loop.
+
+    Payload preparation and cache access run in worker threads; the
+    generation itself is awaited on the shared AsyncAnthropic client, so no
+    thread is held while the model is writing. ``progress`` is called on the
+    event loop.
+    """
+    system_prompt, user_content, cache_key, route = await asyncio.to_thread(
+        _stage2_inputs, extraction_result, combination_context
+    )
+    cache = _get_transform_cache()
+    if not bypass_cache:
+        cached = await asyncio.to_thread(_transform_cache_lookup, cache, cache_key)
+        if cached is not None:
+            _emit(progress, {"event": "cache_hit"})
+            _record_recovery(metadata, [], cache_hit=True, route=route)
+            return cached
+
+    generations: list[Dict[str, Any]] = []
+    models = route["models"] if route else None
+    started = time.perf_counter()
+    kreditlab_json = None
+    if _sectioned_enabled():
+        try:
+            kreditlab_json = await _transform_sectioned_async(system_prompt, user_content, progress, generations, models)
+        except Exception as exc:
+            LOGGER.warning("Sectioned transform failed, falling back to a single generation: %s", exc)
+    if kreditlab_json is None:
+        kreditlab_json = await _run_attempts_async(
+            system_prompt,
+            user_content,
+            _record_attempts(progress, generations, models),
+        )
+    if route is not None:
+        _record_route_stats(route, generations, time.perf_counter() - started)
+    _record_recovery(metadata, generations, cache_hit=False, route=route)
+    await asyncio.to_thread(_transform_cache_store, cache, cache_key, kreditlab_json)
+    return kreditlab_json
+
+
+def _check_case_record(case_json: Dict[str, Any]) -> None:
+    valid, error = _validate_kreditlab_schema(case_json)
+    if not valid:
+        raise ValueError(f"Case record is not a valid KreditLab record: {error}")
+
+
+def _merge_into_case(
+    case_json: Dict[str, Any], document_json: Dict[str, Any], metadata: Optional[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], bool]:
+    """Merge one document's record into a case; return it and whether the narrative needs reconciling.
+
+    Periods the document now supplies, including those it re-reads at the
+    same authority, and periods pushed out by the latest-periods limit, are
+    the affected ones. Figures are recomputed for
+    the merged record; the narrative only needs another pass when some
+    period changed.
+    """
+    case_periods = _record_periods(case_json)
+    # The document goes first so that it wins ties: an equally authoritative
+    # reading of a period replaces the one already in the case.
+    owners = _period_owners([_record_periods(document_json), case_periods])
+    merged = _finalize_record(merge_kreditlab_json_records([document_json, case_json]))
+    merged_periods = _record_periods(merged)
+    affected = sorted(key for key in merged_periods if owners[key][1] == 0)
+    dropped = sorted(set(case_periods) - set(merged_periods))
+    if metadata is not None:
+        metadata.update(affected_periods=affected, dropped_periods=dropped, reconciled=False)
+    return merged, bool(affected or dropped)
+
+
+def add_document_to_case(
+    case_json: Dict[str, Any],
+    extraction_result: Dict[str, Any],
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Add one document to an already transformed case.
+
+    Only the new document is transformed (through the usual cache); its
+    record is merged into ``case_json`` by source authority and the analysis
+    figures are recomputed. When the document changed any period, and
+    STAGE2_RECONCILE_ENABLED is on, a single narrative pass runs over the
+    merged record. ``metadata``, if given, receives ``affected_periods``,
+    ``dropped_periods`` and ``reconciled`` next to the recovery fields of
+    transform_to_kreditlab_json, which cover the reconciliation pass too.
+    """
+    _check_case_record(case_json)
+    document_json = transform_to_kreditlab_json(
+        extraction_result, bypass_cache=bypass_cache, progress=progress, metadata=metadata
+    )
+    merged, changed = _merge_into_case(case_json, document_json, metadata)
+    generations: list[Dict[str, Any]] = []
+    if changed and _reconcile_enabled():
+        try:
+            merged = _reconcile(merged, CASE_UPDATE_SOURCES, bypass_cache, progress, generations)
+            if metadata is not None:
+                metadata["reconciled"] = True
+        except Exception as exc:
+            LOGGER.warning("Reconciliation pass failed, returning the merged case: %s", exc)
+    _combine_recovery(metadata, [dict(metadata or {})], generations)
+    return merged
+
+
+async def add_document_to_case_async(
+    case_json: Dict[str, Any],
+    extraction_result: Dict[str, Any],
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    _check_case_record(case_json)
+    document_json = await transform_to_kreditlab_json_async(
+        extraction_result, bypass_cache=bypass_cache, progress=progress, metadata=metadata
+    )
+    merged, changed = await asyncio.to_thread(_merge_into_case, case_json, document_json, metadata)
+    generations: list[Dict[str, Any]] = []
+    if changed and _reconcile_enabled():
+        try:
+            merged = await _reconcile_async(merged, CASE_UPDATE_SOURCES, bypass_cache, progress, generations)
+            if metadata is not None:
+                metadata["reconciled"] = True
+        except Exception as exc:
+            LOGGER.warning("Reconciliation pass failed, returning the merged case: %s", exc)
+    _combine_recovery(metadata, [dict(metadata or {})], generations)
+    return merged
+
+
+def process_pdf(pdf: PdfSource, include_pdf: bool = False) -> Dict[str, Any]:
+    extraction_result = extract_with_tensorlake(pdf)
+    return process_extraction(extraction_result, include_pdf=include_pdf)
+
+
+def process_extraction(extraction_result: Dict[str, Any], include_pdf: bool = False) -> Dict[str, Any]:
+    kreditlab_json = transform_to_kreditlab_json(extraction_result)
+    return _render_result(kreditlab_json, include_pdf)
+
+
+async def process_extraction_async(extraction_result: Dict[str, Any], include_pdf: bool = False) -> Dict[str, Any]:
+    kreditlab_json = await transform_to_kreditlab_json_async(extraction_result)
+    return await asyncio.to_thread(_render_result, kreditlab_json, include_pdf)
+
+
+def _render_result(kreditlab_json: Dict[str, Any], include_pdf: bool) -> Dict[str, Any]:
+    html = generate_full_html(kreditlab_json)
+
+    result: Dict[str, Any] = {
+        "kreditlab_json": kreditlab_json,
+        "html": html,
+    }
+
+    if include_pdf:
         try:
             result["pdf_bytes"] = convert_html_to_pdf(html)
         except Exception as exc:
@@ -766,17 +2563,10 @@ def process_pdf(pdf_bytes: bytes, include_pdf: bool = False) -> Dict[str, Any]:
     return result
 
 
-def transform_multiple_extractions_to_kreditlab_json(
-    extraction_results: list[Dict[str, Any]],
-    source_filenames: Optional[list[str]] = None,
-) -> Dict[str, Any]:
-    if not extraction_results:
-        raise ValueError("At least one extraction result is required")
-
-    combined_extraction = _combine_extraction_results(extraction_results)
+def _combination_context(total_documents: int, source_filenames: Optional[list[str]]) -> Dict[str, Any]:
     combination_context: Dict[str, Any] = {
         "combine_documents": True,
-        "total_source_documents": len(extraction_results),
+        "total_source_documents": total_documents,
         "instruction": (
             "All uploaded files belong to ONE case and must be transformed into ONE canonical KreditLab JSON object "
             "(schema version v7.9). Use all source documents together (do not prioritize only one file), "
@@ -787,5 +2577,248 @@ def transform_multiple_extractions_to_kreditlab_json(
     }
     if source_filenames:
         combination_context["source_filenames"] = source_filenames
+    return combination_context
+
+
+def _document_context(document: int, source_filenames: Optional[list[str]]) -> Optional[Dict[str, Any]]:
+    """Attribution for one document's map call: its own file name, as single-call mode lists them all."""
+    if not source_filenames or document > len(source_filenames):
+        return None
+    return {"source_filenames": [source_filenames[document - 1]]}
+
+
+def _map_reduce_enabled() -> bool:
+    return _env_flag("STAGE2_MAP_REDUCE_ENABLED", False)
+
+
+def _reconcile_enabled() -> bool:
+    return _env_flag("STAGE2_RECONCILE_ENABLED", True)
+
+
+def _map_concurrency() -> int:
+    return max(1, int(os.environ.get("STAGE2_MAP_CONCURRENCY", DEFAULT_STAGE2_MAP_CONCURRENCY)))
+
+
+def _document_progress(progress: Optional[ProgressCallback], document: int) -> Optional[ProgressCallback]:
+    if progress is None:
+        return None
+    return lambda event: progress({**event, "document": document})
+
+
+def _validate_reconciled(parsed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    parsed = _normalize_top_level_aliases(parsed)
+    if not isinstance(parsed.get("analysis_summary"), dict):
+        return None, "Missing required top-level key: analysis_summary"
+    return {key: parsed[key] for key in STAGE2_RECONCILE_SECTIONS if isinstance(parsed.get(key), dict)}, None
+
+
+def _reconcile_inputs(
+    merged: Dict[str, Any],
+    sources: str,
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]],
+) -> Tuple[str, str, str, _Stage2Attempts]:
+    system_prompt = _load_system_prompt()
+    max_tokens = int(os.environ.get("ANTHROPIC_MAX_TOKENS", DEFAULT_ANTHROPIC_MAX_TOKENS))
+    cache_key = _transform_cache_key({"reconcile": merged}, system_prompt, max_tokens, "reconcile")
+    attempts = _Stage2Attempts(
+        progress,
+        validate=_validate_reconciled,
+        required_keys=list(STAGE2_RECONCILE_SECTIONS),
+        task=(
+            f"The data above is ONE KreditLab record merged from {sources} of the same case, already "
+            "reconciled by source authority. Its statements and figures are "
+            "final. Rewrite only the narrative and judgement content of these sections so it covers all periods "
+            "consistently and cites the figures exactly as given: "
+            f"{', '.join(STAGE2_RECONCILE_SECTIONS)}. Return a JSON object with only those keys."
+        ),
+        section="reconcile",
+        generations=generations,
+    )
+    return system_prompt, json.dumps(merged, ensure_ascii=False), cache_key, attempts
+
+
+def _apply_reconciliation(merged: Dict[str, Any], reconciled: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(merged)
+    for key, value in reconciled.items():
+        # The summary is rewritten as a whole; elsewhere rewritten narrative
+        # wins and the merged record fills whatever the pass left out.
+        result[key] = value if key == "analysis_summary" else _merge_structure(value, merged.get(key, {}))
+    return _finalize_record(result)
+
+
+def _reconcile(
+    merged: Dict[str, Any],
+    sources: str,
+    bypass_cache: bool,
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    system_prompt, user_content, cache_key, attempts = _reconcile_inputs(merged, sources, progress, generations)
+    cache = _get_transform_cache()
+    reconciled = None if bypass_cache else _transform_cache_lookup(cache, cache_key)
+    if reconciled is not None:
+        attempts.record["tier"] = "cached"
+    else:
+        reconciled = _run_attempts(system_prompt, user_content, attempts)
+        _transform_cache_store(cache, cache_key, reconciled)
+    return _apply_reconciliation(merged, reconciled)
+
 
-    return transform_to_kreditlab_json(combined_extraction, combination_context=combination_context)
+async def _reconcile_async(
+    merged: Dict[str, Any],
+    sources: str,
+    bypass_cache: bool,
+    progress: Optional[ProgressCallback],
+    generations: Optional[list[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    system_prompt, user_content, cache_key, attempts = _reconcile_inputs(merged, sources, progress, generations)
+    cache = _get_transform_cache()
+    reconciled = None if bypass_cache else await asyncio.to_thread(_transform_cache_lookup, cache, cache_key)
+    if reconciled is not None:
+        attempts.record["tier"] = "cached"
+    else:
+        reconciled = await _run_attempts_async(system_prompt, user_content, attempts)
+        await asyncio.to_thread(_transform_cache_store, cache, cache_key, reconciled)
+    return _apply_reconciliation(merged, reconciled)
+
+
+def _reduce_records(records: list[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = merge_kreditlab_json_records(records)
+    # Ratios and analysis figures are recomputed over the merged periods.
+    return _finalize_record(merged)
+
+
+def _transform_map_reduce(
+    extraction_results: list[Dict[str, Any]],
+    bypass_cache: bool,
+    progress: Optional[ProgressCallback],
+    metadata: Optional[Dict[str, Any]] = None,
+    source_filenames: Optional[list[str]] = None,
+) -> Dict[str, Any]:
+    """Transform each document on its own (concurrently, each cached, with its file name), then merge the records."""
+    documents: list[Dict[str, Any]] = [{} for _ in extraction_results]
+    workers = min(_map_concurrency(), len(extraction_results))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = list(
+            executor.map(
+                lambda item: transform_to_kreditlab_json(
+                    item[1],
+                    combination_context=_document_context(item[0], source_filenames),
+                    bypass_cache=bypass_cache,
+                    progress=_document_progress(progress, item[0]),
+                    metadata=documents[item[0] - 1],
+                ),
+                enumerate(extraction_results, start=1),
+            )
+        )
+    merged = _reduce_records(records)
+    generations: list[Dict[str, Any]] = []
+    if _reconcile_enabled():
+        try:
+            merged = _reconcile(
+                merged, f"{len(records)} separately transformed source documents", bypass_cache, progress, generations
+            )
+        except Exception as exc:
+            LOGGER.warning("Reconciliation pass failed, returning the merged record: %s", exc)
+    _combine_recovery(metadata, documents, generations)
+    if metadata is not None:
+        metadata["documents"] = documents
+    return merged
+
+
+async def _transform_map_reduce_async(
+    extraction_results: list[Dict[str, Any]],
+    bypass_cache: bool,
+    progress: Optional[ProgressCallback],
+    metadata: Optional[Dict[str, Any]] = None,
+    source_filenames: Optional[list[str]] = None,
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(_map_concurrency())
+    documents: list[Dict[str, Any]] = [{} for _ in extraction_results]
+
+    async def transform_document(document: int, extraction_result: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await transform_to_kreditlab_json_async(
+                extraction_result,
+                combination_context=_document_context(document, source_filenames),
+                bypass_cache=bypass_cache,
+                progress=_document_progress(progress, document),
+                metadata=documents[document - 1],
+            )
+
+    records = await asyncio.gather(
+        *(transform_document(document, item) for document, item in enumerate(extraction_results, start=1))
+    )
+    merged = await asyncio.to_thread(_reduce_records, list(records))
+    generations: list[Dict[str, Any]] = []
+    if _reconcile_enabled():
+        try:
+            merged = await _reconcile_async(
+                merged, f"{len(records)} separately transformed source documents", bypass_cache, progress, generations
+            )
+        except Exception as exc:
+            LOGGER.warning("Reconciliation pass failed, returning the merged record: %s", exc)
+    _combine_recovery(metadata, documents, generations)
+    if metadata is not None:
+        metadata["documents"] = documents
+    return merged
+
+
+def transform_multiple_extractions_to_kreditlab_json(
+    extraction_results: list[Dict[str, Any]],
+    source_filenames: Optional[list[str]] = None,
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Transform several documents of one case into a single KreditLab record.
+
+    By default the documents are combined into one Stage 2 payload. With
+    STAGE2_MAP_REDUCE_ENABLED each document is transformed separately and
+    the records are merged by source authority, then optionally passed once
+    more through the model to reconcile the narrative. Progress events from
+    per-document transforms carry a 1-based ``document`` index. ``metadata``
+    receives the recovery fields of transform_to_kreditlab_json, summed over
+    every generation, plus a per-document ``documents`` list in map-reduce
+    mode.
+    """
+    if not extraction_results:
+        raise ValueError("At least one extraction result is required")
+    if _map_reduce_enabled() and len(extraction_results) > 1:
+        return _transform_map_reduce(extraction_results, bypass_cache, progress, metadata, source_filenames)
+
+    combined_extraction = _combine_extraction_results(extraction_results)
+    combination_context = _combination_context(len(extraction_results), source_filenames)
+    return transform_to_kreditlab_json(
+        combined_extraction,
+        combination_context=combination_context,
+        bypass_cache=bypass_cache,
+        progress=progress,
+        metadata=metadata,
+    )
+
+
+async def transform_multiple_extractions_to_kreditlab_json_async(
+    extraction_results: list[Dict[str, Any]],
+    source_filenames: Optional[list[str]] = None,
+    bypass_cache: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    if not extraction_results:
+        raise ValueError("At least one extraction result is required")
+    if _map_reduce_enabled() and len(extraction_results) > 1:
+        return await _transform_map_reduce_async(
+            extraction_results, bypass_cache, progress, metadata, source_filenames
+        )
+
+    combined_extraction = await asyncio.to_thread(_combine_extraction_results, extraction_results)
+    combination_context = _combination_context(len(extraction_results), source_filenames)
+    return await transform_to_kreditlab_json_async(
+        combined_extraction,
+        combination_context=combination_context,
+        bypass_cache=bypass_cache,
+        progress=progress,
+        metadata=metadata,
+    )
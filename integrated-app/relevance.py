@@ -0,0 +1,160 @@
+"""Rank extracted pages and tables so the Stage 2 budget goes to the statements first.
+
+Every candidate section (a page's text or one table) is scored with BM25
+against a fixed vocabulary of financial-statement terms, so words that occur
+everywhere ("year", "2024") weigh almost nothing, and is then boosted by
+statement-type detectors and by how numeric it is. Both term counting and
+detection each use a single compiled alternation, one scan per section.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+FINANCIAL_TERMS = (
+    "revenue",
+    "turnover",
+    "sales",
+    "cost of sales",
+    "gross profit",
+    "profit",
+    "loss",
+    "income",
+    "expenses",
+    "finance cost",
+    "finance costs",
+    "interest",
+    "depreciation",
+    "amortisation",
+    "amortization",
+    "ebitda",
+    "tax",
+    "taxation",
+    "asset",
+    "assets",
+    "liability",
+    "liabilities",
+    "equity",
+    "share capital",
+    "retained earnings",
+    "borrowings",
+    "loans",
+    "lease liabilities",
+    "inventories",
+    "receivables",
+    "payables",
+    "cash and bank balances",
+    "cash and cash equivalents",
+    "cash flow",
+    "cash flows",
+    "dividend",
+    "audit",
+    "audited",
+    "auditors",
+    "management",
+    "unaudited",
+)
+
+# name -> (pattern, boost). Boosts multiply the BM25 score; primary statements
+# outrank the notes and reports that support them.
+STATEMENT_DETECTORS = {
+    "statement_of_financial_position": (r"statements? of financial position|balance sheets?", 1.5),
+    "statement_of_comprehensive_income": (
+        r"statements? of (?:profit or loss|comprehensive income)|income statements?|profit and loss",
+        1.5,
+    ),
+    "statement_of_cash_flows": (r"statements? of cash flows?|cash flows? statements?", 1.0),
+    "management_accounts": (r"management accounts?|unaudited", 1.0),
+    "statement_of_changes_in_equity": (r"statements? of changes in equity", 0.5),
+    "notes_to_financial_statements": (r"notes to the financial statements", 0.3),
+    "auditors_report": (r"independent auditors?['’]? report|report of the auditors", 0.3),
+}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+STATEMENT_HEADING_CHARS = 400
+
+_TERM_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(term) for term in sorted(FINANCIAL_TERMS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+_DETECTOR_RE = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, (pattern, _) in STATEMENT_DETECTORS.items()),
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"\(?-?\d[\d,]*(?:\.\d+)?\)?")
+_WORD_RE = re.compile(r"\S+")
+
+
+def detect_statement(text: str) -> Optional[str]:
+    """Return the statement type named in the heading area of ``text``, if any.
+
+    Only the first match near the top counts: statement titles head their page,
+    while auditors' reports and notes mention every statement in passing.
+    """
+    match = _DETECTOR_RE.search(text, 0, STATEMENT_HEADING_CHARS)
+    return match.lastgroup if match else None
+
+
+def _profile(text: str) -> Tuple[Counter, int, float]:
+    terms = Counter(match.group(0).lower() for match in _TERM_RE.finditer(text))
+    words = len(_WORD_RE.findall(text)) or 1
+    numeric_ratio = min(1.0, len(_NUMBER_RE.findall(text)) / words)
+    return terms, words, numeric_ratio
+
+
+def rank_sections(sections: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    """Score sections in place and return them.
+
+    Each section needs ``text``; an optional ``statement`` is used when the
+    section's own text names no statement (a table under a page heading).
+    ``score`` and ``statement`` are filled in.
+    """
+    profiles = [_profile(section["text"]) for section in sections]
+    if not profiles:
+        return sections
+
+    average_length = sum(words for _, words, _ in profiles) / len(profiles)
+    document_frequency: Counter = Counter()
+    for terms, _, _ in profiles:
+        document_frequency.update(terms.keys())
+    total = len(profiles)
+    idf = {
+        term: math.log(1 + (total - count + 0.5) / (count + 0.5)) for term, count in document_frequency.items()
+    }
+
+    for section, (terms, words, numeric_ratio) in zip(sections, profiles):
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * words / average_length)
+        bm25 = sum(idf[term] * tf * (BM25_K1 + 1) / (tf + length_norm) for term, tf in terms.items())
+        statement = detect_statement(section["text"]) or section.get("statement")
+        boost = STATEMENT_DETECTORS[statement][1] if statement else 0.0
+        section["statement"] = statement
+        # A statement title alone (period, entity, basis) is worth keeping even
+        # when the page carries none of the vocabulary.
+        base = bm25 + (1.0 if statement else 0.0)
+        section["score"] = round(base * (1 + boost) * (1 + numeric_ratio), 4)
+    return sections
+
+
+def select_within_budget(
+    sections: Iterable[Dict[str, Any]],
+    char_budget: int,
+) -> Tuple[list[Dict[str, Any]], list[Dict[str, Any]]]:
+    """Greedily keep the highest-scoring sections whose ``size`` fits in the budget.
+
+    Returns ``(selected, dropped)``, both in their original order. Sections
+    scoring zero (no financial vocabulary at all) are always dropped. A section
+    too large for the space left is skipped so smaller, lower-ranked sections
+    can still use it.
+    """
+    indexed = list(enumerate(sections))
+    remaining = char_budget
+    keep: set[int] = set()
+    for index, section in sorted(indexed, key=lambda item: (-item[1]["score"], item[0])):
+        if section["score"] > 0 and section["size"] <= remaining:
+            keep.add(index)
+            remaining -= section["size"]
+    selected = [section for index, section in indexed if index in keep]
+    dropped = [section for index, section in indexed if index not in keep]
+    return selected, dropped
@@ -0,0 +1,115 @@
+"""Convert Tensorlake page chunks (markdown with embedded HTML tables) into page records.
+
+lxml is used when installed; otherwise the same output is produced with
+BeautifulSoup's pure-Python parser.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+from tabulate import tabulate
+
+try:
+    import lxml.html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+LXML_AVAILABLE = lxml is not None
+
+# Control characters lxml refuses (or, for NUL, silently replaces); OCR'd
+# chunks carry form feeds and the like.
+_XML_ILLEGAL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _chunk_to_page_lxml(raw_markdown: str) -> Dict[str, Any]:
+    root = lxml.html.fragment_fromstring(raw_markdown, create_parent="div")
+    matrices = []
+    # Each table is walked exactly once; its rows feed the matrix directly.
+    for table in root.iter("table"):
+        matrix = []
+        for row in table.iter("tr"):
+            matrix.append([cell.text_content().strip() for cell in row if cell.tag in ("td", "th")])
+        matrices.append(matrix)
+
+    # Text nodes outside any table, stripped and joined like bs4's get_text("\n", strip=True).
+    lines = (text.strip() for text in root.xpath(".//text()[not(ancestor::table)]"))
+    return {"text": "\n".join(line for line in lines if line), "tables": matrices}
+
+
+def _chunk_to_page_bs4(raw_markdown: str) -> Dict[str, Any]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(raw_markdown, "html.parser")
+    tables = soup.find_all("table")
+    for table in tables:
+        table.extract()
+    matrices = [
+        [[cell.get_text(strip=True) for cell in row.find_all(["td", "th"])] for row in table.find_all("tr")]
+        for table in tables
+    ]
+    return {"text": soup.get_text("\n", strip=True), "tables": matrices}
+
+
+def chunk_to_page(raw_markdown: str) -> Dict[str, Any]:
+    """Return ``{"text", "tables"}`` for one chunk, tables as row-major string matrices."""
+    if LXML_AVAILABLE:
+        if not raw_markdown.strip():
+            return {"text": "", "tables": []}
+        if not _XML_ILLEGAL_RE.search(raw_markdown):
+            return _chunk_to_page_lxml(raw_markdown)
+    # The pure-Python parser also takes chunks lxml cannot read, unchanged.
+    return _chunk_to_page_bs4(raw_markdown)
+
+
+def clean_number(value: str) -> Any:
+    try:
+        return int(value.replace(",", ""))
+    except Exception:
+        return value
+
+
+def matrix_to_objects(matrix: list[list[str]]) -> list[Dict[str, Any]]:
+    if not matrix or len(matrix) < 2:
+        return []
+
+    header = matrix[0]
+    objects = []
+    for row in matrix[1:]:
+        entry = {}
+        for h, v in zip(header, row):
+            h_low = h.lower().strip()
+            if h_low in ["2024", "year_2024"]:
+                entry["year_2024"] = clean_number(v)
+            elif h_low in ["2023", "as restated 2023", "year_2023"]:
+                entry["year_2023"] = clean_number(v)
+            elif h_low == "note":
+                entry["note"] = clean_number(v) if v else None
+            else:
+                entry["name"] = v
+        objects.append(entry)
+    return objects
+
+
+def render_grid(matrix: list[list[str]]) -> str:
+    """Render a table matrix (header row first) as tabulate grid art."""
+    return tabulate(matrix[1:], headers=matrix[0], tablefmt="grid")
+
+
+def _tsv_cell(value: Any) -> str:
+    return " ".join(str(value).split())
+
+
+def render_tsv(matrix: list[list[str]], max_rows: Optional[int] = None) -> str:
+    """Render a table matrix (header row first) as tab-separated lines.
+
+    Whitespace inside cells, tabs and newlines included, collapses to single
+    spaces so every line is exactly one row. ``max_rows`` limits body rows.
+    """
+    rows = matrix if max_rows is None else matrix[: max_rows + 1]
+    return "\n".join("\t".join(_tsv_cell(cell) for cell in row) for row in rows)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting and reporting (about four characters per token)."""
+    return (len(text) + 3) // 4
+
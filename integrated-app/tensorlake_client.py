@@ -0,0 +1,236 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+TENSORLAKE_API_BASE = "https://api.tensorlake.ai/documents/v2"
+DEFAULT_POLL_INTERVAL_SECONDS = 2.0
+DEFAULT_PARSE_TIMEOUT_SECONDS = 900.0
+DEFAULT_MAX_CONNECTIONS = 20
+TERMINAL_PARSE_STATUSES = {"successful", "failure", "failed", "error"}
+
+PdfSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only stream over an in-memory buffer.
+
+    Lets httpx stream a bytearray/memoryview in chunks without first copying
+    the whole PDF into a new bytes object.
+    """
+
+    def __init__(self, buffer: Union[bytearray, memoryview]) -> None:
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        size = min(len(target), len(self._view) - self._pos)
+        target[:size] = self._view[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def as_upload_content(source: PdfSource) -> Union[bytes, BinaryIO]:
+    """Return something httpx can stream as a multipart file without touching disk."""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return _BufferReader(source)
+    source.seek(0)
+    return source
+
+
+_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide keep-alive client for the running event loop."""
+    global _CLIENT, _CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _CLIENT is None or _CLIENT.is_closed or _CLIENT_LOOP is not loop:
+        max_connections = int(os.environ.get("TENSORLAKE_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+        _CLIENT = httpx.AsyncClient(
+            base_url=TENSORLAKE_API_BASE,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        _CLIENT_LOOP = loop
+    return _CLIENT
+
+
+async def aclose_async_client() -> None:
+    global _CLIENT, _CLIENT_LOOP
+    if _CLIENT is not None and not _CLIENT.is_closed:
+        await _CLIENT.aclose()
+    _CLIENT = None
+    _CLIENT_LOOP = None
+
+
+def _auth_headers(api_key: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+def _dump_options(options: Any) -> Dict[str, Any]:
+    dump = getattr(options, "model_dump", None)
+    if callable(dump):
+        return dump(mode="json", exclude_none=True)
+    return dict(options)
+
+
+async def upload_file_async(pdf: PdfSource, api_key: str, source: str = "integrated_app") -> str:
+    client = get_async_client()
+    response = await client.put(
+        "/files",
+        headers=_auth_headers(api_key),
+        files={"file_bytes": ("file.pdf", as_upload_content(pdf), "application/pdf")},
+        data={"labels": json.dumps({"source": source})},
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Tensorlake upload failed ({response.status_code}): {response.text}")
+    return response.json()["file_id"]
+
+
+async def start_parse_async(
+    file_id: str,
+    parsing_options: Any,
+    enrichment_options: Any,
+    api_key: str,
+) -> str:
+    client = get_async_client()
+    response = await client.post(
+        "/parse",
+        headers=_auth_headers(api_key),
+        json={
+            "file_id": file_id,
+            "parsing_options": _dump_options(parsing_options),
+            "enrichment_options": _dump_options(enrichment_options),
+        },
+    )
+    if response.status_code not in (200, 201, 202):
+        raise RuntimeError(f"Tensorlake parse request failed ({response.status_code}): {response.text}")
+    return response.json()["parse_id"]
+
+
+class ParsePoller:
+    """Waits on many in-flight parses with a single background polling task.
+
+    Callers register a parse id and await a future; the poller task fetches the
+    status of every pending parse once per interval over the shared client and
+    resolves futures as parses reach a terminal state. The task exits when
+    nothing is pending and is restarted on the next registration.
+    """
+
+    def __init__(self, poll_interval: float, parse_timeout: float) -> None:
+        self.poll_interval = poll_interval
+        self.parse_timeout = parse_timeout
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def wait(self, parse_id: str, api_key: str) -> "asyncio.Future[Dict[str, Any]]":
+        loop = asyncio.get_running_loop()
+        entry = self._pending.get(parse_id)
+        if entry is None:
+            entry = {
+                "future": loop.create_future(),
+                "api_key": api_key,
+                "deadline": time.monotonic() + self.parse_timeout,
+            }
+            self._pending[parse_id] = entry
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return asyncio.shield(entry["future"])
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.poll_interval)
+            parse_ids = list(self._pending)
+            outcomes = await asyncio.gather(
+                *(self._poll_once(parse_id) for parse_id in parse_ids),
+                return_exceptions=True,
+            )
+            for parse_id, outcome in zip(parse_ids, outcomes):
+                entry = self._pending.get(parse_id)
+                if entry is None:
+                    continue
+                future = entry["future"]
+                if isinstance(outcome, Exception):
+                    LOGGER.warning("Polling Tensorlake parse %s failed: %s", parse_id, outcome)
+                elif outcome is not None:
+                    del self._pending[parse_id]
+                    if not future.done():
+                        future.set_result(outcome)
+                    continue
+
+                if time.monotonic() > entry["deadline"]:
+                    del self._pending[parse_id]
+                    if not future.done():
+                        future.set_exception(TimeoutError(f"Tensorlake parse {parse_id} did not finish in time"))
+
+    async def _poll_once(self, parse_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._pending[parse_id]
+        client = get_async_client()
+        response = await client.get(f"/parse/{parse_id}", headers=_auth_headers(entry["api_key"]))
+        if response.status_code != 200:
+            raise RuntimeError(f"status check returned {response.status_code}: {response.text}")
+        body = response.json()
+        if str(body.get("status", "")).lower() in TERMINAL_PARSE_STATUSES:
+            return body
+        return None
+
+
+_POLLER: Optional[ParsePoller] = None
+
+
+def get_parse_poller() -> ParsePoller:
+    global _POLLER
+    if _POLLER is None:
+        _POLLER = ParsePoller(
+            poll_interval=float(os.environ.get("TENSORLAKE_POLL_INTERVAL_SECONDS", DEFAULT_POLL_INTERVAL_SECONDS)),
+            parse_timeout=float(os.environ.get("TENSORLAKE_PARSE_TIMEOUT_SECONDS", DEFAULT_PARSE_TIMEOUT_SECONDS)),
+        )
+    return _POLLER
+
+
+async def parse_and_wait_async(
+    file_id: str,
+    parsing_options: Any,
+    enrichment_options: Any,
+    api_key: str,
+) -> list[str]:
+    """Start a parse and return the markdown/HTML content of each chunk in order."""
+    parse_id = await start_parse_async(file_id, parsing_options, enrichment_options, api_key)
+    return await wait_for_parse_async(parse_id, api_key)
+
+
+async def wait_for_parse_async(parse_id: str, api_key: str) -> list[str]:
+    """Wait for an already started parse and return its chunk contents in order."""
+    body = await get_parse_poller().wait(parse_id, api_key)
+    status = str(body.get("status", "")).lower()
+    if status != "successful":
+        raise RuntimeError(f"Tensorlake parsing failed with status: {status} {body.get('error') or ''}".strip())
+    return [chunk.get("content", "") for chunk in body.get("chunks") or []]
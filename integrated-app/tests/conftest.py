@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app modules are flat files in integrated-app/, imported by name.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,35 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import Headers, UploadFile
+
+from app import _read_validated_pdf
+
+
+def _upload(data: bytes, size=None, content_type="application/pdf"):
+    return UploadFile(
+        io.BytesIO(data), size=size, filename="statement.pdf", headers=Headers({"content-type": content_type})
+    )
+
+
+def test_upload_without_size_is_measured_and_rewound():
+    upload = _upload(b"%PDF-1.7 body")
+    upload.file.seek(5)
+    payload = asyncio.run(_read_validated_pdf(upload))
+    assert payload.tell() == 0
+    assert payload.read() == b"%PDF-1.7 body"
+
+
+def test_upload_without_size_over_the_limit_is_rejected():
+    upload = _upload(b"x" * (20 * 1024 * 1024 + 1))
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(_read_validated_pdf(upload))
+    assert info.value.status_code == 413
+
+
+def test_non_pdf_upload_is_rejected():
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(_read_validated_pdf(_upload(b"a,b", content_type="text/csv")))
+    assert info.value.status_code == 400
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from json_tolerant import TolerantJsonDecoder, TolerantJsonError, decode_json_object
+
+
+def _fed(text, size):
+    decoder = TolerantJsonDecoder()
+    for start in range(0, len(text), size):
+        decoder.feed(text[start : start + size])
+    return decoder
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a": 1}', {"a": 1}),
+        ('```json\n{"a": [1, 2]}\n```', {"a": [1, 2]}),
+        ('Here is the record:\n{"a": {"b": "c"}}\nDone.', {"a": {"b": "c"}}),
+        ('"{\\"a\\": 1}"', {"a": 1}),
+        ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),
+        ('{"a": 1 "b": 2}', {"a": 1, "b": 2}),
+        ("{a: 'x', 2024: True, c: None}", {"a": "x", "2024": True, "c": None}),
+        ('{"a": 1,, "b": 2}', {"a": 1, "b": 2}),
+        ('{"s": "caf\\u00e9 \\ud83d\\ude00 {not} [json]"}', {"s": "café 😀 {not} [json]"}),
+    ],
+)
+def test_reads_valid_and_near_valid_objects(text, expected):
+    assert decode_json_object(text) == expected
+
+
+def test_largest_object_wins():
+    text = 'Example: {"a": 1}. Output: {"a": 1, "b": {"c": [1, 2, 3]}}'
+    assert decode_json_object(text) == {"a": 1, "b": {"c": [1, 2, 3]}}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_streamed_pieces_read_like_the_whole(size):
+    text = 'Sure:\n{"a": "x\\"y", b: [1.5e3, -2, True], "c": {\'d\': "\\u00e9"},}'
+    decoder = _fed(text, size)
+    assert decoder.decode() == {"a": 'x"y', "b": [1500.0, -2, True], "c": {"d": "é"}}
+
+
+def test_truncated_object_is_partial_not_result():
+    decoder = TolerantJsonDecoder()
+    decoder.feed('{"a": {"b": 1, "c": "unfinis')
+    with pytest.raises(TolerantJsonError, match="Unterminated"):
+        decoder.decode()
+    assert decoder.result is None
+    assert decoder.partial == {"a": {"b": 1, "c": "unfinis"}}
+
+
+def test_truncated_mid_number_keeps_the_digits():
+    decoder = TolerantJsonDecoder()
+    decoder.feed('{"a": 12.5e')
+    decoder.close()
+    assert decoder.partial == {"a": 12.5}
+
+
+def test_syntax_error_does_not_promote_nested_objects():
+    decoder = TolerantJsonDecoder()
+    decoder.feed('{"record": {"a": 1, "b": {"c": 2}}, "bad": @, "more": {"d": 3}}')
+    with pytest.raises(TolerantJsonError, match="Expecting value"):
+        decoder.decode()
+    assert decoder.result is None
+    assert decoder.partial is None
+    assert decoder.objects == 0
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_object_after_a_broken_one_is_read(size):
+    text = '{"a": {"b": @ "}", \'{\': "\\"]"}} then {"c": {"d": 1}}'
+    decoder = _fed(text, size)
+    assert decoder.decode() == {"c": {"d": 1}}
+    assert decoder.error is not None
+    assert decoder.objects == 1
+
+
+def test_broken_object_left_open_is_neither_result_nor_partial():
+    decoder = TolerantJsonDecoder()
+    decoder.feed('{"a": [1, 2}, "b": {"c": 1}}')
+    with pytest.raises(TolerantJsonError, match="Unexpected '}'"):
+        decoder.decode()
+    assert decoder.result is None
+    assert decoder.partial is None
+
+
+def test_error_position_is_reported():
+    decoder = TolerantJsonDecoder()
+    decoder.feed('{\n  "a": 1,\n  "b": ?\n}')
+    with pytest.raises(TolerantJsonError) as info:
+        decoder.decode()
+    assert (info.value.lineno, info.value.colno, info.value.pos) == (3, 8, 19)
+
+
+def test_no_object():
+    with pytest.raises(TolerantJsonError, match="No JSON object"):
+        decode_json_object("I could not produce the record.")
+
+
+def test_valid_non_object_json_is_returned_as_parsed():
+    assert decode_json_object("[1, 2]") == [1, 2]
+
+
+def test_feed_after_close_is_rejected():
+    decoder = TolerantJsonDecoder()
+    decoder.close()
+    with pytest.raises(ValueError):
+        decoder.feed("{}")
+
+
+def test_matches_json_loads_on_valid_input():
+    value = {"a": [1, 2.5, None, True, {"b": "c\\n"}], "d": {"e": -1e-3}}
+    text = json.dumps(value, indent=2)
+    decoder = TolerantJsonDecoder()
+    decoder.feed(text)
+    assert decoder.decode() == json.loads(text)
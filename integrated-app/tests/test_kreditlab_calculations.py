@@ -0,0 +1,153 @@
+import pytest
+
+from kreditlab_calculations import apply_analysis, compute_analysis, period_days
+
+
+def _item(name, **values):
+    return {"display_name": name, "values": values}
+
+
+def _total(**values):
+    return {"total": {"values": values}}
+
+
+@pytest.fixture
+def record():
+    return {
+        "company_info": {
+            "financial_year_end": "31 December",
+            "periods_analyzed": {"fy2024": "FY Dec 2024", "ytd_sep2025": "YTD Sep 2025"},
+        },
+        "statement_of_comprehensive_income": {
+            "revenue": _item("Revenue", fy2024=3660, ytd_sep2025=2730),
+            "cost_of_sales": _item("Cost of sales", fy2024=-2196, ytd_sep2025=-1638),
+            "operating_profit": _item("Operating profit", fy2024=900, ytd_sep2025=600),
+            "ebitda": _item("EBITDA", fy2024=1100, ytd_sep2025=750),
+            "finance_costs": _item("Finance costs", fy2024=-120, ytd_sep2025=-90),
+            "net_profit_after_tax": _item("Profit for the year", fy2024=500, ytd_sep2025=300),
+        },
+        "statement_of_financial_position": {
+            "non_current_assets": {
+                **_total(fy2024=2000, ytd_sep2025=2000),
+                "intangible_assets": _item("Intangible assets", fy2024=50, ytd_sep2025=50),
+            },
+            "current_assets": {
+                **_total(fy2024=1500, ytd_sep2025=1500),
+                "trade_receivables": _item("Trade receivables", fy2024=610, ytd_sep2025=455),
+                "inventory": _item("Inventories", fy2024=366, ytd_sep2025=273),
+                "cash_and_bank": _item("Cash and bank balances", fy2024=200, ytd_sep2025=200),
+                "line_items": {
+                    "amount_due_from_directors": _item("Amount due from directors", fy2024=20, ytd_sep2025=20),
+                    "amount_due_from_related_companies": _item(
+                        "Amount due from related companies", fy2024=30, ytd_sep2025=30
+                    ),
+                },
+            },
+            "current_liabilities": {
+                **_total(fy2024=1200, ytd_sep2025=1200),
+                "trade_payables": _item("Trade payables", fy2024=244, ytd_sep2025=182),
+                "line_items": {
+                    "hire_purchase_payables": _item("Hire purchase payables", fy2024=100, ytd_sep2025=100),
+                    "lease_liabilities": _item("Finance lease liabilities", fy2024=30, ytd_sep2025=30),
+                    "term_loans": _item("Term loans", fy2024=200, ytd_sep2025=200),
+                    "bank_overdraft": _item("Bank overdraft", fy2024=50, ytd_sep2025=50),
+                    "amount_due_to_director": _item("Amount due to a director", fy2024=70, ytd_sep2025=70),
+                    "other_payables": _item("Other payables and accruals", fy2024=90, ytd_sep2025=90),
+                    "total_borrowings": _item("Total borrowings", fy2024=380, ytd_sep2025=380),
+                },
+            },
+            "non_current_liabilities": {
+                **_total(fy2024=1300, ytd_sep2025=1300),
+                "line_items": {
+                    "hire_purchase_payables": _item("Hire purchase payables", fy2024=300, ytd_sep2025=300),
+                    "lease_liabilities": _item("Lease liabilities", fy2024=120, ytd_sep2025=120),
+                    "term_loans": _item("Term loans", fy2024=800, ytd_sep2025=800),
+                    "borrowings_subtotal": _item("Subtotal of borrowings", fy2024=1220, ytd_sep2025=1220),
+                },
+            },
+            "total_assets": _total(fy2024=3500, ytd_sep2025=3500),
+            "equity": _total(fy2024=1000, ytd_sep2025=1000),
+        },
+    }
+
+
+def test_hire_purchase_and_leases_count_as_term_borrowings(record):
+    computed = compute_analysis(record)
+    debt_service = computed["dscr_analysis"]["calculation"]["fy2024"]["debt_service"]
+    # HP 100 + finance lease 30 + term loan 200; the overdraft is revolving,
+    # the director's balance is not a borrowing and subtotals are not summed again.
+    assert debt_service["principal_repayment"]["total_principal"] == 330
+    assert debt_service["total_debt_service"] == 450
+    assert computed["dscr_analysis"]["calculation"]["fy2024"]["dscr"] == pytest.approx(1100 / 450, abs=0.01)
+    gearing = computed["financial_ratios"]["leverage_ratios"]["gearing_ratio"]["values"]
+    # Term 330 current + 1220 non-current, plus the 50 overdraft.
+    assert gearing["fy2024"] == pytest.approx(1600 / 1000, abs=0.01)
+
+
+@pytest.mark.parametrize(
+    ("key", "label", "fye_month", "expected"),
+    [
+        ("fy2024", "FY Dec 2024", 12, 366),
+        ("fy2023", "FY Dec 2023", 12, 365),
+        ("ytd_sep2025", "YTD Sep 2025", 12, 273),
+        ("ytd_dec2024", "YTD Dec 2024", 6, 184),
+        ("ytd_mar2025", "YTD Mar 2025", None, None),
+    ],
+)
+def test_period_days(key, label, fye_month, expected):
+    assert period_days(key, label, fye_month) == expected
+
+
+def test_efficiency_days_are_period_adjusted_for_ytd_only(record):
+    efficiency = compute_analysis(record)["financial_ratios"]["efficiency_ratios"]
+    debtor_days = efficiency["debtor_days"]
+    assert debtor_days["values_standard"] == {"fy2024": 61, "ytd_sep2025": 61}
+    assert debtor_days["values_period_adjusted"] == {"fy2024": 61, "ytd_sep2025": 46}
+    assert debtor_days["period_days"] == {"fy2024": 366, "ytd_sep2025": 273}
+
+
+def test_wcr_divides_by_actual_period_days(record):
+    computed = compute_analysis(record)
+    efficiency = computed["financial_ratios"]["efficiency_ratios"]
+    ccc = efficiency["cash_conversion_cycle"]["values_period_adjusted"]
+    wcr = computed["working_capital_analysis"]["working_capital_requirement"]["values"]
+    # Full-year days use the standard 365 but FY2024 revenue is spread over 366
+    # days: 81.1 * 3660 / 366, where dividing by 365 would give 813.
+    assert ccc["fy2024"] == 81
+    assert wcr["fy2024"] == 811
+    # YTD: 60.7 days over 273 actual days of revenue.
+    assert wcr["ytd_sep2025"] == 607
+    assert computed["working_capital_analysis"]["working_capital_assessment"]["needs_wc_facility"] is True
+
+
+def test_tnw_deducts_intangibles_and_amounts_due_from_directors_and_related(record):
+    tnw = compute_analysis(record)["tnw_analysis"]
+    adjustments = tnw["calculation"]["fy2024"]["adjustments"]
+    assert adjustments == {
+        "less_intangibles": 50,
+        "less_due_from_directors": 20,
+        "less_due_from_related_companies": 30,
+        "total_adjustments": 100,
+    }
+    assert tnw["summary"]["adjusted_tnw"] == {"fy2024": 900, "ytd_sep2025": 900}
+    assert tnw["assessment"]["tnw_trend"] == "stable"
+
+
+def test_cash_ratio_uses_unrestricted_cash_when_the_note_gives_it(record):
+    cash = record["statement_of_financial_position"]["current_assets"]["cash_and_bank"]
+    cash["unrestricted_values"] = {"fy2024": 60}
+    cash_ratio = compute_analysis(record)["financial_ratios"]["liquidity_ratios"]["cash_ratio"]
+    # FY2024 excludes the 140 of pledged deposits; YTD has no split, so the face value is used.
+    assert cash_ratio["values"] == {"fy2024": 0.05, "ytd_sep2025": 0.17}
+
+
+def test_missing_figures_stay_missing(record):
+    del record["statement_of_comprehensive_income"]["revenue"]["values"]["ytd_sep2025"]
+    margins = compute_analysis(record)["financial_ratios"]["profitability_ratios"]
+    assert "ytd_sep2025" not in margins["net_profit_margin"]["values"]
+
+
+def test_no_periods_means_nothing_computed(record):
+    del record["company_info"]["periods_analyzed"]
+    assert compute_analysis(record) == {}
+    assert apply_analysis(record) is record
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import json
+import types
+
+import anthropic
+import httpx
+import pytest
+
+import pipeline
+from json_stream import MalformedStreamError
+
+RECORD = {key: {} for key in pipeline.REQUIRED_TOP_LEVEL_KEYS}
+
+
+def _message(text, stop_reason="end_turn"):
+    usage = types.SimpleNamespace(input_tokens=10, output_tokens=5)
+    return types.SimpleNamespace(
+        content=[types.SimpleNamespace(type="text", text=text)], stop_reason=stop_reason, usage=usage
+    )
+
+
+def _not_found(model):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return anthropic.NotFoundError(f"model: {model}", response=httpx.Response(404, request=request), body=None)
+
+
+class FakeClient:
+    """Answers messages.create with queued replies: text, (text, stop_reason) or an exception."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.messages = self
+
+    def _reply(self, model, request):
+        self.calls.append((model, request))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return _message(*reply) if isinstance(reply, tuple) else _message(reply)
+
+    def create(self, model, **request):
+        return self._reply(model, request)
+
+
+class FakeAsyncClient(FakeClient):
+    async def create(self, model, **request):
+        return self._reply(model, request)
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_STREAMING_ENABLED", "false")
+    monkeypatch.setenv("STAGE2_LLM_FIX_ENABLED", "true")
+    monkeypatch.setenv("LOCAL_CALCULATIONS_ENABLED", "false")
+    monkeypatch.delenv("ANTHROPIC_MODEL", raising=False)
+    monkeypatch.delenv("ANTHROPIC_MODEL_UNAVAILABLE_TTL_SECONDS", raising=False)
+    monkeypatch.setattr(pipeline, "_MODEL_UNAVAILABLE_UNTIL", {})
+    monkeypatch.setattr(pipeline, "_MODEL_SERVED", {})
+    monkeypatch.setattr(pipeline, "get_anthropic_client", None)
+    monkeypatch.setattr(pipeline, "get_async_anthropic_client", None)
+
+
+def _validate(parsed):
+    missing = pipeline.REQUIRED_TOP_LEVEL_KEYS - set(parsed)
+    return (None, f"missing {sorted(missing)}") if missing else (parsed, None)
+
+
+def _run(replies, use_async=False):
+    generations = []
+    attempts = pipeline._Stage2Attempts(validate=_validate, generations=generations)
+    if use_async:
+        client = FakeAsyncClient(replies)
+        pipeline.get_async_anthropic_client = lambda: client
+        result = asyncio.run(pipeline._run_attempts_async("system", "payload", attempts))
+    else:
+        client = FakeClient(replies)
+        pipeline.get_anthropic_client = lambda: client
+        result = pipeline._run_attempts("system", "payload", attempts)
+    return result, generations[0], client
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_direct_response_records_usage_and_model(use_async):
+    result, record, client = _run([json.dumps(RECORD)], use_async)
+    assert result == RECORD
+    assert record["tier"] == "direct"
+    assert record["usage"]["input_tokens"] == 10
+    assert record["models"] == {pipeline.DEFAULT_ANTHROPIC_MODEL: 1}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_unavailable_model_falls_back_and_is_skipped_afterwards(use_async):
+    model = pipeline.DEFAULT_ANTHROPIC_MODEL
+    _, record, client = _run([_not_found(model), json.dumps(RECORD)], use_async)
+    assert [call[0] for call in client.calls] == [model, pipeline.FALLBACK_ANTHROPIC_MODEL]
+    assert record["models"] == {pipeline.FALLBACK_ANTHROPIC_MODEL: 1}
+    _, _, client = _run([json.dumps(RECORD)], use_async)
+    assert [call[0] for call in client.calls] == [pipeline.FALLBACK_ANTHROPIC_MODEL]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_other_errors_do_not_mark_the_model_unavailable(use_async):
+    with pytest.raises(RuntimeError, match="overloaded"):
+        _run([RuntimeError("overloaded (404 in body)")], use_async)
+    assert pipeline._model_stats()["unavailable"] == {}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_malformed_stream_goes_to_the_corrective_retry(use_async):
+    _, record, client = _run([MalformedStreamError("']' closes '{'"), json.dumps(RECORD)], use_async)
+    assert record["tier"] == "regenerate"
+    assert len(client.calls) == 2
+    assert pipeline._model_stats()["unavailable"] == {}
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_output_cut_off_by_max_tokens_is_regenerated(use_async):
+    text = json.dumps(RECORD)
+    _, record, client = _run([(text[: len(text) // 2], "max_tokens"), (text, "max_tokens"), text], use_async)
+    assert record["tier"] == "regenerate"
+    assert record["llm_calls"] == 3
+    correction = client.calls[1][1]["messages"][-1]["content"][-1]["text"]
+    assert "cut off by the output token limit" in correction
+
+
+def test_local_calculations_are_opt_in(monkeypatch):
+    monkeypatch.delenv("LOCAL_CALCULATIONS_ENABLED")
+    attempts = pipeline._record_attempts(None, None)
+    assert attempts.validate is pipeline._validate_full_response
+    assert attempts.task is None
+    monkeypatch.setenv("LOCAL_CALCULATIONS_ENABLED", "true")
+    attempts = pipeline._record_attempts(None, None)
+    assert attempts.validate is pipeline._validate_locally_calculated_response
+    assert "financial_ratios" in attempts.task
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_map_calls_carry_their_document_file_name(monkeypatch, use_async):
+    monkeypatch.setenv("STAGE2_MAP_REDUCE_ENABLED", "true")
+    monkeypatch.setenv("STAGE2_RECONCILE_ENABLED", "false")
+    contexts = {}
+
+    def transform(extraction_result, combination_context=None, **kwargs):
+        contexts[extraction_result["name"]] = combination_context
+        return {"company_info": {"periods_analyzed": {}}}
+
+    async def transform_async(extraction_result, combination_context=None, **kwargs):
+        return transform(extraction_result, combination_context)
+
+    monkeypatch.setattr(pipeline, "transform_to_kreditlab_json", transform)
+    monkeypatch.setattr(pipeline, "transform_to_kreditlab_json_async", transform_async)
+    documents = [{"name": "audited"}, {"name": "management"}]
+    filenames = ["fy2024_audited.pdf", "ytd_sep2025_ma.pdf"]
+    if use_async:
+        asyncio.run(pipeline.transform_multiple_extractions_to_kreditlab_json_async(documents, filenames))
+    else:
+        pipeline.transform_multiple_extractions_to_kreditlab_json(documents, filenames)
+    assert contexts == {
+        "audited": {"source_filenames": ["fy2024_audited.pdf"]},
+        "management": {"source_filenames": ["ytd_sep2025_ma.pdf"]},
+    }
+
+
+@pytest.mark.parametrize(
+    "wrapped",
+    [
+        [RECORD],
+        ["Here is the record", {"note": "none"}, RECORD],
+        [{"result": RECORD}],
+    ],
+)
+def test_record_wrapped_in_a_list_is_found_without_another_call(wrapped):
+    result, record, client = _run([json.dumps(wrapped)])
+    assert {key: result[key] for key in RECORD} == RECORD
+    assert record["tier"] in ("direct", "local_repair")
+    assert len(client.calls) == 1
+
+
+def test_unwrap_list_leaves_other_responses_alone():
+    assert pipeline._unwrap_list({"a": 1}, ["a"]) == {"a": 1}
+    assert pipeline._unwrap_list([1, {"b": 2}], ["a"]) == [1, {"b": 2}]
+    nested = {"b": {"income_statement": {}}}
+    assert pipeline._unwrap_list([{"c": 1}, nested], ["statement_of_comprehensive_income"]) == nested
+
+
+def test_fallback_is_logged_once_and_skips_at_debug(caplog):
+    model = pipeline.DEFAULT_ANTHROPIC_MODEL
+    caplog.set_level(logging.DEBUG, logger="pipeline")
+    _run([_not_found(model), json.dumps(RECORD)])
+    _run([json.dumps(RECORD)])
+    _run([json.dumps(RECORD)])
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert warnings == [f"Anthropic model '{model}' is unavailable; falling back and skipping it for 900 seconds."]
+    skips = [record for record in caplog.records if "Skipping" in record.getMessage()]
+    assert len(skips) == 2 and all(record.levelno == logging.DEBUG for record in skips)
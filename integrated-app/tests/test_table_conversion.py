@@ -0,0 +1,43 @@
+import pytest
+
+from table_conversion import LXML_AVAILABLE, _chunk_to_page_bs4, chunk_to_page, render_tsv
+
+CHUNK = (
+    "Statement of financial position\n"
+    "<table><tr><th>Item</th><th>2024</th></tr>"
+    "<tr><td>Cash and bank balances</td><td>1,200</td></tr>"
+    "<tr><td>Trade receivables</td><td>800</td></tr></table>\n"
+    "Note 5"
+)
+
+
+def test_chunk_to_page_splits_text_and_tables():
+    page = chunk_to_page(CHUNK)
+    assert page["text"] == "Statement of financial position\nNote 5"
+    assert page["tables"] == [
+        [["Item", "2024"], ["Cash and bank balances", "1,200"], ["Trade receivables", "800"]]
+    ]
+
+
+@pytest.mark.skipif(not LXML_AVAILABLE, reason="lxml not installed")
+def test_lxml_and_bs4_agree():
+    assert chunk_to_page(CHUNK) == _chunk_to_page_bs4(CHUNK)
+
+
+def test_control_characters_in_a_cell_are_kept():
+    chunk = (
+        "Page 2\x0c<table><tr><th>Item</th><th>2024</th></tr>"
+        "<tr><td>Cash\x00 at\x0cbank</td><td>12</td></tr></table>"
+    )
+    page = chunk_to_page(chunk)
+    assert page["tables"] == [[["Item", "2024"], ["Cash\x00 at\x0cbank", "12"]]]
+    assert page["text"] == "Page 2"
+
+
+def test_empty_chunk():
+    assert chunk_to_page("  \n") == {"text": "", "tables": []}
+
+
+def test_render_tsv_keeps_one_row_per_line():
+    matrix = [["Item", "2024"], ["Cash\tand\nbank", "1"], ["Other", "2"]]
+    assert render_tsv(matrix, max_rows=1) == "Item\t2024\nCash and bank\t1"
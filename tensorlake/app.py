@@ -348,8 +348,10 @@ if run_button:
         # Build result structure
         # ===================================================
 
-        full_text_output = ""
-        full_text_with_tables = ""
+        # Collect fragments and join once at the end; "+=" in this loop is
+        # quadratic in document size.
+        text_parts = []
+        text_with_tables_parts = []
         all_tables_json = {"tables": []}
         pages = []
 
@@ -363,8 +365,9 @@ if run_button:
 
             text_plain = soup.get_text("\n", strip=True)
 
-            full_text_output += f"\n\n===== PAGE {i} =====\n\n{text_plain}\n\n"
-            full_text_with_tables += f"\n\n===== PAGE {i} =====\n\n{text_plain}\n\n"
+            page_block = f"\n\n===== PAGE {i} =====\n\n{text_plain}\n\n"
+            text_parts.append(page_block)
+            text_with_tables_parts.append(page_block)
 
             page_tables = []
 
@@ -377,7 +380,7 @@ if run_button:
                 rows = matrix[1:]
 
                 readable = tabulate(rows, headers=headers, tablefmt="grid")
-                full_text_with_tables += readable + "\n\n"
+                text_with_tables_parts.append(readable + "\n\n")
 
                 all_tables_json["tables"].append({
                     "page": i,
@@ -396,8 +399,8 @@ if run_button:
 
         st.session_state["results"] = {
             "pages": pages,
-            "full_text_output": full_text_output,
-            "full_text_with_tables": full_text_with_tables,
+            "full_text_output": "".join(text_parts),
+            "full_text_with_tables": "".join(text_with_tables_parts),
             "all_tables_json": all_tables_json,
         }
 